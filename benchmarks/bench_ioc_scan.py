@@ -0,0 +1,161 @@
+# Micro-benchmark: scanner de IOCs em uma passada (IOC_RE) vs. as três regexes antigas,
+# com a verificação de paridade: tudo que as regexes antigas acham o scanner novo também
+# acha (sai com código 1 se não).
+#
+#   python benchmarks/bench_ioc_scan.py --pages 2000
+
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "main", "src")
+
+WORDS = (
+    "contrato pagamento cliente relatório the of and invoice transfer account "
+    "process evidence 2024 12:30 R$ 1.250,00 item nº 45 total"
+).split()
+INDICATORS = (
+    "https://portal.example.com/login?id={i}",
+    "hxxp://malicious[.]net/payload{i}",
+    "10.0.{a}.{b}",
+    "fe80::{i:x}:1",
+    "user{i}@empresa.com.br",
+    "d41d8cd98f00b204e9800998ecf{i:05x}",
+    "files{i}.example.org",
+)
+
+# Casos de fronteira das regexes antigas, além das páginas geradas
+PARITY_STRINGS = (
+    "x-http://e.com",
+    "host-192.168.0.1",
+    "mail:user@x.com",
+    "http://e.com/?ip=10.1.2.3&u=a@b.com",
+    "http://user@host.com/path",
+    "(http://e.com) [10.0.0.1] <a@b.com>",
+    "ip=10.0.0.1; see https://x.org.",
+    "user.name+tag@sub.example.co.uk.",
+    "1.2.3.4.5 x_1.2.3.4 v1.2.3.4 256.1.1.1",
+    "hxxp://evil[.]com/a https://evil[.]net/b?c=d@e.com",
+    "0x52908400098527886E0F7030069857D2E4169EE7@host.io",
+    "a@b.c,http://x.com;mailto:q@w.org",
+    "d41d8cd98f00b204e9800998ecf8427e-192.168.1.1",
+    "HTTPS://UPPER.EXAMPLE.COM/X",
+)
+
+
+def load_forenpdf():
+    # pacote direto do checkout, sem exigir `pip install`
+    sys.path.insert(0, SRC)
+    return importlib.import_module("forenpdf.iocs")
+
+
+def make_pages(n_pages, words_per_page, ioc_rate, seed=1234):
+    rnd = random.Random(seed)
+    pages = []
+    for p in range(n_pages):
+        out = []
+        for i in range(words_per_page):
+            if rnd.random() < ioc_rate:
+                tpl = rnd.choice(INDICATORS)
+                out.append(tpl.format(i=p * 7 + i, a=p % 256, b=i % 256))
+            else:
+                out.append(rnd.choice(WORDS))
+        pages.append(" ".join(out))
+    return pages
+
+
+def legacy_scan(mod, text):
+    urls = list(dict.fromkeys(mod.URL_RE.findall(text)))
+    ips = list(dict.fromkeys(mod.IP_RE.findall(text)))
+    emails = list(dict.fromkeys(mod.EMAIL_RE.findall(text)))
+    return urls, ips, emails
+
+
+def parity_failures(mod, texts):
+    # [(texto, tipo, valor)] achados pelas regexes antigas e não pelo scanner novo; a
+    # pontuação final das URLs antigas é descartada, como no scanner (e-mails são
+    # comparados como as regexes antigas os acham)
+    failures = []
+    for text in texts:
+        found = mod.scan_iocs(text)
+        urls, ips, emails = legacy_scan(mod, text)
+        for kind, values, accepted in (
+            ("urls", urls, ("urls", "defanged_urls")),
+            ("ips", ips, ("ips",)),
+            ("emails", emails, ("emails",)),
+        ):
+            for value in values:
+                if kind == "urls":
+                    value = value.rstrip(".,;:")
+                # a URL antiga parava no primeiro "[" ou ")": basta ser prefixo de uma
+                # URL achada (ex.: https://evil[ de https://evil[.]net/b)
+                if not any(
+                    v == value or (kind == "urls" and v.startswith(value))
+                    for k in accepted
+                    for v in found.get(k, ())
+                ):
+                    failures.append((text[:80], kind, value))
+    return failures
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IOC scanner micro-benchmark")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--ioc-rate", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    mod = load_forenpdf()
+    pages = make_pages(args.pages, args.words, args.ioc_rate)
+    mb = sum(len(p) for p in pages) / (1024 * 1024)
+
+    legacy = best_of(lambda: [legacy_scan(mod, p) for p in pages], args.repeat)
+
+    def combined():
+        index = {}
+        for pno, p in enumerate(pages, 1):
+            mod.index_iocs(index, mod.scan_iocs(p), pno)
+
+    one_pass = best_of(combined, args.repeat)
+    found = {}
+    for p in pages:
+        mod.scan_iocs(p, found)
+    failures = parity_failures(mod, pages + list(PARITY_STRINGS))
+    print(
+        json.dumps(
+            {
+                "pages": args.pages,
+                "text_mb": round(mb, 2),
+                "legacy_three_regex_seconds": round(legacy, 4),
+                "legacy_mb_s": round(mb / legacy, 2),
+                "one_pass_seconds": round(one_pass, 4),
+                "one_pass_mb_s": round(mb / one_pass, 2),
+                "one_pass_types": sorted(found),
+                "ratio_one_pass_vs_legacy": round(one_pass / legacy, 3),
+                "parity_failures": failures[:20],
+            },
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
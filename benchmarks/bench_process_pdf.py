@@ -0,0 +1,209 @@
+# Benchmark ponta a ponta do process_pdf sobre o corpus sintético: páginas/s, MB/s, pico
+# de RSS e tempo de cada etapa (manifest["metrics"]). Cada caso roda em um subprocesso
+# próprio para que o pico de RSS de um não contamine o outro. A saída é JSON Lines (um
+# caso por linha) e, com --output, um JSON único para comparar commits com --compare.
+#
+#   python benchmarks/bench_process_pdf.py --suite quick --output bench.json
+#   python benchmarks/bench_process_pdf.py --suite quick --compare bench.json
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import fitz  # PyMuPDF
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "main", "src")
+
+sys.path.insert(0, HERE)
+import synthetic_corpus  # noqa: E402
+
+
+def load_forenpdf():
+    # pacote direto do checkout, sem exigir `pip install`
+    sys.path.insert(0, SRC)
+    return importlib.import_module("forenpdf")
+
+
+def peak_rss_mb(who):
+    if resource is None:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux informa em KiB, macOS em bytes
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_one(pdf_path, options):
+    # Executado no subprocesso: um único process_pdf, resultado em JSON no stdout
+    forenpdf = load_forenpdf()
+    forenpdf.setup_logging(quiet=True)
+    with tempfile.TemporaryDirectory() as out:
+        t0 = time.perf_counter()
+        manifest = forenpdf.process_pdf(pdf_path, out_base=out, **options)
+        seconds = time.perf_counter() - t0
+    metrics = manifest["metrics"]
+    return {
+        "seconds": round(seconds, 4),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        # workers de página/OCR
+        "peak_rss_children_mb": (
+            peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+        ),
+        "page_count": manifest.get("page_count"),
+        "stages": {k: v["wall_seconds"] for k, v in metrics["stages"].items()},
+        "stages_cpu": {k: v["cpu_seconds"] for k, v in metrics["stages"].items()},
+        "counters": metrics["counters"],
+    }
+
+
+def bench_case(case, pdf_path, options, repeat):
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--run-one",
+                pdf_path,
+                "--options",
+                json.dumps(options),
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{case}: benchmark run failed\n{proc.stderr}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    mb = os.path.getsize(pdf_path) / (1024 * 1024)
+    pages = best["page_count"] or 0
+    return dict(
+        {
+            "case": case,
+            "pdf_mb": round(mb, 3),
+            "pages_per_s": round(pages / best["seconds"], 1),
+            "mb_per_s": round(mb / best["seconds"], 2),
+        },
+        **best,
+    )
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        baseline = {r["case"]: r for r in json.load(fh)["results"]}
+    rows = []
+    for r in results:
+        base = baseline.get(r["case"])
+        if base is None:
+            continue
+        rows.append(
+            {
+                "case": r["case"],
+                "baseline_seconds": base["seconds"],
+                "seconds": r["seconds"],
+                # < 1.0: mais rápido que a referência
+                "ratio": round(r["seconds"] / base["seconds"], 3),
+                "peak_rss_delta_mb": (
+                    round(r["peak_rss_mb"] - base["peak_rss_mb"], 1)
+                    if r["peak_rss_mb"] is not None and base["peak_rss_mb"] is not None
+                    else None
+                ),
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end process_pdf benchmark")
+    parser.add_argument(
+        "--suite", choices=sorted(synthetic_corpus.SUITES), default="quick"
+    )
+    parser.add_argument("--cases", nargs="+", help="Only these cases of the suite")
+    parser.add_argument(
+        "--corpus-dir", help="Keep/reuse the generated PDFs here (default: temporary)"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Best of N runs")
+    parser.add_argument("--page-workers", type=int, default=1)
+    parser.add_argument("--output-sink", default="dir")
+    parser.add_argument(
+        "--ocr", action="store_true", help="Enable OCR (off by default)"
+    )
+    parser.add_argument("--output", help="Write all results as a single JSON file")
+    parser.add_argument("--compare", help="Baseline JSON from a previous --output")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    parser.add_argument("--options", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one, json.loads(args.options))))
+        return 0
+
+    options = {
+        "do_ocr": args.ocr,
+        "ocr_cache": None,
+        "page_workers": args.page_workers,
+        "output_sink": args.output_sink,
+    }
+    forenpdf = load_forenpdf()
+    env = {
+        "commit": git_commit(),
+        "forenpdf_version": forenpdf.__version__,
+        "pymupdf_version": getattr(fitz, "VersionBind", None),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "suite": args.suite,
+        "options": options,
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = args.corpus_dir or tmp
+        os.makedirs(corpus_dir, exist_ok=True)
+        for case, spec in synthetic_corpus.suite_specs(args.suite).items():
+            if args.cases and case not in args.cases:
+                continue
+            pdf_path = os.path.join(corpus_dir, f"{case}.pdf")
+            if not os.path.isfile(pdf_path):
+                synthetic_corpus.generate_pdf(pdf_path, spec)
+            row = bench_case(case, pdf_path, options, args.repeat)
+            row["spec"] = spec
+            results.append(row)
+            print(json.dumps(row), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump({"environment": env, "results": results}, fh, indent=2)
+    if args.compare:
+        for row in compare(results, args.compare):
+            print(json.dumps(row), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# Tempo de inicialização do pacote/CLI, no estilo `python -X importtime`: mede o tempo de
+# parede de cada comando em um interpretador novo e lista os imports mais caros. Com
+# --check, falha se um comando leve carregar PyMuPDF, Pillow ou pytesseract.
+#
+#   python benchmarks/bench_startup.py --repeat 10 --check
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(HERE, "..", "main", "src"))
+
+HEAVY_MODULES = ("fitz", "pymupdf", "PIL", "pytesseract")
+
+# (nome, código, pode carregar módulos pesados?)
+COMMANDS = (
+    ("python", "pass", True),
+    ("import_forenpdf", "import forenpdf", False),
+    (
+        "cli_help",
+        "import sys; sys.argv = ['forenpdf', '--help']; import forenpdf.__main__",
+        False,
+    ),
+    ("import_core", "import forenpdf.core", True),
+)
+
+
+def run(code, importtime=False):
+    env = dict(os.environ, PYTHONPATH=SRC)
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    # --help sai com código 0 via SystemExit
+    if proc.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{proc.stderr}")
+    return elapsed, proc.stderr
+
+
+def parse_importtime(stderr):
+    # linhas "import time: self [us] | cumulative | imported package"; a indentação do
+    # nome indica o nível de aninhamento do import
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="forenpdf startup-time benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with status 1 if a light command imports a heavy module",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for name, code, heavy_ok in COMMANDS:
+        times = [run(code)[0] for _ in range(args.repeat)]
+        _, stderr = run(code, importtime=True)
+        modules = parse_importtime(stderr)
+        # só os imports de primeiro nível: o cumulativo deles já inclui os aninhados
+        total_us = sum(c for _, c, depth in modules.values() if depth == 0)
+        heavy = sorted(m for m in modules if m.split(".")[0] in HEAVY_MODULES)
+        heavy_roots = sorted({m.split(".")[0] for m in heavy})
+        row = {
+            "command": name,
+            "best_ms": round(min(times) * 1000, 1),
+            "median_ms": round(statistics.median(times) * 1000, 1),
+            "import_ms": round(total_us / 1000, 1),
+            "modules": len(modules),
+            "heavy_modules": heavy_roots,
+            "top_imports_ms": {
+                m: round(c / 1000, 1)
+                for m, (_, c, _) in sorted(
+                    modules.items(), key=lambda kv: kv[1][1], reverse=True
+                )[: args.top]
+            },
+        }
+        if heavy_roots and not heavy_ok:
+            row["error"] = "heavy module imported by a light command"
+            failed = True
+        print(json.dumps(row), flush=True)
+    return 1 if args.check and failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
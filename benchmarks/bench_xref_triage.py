@@ -0,0 +1,110 @@
+# Benchmark da triagem de xrefs: mostra que o custo cresce linearmente com o número de objetos.
+#
+#   python benchmarks/bench_xref_triage.py --sizes 10000 25000 50000 100000
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "main", "src")
+
+
+def load_forenpdf():
+    # pacote direto do checkout, sem exigir `pip install`
+    sys.path.insert(0, SRC)
+    return importlib.import_module("forenpdf.triage")
+
+
+def make_pdf(path, n_objects, js_every=1000, stream_every=10):
+    # n_objects objetos avulsos; alguns com /JS e alguns streams com conteúdo suspeito
+    doc = fitz.open()
+    doc.new_page()
+    for i in range(n_objects):
+        xref = doc.get_new_xref()
+        if i % js_every == 0:
+            doc.update_object(xref, f"<< /S /JavaScript /JS (app.alert({i})) >>")
+        elif i % stream_every == 0:
+            doc.update_object(xref, "<< /Length 0 >>")
+            doc.update_stream(xref, f"BT /F1 12 Tf ({i} /URI) Tj ET".encode())
+        else:
+            doc.update_object(xref, f"<< /Type /Dummy /Index {i} /Kids [ 1 0 R ] >>")
+    doc.save(path, use_objstms=1, compression_effort=0)
+    doc.close()
+
+
+def legacy_triage(doc, max_xref):
+    # Laço original (antes do motor de triagem), para referência
+    found = 0
+    for xref in range(1, min(max_xref + 1, doc.xref_length() + 1)):
+        try:
+            s = str(doc.xref_object(xref, compressed=False)).lower()
+            if "/javascript" in s or "/js " in s:
+                found += 1
+            if "/embeddedfile" in s or "/embeddedfiles" in s:
+                found += 1
+        except Exception:
+            continue
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xref triage scaling benchmark")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 25000, 50000, 100000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-legacy", action="store_true")
+    args = parser.parse_args()
+
+    forenpdf = load_forenpdf()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            path = os.path.join(tmp, f"xrefs_{n}.pdf")
+            make_pdf(path, n)
+            doc = fitz.open(path)
+            best = None
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                triage = forenpdf.triage_xrefs(doc)
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            row = {
+                "objects": triage["xrefs_scanned"],
+                "streams": triage["streams_scanned"],
+                "hits": len(triage["hits"]),
+                "seconds": round(best, 4),
+                "objects_per_sec": round(triage["xrefs_scanned"] / best),
+                "us_per_object": round(best / triage["xrefs_scanned"] * 1e6, 2),
+            }
+            if not args.no_legacy:
+                t0 = time.perf_counter()
+                legacy_triage(doc, doc.xref_length())
+                row["legacy_seconds"] = round(time.perf_counter() - t0, 4)
+            doc.close()
+            results.append(row)
+            print(json.dumps(row), flush=True)
+
+    # Linear: o custo por objeto deve ficar estável entre o menor e o maior arquivo
+    first, last = results[0], results[-1]
+    print(
+        json.dumps(
+            {
+                "per_object_cost_ratio": round(
+                    last["us_per_object"] / first["us_per_object"], 3
+                ),
+                "size_ratio": round(last["objects"] / first["objects"], 3),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
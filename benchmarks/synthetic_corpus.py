@@ -0,0 +1,214 @@
+# Gerador de PDFs sintéticos e reprodutíveis (mesma semente => mesmo arquivo) para os
+# benchmarks. Pode ser usado como módulo ou para gravar um corpus em disco:
+#
+#   python benchmarks/synthetic_corpus.py --out ./corpus --suite full
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+
+import fitz  # PyMuPDF
+
+WORDS = (
+    "contrato pagamento cliente relatório the of and invoice transfer account "
+    "process evidence 2024 12:30 R$ 1.250,00 item nº 45 total"
+).split()
+INDICATORS = (
+    "https://portal.example.com/login?id={i}",
+    "hxxp://malicious[.]net/payload{i}",
+    "10.0.{a}.{b}",
+    "user{i}@empresa.com.br",
+    "d41d8cd98f00b204e9800998ecf{i:05x}",
+)
+
+FIXED_PDF_DATE = "D:20240101000000"
+
+# Parâmetros de um documento; cada caso da suíte sobrescreve só o que varia
+DEFAULT_SPEC = {
+    "pages": 50,
+    "words_per_page": 300,
+    "ioc_rate": 0.01,
+    "unique_images": 0,
+    "image_size": 256,
+    "reused_image": False,
+    "js_objects": 0,
+    "embedded_files": 0,
+    "embedded_size": 64 * 1024,
+    "extra_xrefs": 0,
+    "seed": 1234,
+}
+
+SUITES = {
+    "quick": {
+        "text": {"pages": 200},
+        "images": {"pages": 50, "unique_images": 50},
+        "reused_image": {"pages": 200, "reused_image": True},
+        "mixed": {
+            "pages": 100,
+            "unique_images": 20,
+            "reused_image": True,
+            "js_objects": 10,
+            "embedded_files": 5,
+            "extra_xrefs": 5000,
+        },
+    },
+    "full": {
+        "text": {"pages": 2000},
+        "dense_text": {"pages": 500, "words_per_page": 2000},
+        "images": {"pages": 300, "unique_images": 300, "image_size": 512},
+        "reused_image": {"pages": 2000, "reused_image": True},
+        "javascript": {"pages": 10, "js_objects": 500},
+        "embedded": {"pages": 10, "embedded_files": 50, "embedded_size": 1024 * 1024},
+        "xrefs_100k": {"pages": 10, "extra_xrefs": 100000},
+        "mixed": {
+            "pages": 1000,
+            "unique_images": 100,
+            "reused_image": True,
+            "js_objects": 50,
+            "embedded_files": 10,
+            "extra_xrefs": 50000,
+        },
+    },
+}
+
+
+def make_spec(**overrides):
+    unknown = set(overrides) - set(DEFAULT_SPEC)
+    if unknown:
+        raise ValueError(f"unknown corpus parameter(s): {sorted(unknown)}")
+    return dict(DEFAULT_SPEC, **overrides)
+
+
+def suite_specs(name):
+    return {case: make_spec(**params) for case, params in SUITES[name].items()}
+
+
+def page_text(rnd, words, ioc_rate, pno):
+    out = []
+    for i in range(words):
+        if rnd.random() < ioc_rate:
+            tpl = rnd.choice(INDICATORS)
+            out.append(tpl.format(i=pno * 7 + i, a=pno % 256, b=i % 256))
+        else:
+            out.append(rnd.choice(WORDS))
+    return " ".join(out)
+
+
+def noise_png(rnd, size):
+    # ruído não comprime: o tamanho da imagem fica previsível
+    samples = rnd.randbytes(size * size * 3)
+    return fitz.Pixmap(fitz.csRGB, size, size, samples, False).tobytes("png")
+
+
+def generate_pdf(path, spec):
+    spec = make_spec(**spec)
+    rnd = random.Random(spec["seed"])
+    doc = fitz.open()
+    shared_xref = 0
+    shared_png = noise_png(rnd, 64) if spec["reused_image"] else None
+    for pno in range(spec["pages"]):
+        page = doc.new_page()
+        text = page_text(rnd, spec["words_per_page"], spec["ioc_rate"], pno)
+        page.insert_textbox(fitz.Rect(36, 36, 576, 560), text, fontsize=6)
+        if pno < spec["unique_images"]:
+            size = spec["image_size"]
+            page.insert_image(fitz.Rect(36, 580, 236, 780), stream=noise_png(rnd, size))
+        if shared_png is not None:
+            # a mesma XObject em todas as páginas (logotipo/cabeçalho)
+            rect = fitz.Rect(500, 760, 560, 820)
+            if shared_xref:
+                page.insert_image(rect, xref=shared_xref)
+            else:
+                shared_xref = page.insert_image(rect, stream=shared_png)
+    js_xrefs = []
+    for i in range(spec["js_objects"]):
+        xref = doc.get_new_xref()
+        doc.update_object(
+            xref, f"<< /Type /Action /S /JavaScript /JS (app.alert({i});) >>"
+        )
+        js_xrefs.append(xref)
+    for i in range(spec["embedded_files"]):
+        xref = doc.embfile_add(
+            f"attachment_{i}.bin", rnd.randbytes(spec["embedded_size"])
+        )
+        # datas fixas no lugar do relógio, senão o arquivo muda a cada geração
+        for key in ("CreationDate", "ModDate"):
+            doc.xref_set_key(xref, f"Params/{key}", f"({FIXED_PDF_DATE})")
+    extra_xrefs = []
+    for i in range(spec["extra_xrefs"]):
+        xref = doc.get_new_xref()
+        doc.update_object(xref, f"<< /Type /Dummy /Index {i} >>")
+        extra_xrefs.append(xref)
+    # objetos sem referência viram null no garbage=1: as ações entram na árvore
+    # /Names /JavaScript do catálogo e os objetos extras num array do catálogo
+    catalog = doc.pdf_catalog()
+    if js_xrefs:
+        names = " ".join(f"(js{i:06d}) {x} 0 R" for i, x in enumerate(js_xrefs))
+        tree = doc.get_new_xref()
+        doc.update_object(tree, f"<< /Names [{names}] >>")
+        doc.xref_set_key(catalog, "Names/JavaScript", f"{tree} 0 R")
+    if extra_xrefs:
+        refs = " ".join(f"{x} 0 R" for x in extra_xrefs)
+        holder = doc.get_new_xref()
+        doc.update_object(holder, f"[{refs}]")
+        doc.xref_set_key(catalog, "SyntheticObjects", f"{holder} 0 R")
+    doc.save(path, garbage=1, deflate=1, use_objstms=1, no_new_id=1)
+    doc.close()
+    check_pdf(path, spec)
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def check_pdf(path, spec):
+    # O arquivo salvo tem de conter o que o caso promete medir
+    doc = fitz.open(path)
+    try:
+        counts = {
+            "js_objects": 0,
+            "extra_xrefs": 0,
+            "embedded_files": doc.embfile_count(),
+        }
+        for xref in range(1, doc.xref_length()):
+            kind = doc.xref_get_key(xref, "S")[1]
+            if kind == "/JavaScript" and doc.xref_get_key(xref, "JS")[0] != "null":
+                counts["js_objects"] += 1
+            elif doc.xref_get_key(xref, "Type")[1] == "/Dummy":
+                counts["extra_xrefs"] += 1
+    finally:
+        doc.close()
+    for key, count in counts.items():
+        assert count == spec[key], f"{path}: {count} {key}, expected {spec[key]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic PDF corpus generator")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--cases", nargs="+", help="Only these cases of the suite")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for case, spec in suite_specs(args.suite).items():
+        if args.cases and case not in args.cases:
+            continue
+        path = os.path.join(args.out, f"{case}.pdf")
+        sha256 = generate_pdf(path, spec)
+        print(
+            json.dumps(
+                {
+                    "case": case,
+                    "path": path,
+                    "bytes": os.path.getsize(path),
+                    "sha256": sha256,
+                    "spec": spec,
+                }
+            ),
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# ForenPDF: extração forense de PDFs (cópia da evidência com hashes, triagem de xrefs,
+# IOCs, imagens, arquivos embutidos e OCR).
+#
+# A API é resolvida sob demanda: `import forenpdf` não carrega PyMuPDF, Pillow nem
+# pytesseract; cada nome abaixo importa seu módulo no primeiro acesso.
+
+import importlib
+
+__version__ = "2.1.0"
+
+_API = {
+    "process_pdf": "core",
+    "process_batch": "batch",
+    "collect_pdf_inputs": "batch",
+    "ingest_evidence": "ingest",
+    "sha256_file": "ingest",
+    "IOC_TYPES": "iocs",
+    "scan_iocs": "iocs",
+    "scan_iocs_bytes": "iocs",
+    "index_iocs": "iocs",
+    "triage_xrefs": "triage",
+    "scan_keywords": "triage",
+    "dump_javascript": "triage",
+    "pretriage_file": "pretriage",
+    "iter_pretriage": "pretriage",
+    "ESCALATION_RULES": "pretriage",
+    "javascript_code": "triage",
+    "index_manifest": "correlation",
+    "import_manifests": "correlation",
+    "query_index": "correlation",
+    "pivot_index": "correlation",
+    "analyze_revisions": "revisions",
+    "carve_revisions": "revisions",
+    "analyze_embedded": "embedded",
+    "iter_attachments": "embedded",
+    "extract_page": "pages",
+    "iter_page_results": "pages",
+    "merge_page_result": "pages",
+    "TEXT_LEVELS": "pages",
+    "ResourceGovernor": "governor",
+    "CheckpointJournal": "checkpoint",
+    "load_checkpoint": "checkpoint",
+    "recover_password": "passwords",
+    "iter_candidates": "passwords",
+    "PASSWORD_RULES": "passwords",
+    "PerceptualIndex": "phash",
+    "hash_batch": "phash",
+    "near_duplicate_pairs": "phash",
+    "unpack_blocks": "pages",
+    "unpack_words": "pages",
+    "OUTPUT_SINKS": "sinks",
+    "open_sink": "sinks",
+    "DirectorySink": "sinks",
+    "SQLiteSink": "sinks",
+    "TarSink": "sinks",
+    "ArtifactWriter": "sinks",
+    "OcrPool": "ocr",
+    "PageRenderer": "render",
+    "ocr_available": "ocr",
+    "default_ocr_cache_path": "ocr",
+    "cache_key": "cache",
+    "cache_lookup": "cache",
+    "cache_restore": "cache",
+    "cache_store": "cache",
+    "cache_evict": "cache",
+    "cache_stats": "cache",
+    "ManifestStream": "manifest",
+    "iter_stream_events": "manifest",
+    "finalize_manifest": "manifest",
+    "RunMetrics": "metrics",
+    "write_prometheus_textfile": "metrics",
+    "write_profile": "metrics",
+    "setup_logging": "utils",
+    "report_paths": "utils",
+    "calculate_hashes_bytes": "utils",
+    "calculate_hashes_file": "utils",
+}
+
+__all__ = ["__version__"] + sorted(_API)
+
+
+def __getattr__(name):
+    module = _API.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_API))
@@ -0,0 +1,169 @@
+# Modo lote
+
+import datetime
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from .utils import ensure_dir, report_paths, setup_logging
+
+GLOB_CHARS = ("*", "?", "[")
+
+
+def collect_pdf_inputs(inputs, file_list=None, recursive=False):
+    # Expande diretórios, globs e listas de arquivos, sem duplicatas e em ordem estável
+    found = []
+    candidates = list(inputs or [])
+    if file_list:
+        with open(file_list, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    candidates.append(line)
+
+    for item in candidates:
+        if os.path.isdir(item):
+            if recursive:
+                for root, dirs, files in os.walk(item):
+                    dirs.sort()
+                    for name in sorted(files):
+                        if name.lower().endswith(".pdf"):
+                            found.append(os.path.join(root, name))
+            else:
+                for name in sorted(os.listdir(item)):
+                    full = os.path.join(item, name)
+                    if name.lower().endswith(".pdf") and os.path.isfile(full):
+                        found.append(full)
+        elif any(c in item for c in GLOB_CHARS):
+            found.extend(
+                p for p in sorted(glob.glob(item, recursive=True)) if os.path.isfile(p)
+            )
+        else:
+            # arquivos inexistentes seguem adiante para serem registrados como falha
+            found.append(item)
+
+    seen = set()
+    unique = []
+    for path in found:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def case_folder_names(paths):
+    # Uma pasta de caso por documento; nomes repetidos em diretórios distintos recebem sufixo
+    used = {}
+    names = []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0] or "document"
+        n = used.get(stem.lower(), 0) + 1
+        used[stem.lower()] = n
+        names.append(stem if n == 1 else f"{stem}_{n}")
+    return names
+
+
+def _batch_worker(job):
+    # PyMuPDF só é carregado quando há documento a processar: a coleta de entradas
+    # (também usada por --triage-only e pelo modo serviço) fica leve
+    from .core import process_pdf
+
+    index, pdf_input, case_folder, options = job
+    entry = {
+        "index": index,
+        "source_path": os.path.abspath(pdf_input),
+        "case_folder": case_folder,
+        "status": "ok",
+    }
+    t0 = time.time()
+    try:
+        manifest = process_pdf(pdf_input, out_base=case_folder, **options)
+        entry["manifest_path"] = report_paths(case_folder, manifest["evidence_path"])[1]
+        entry["sha256"] = manifest["hashes"]["SHA256"]
+        entry["page_count"] = manifest.get("page_count")
+        entry["summary"] = manifest.get("summary")
+        entry["suspicious"] = manifest.get("suspicious")
+        if "escalated" in manifest:
+            entry["escalated"] = manifest["escalated"]
+            entry["pretriage_matched"] = manifest["pretriage"]["matched"]
+        metrics = manifest.get("metrics")
+        if metrics:
+            # o índice do lote leva só os agregados, sem os tempos de cada página
+            pages = {
+                k: v
+                for k, v in metrics["pages"].items()
+                if k not in ("slowest", "per_page")
+            }
+            entry["metrics"] = dict(metrics, pages=pages)
+    except Exception as e:
+        logging.error("Failed to process %s: %s", pdf_input, e)
+        entry["status"] = "error"
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["elapsed_seconds"] = round(time.time() - t0, 3)
+    return entry
+
+
+def process_batch(pdf_inputs, out_base=None, workers=None, quiet=False, **options):
+    ts = int(time.time())
+    batch_folder = os.path.abspath(out_base or f"batch_{ts}")
+    ensure_dir(batch_folder)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    jobs = [
+        (i, path, os.path.join(batch_folder, name), options)
+        for i, (path, name) in enumerate(zip(pdf_inputs, case_folder_names(pdf_inputs)))
+    ]
+    logging.info(
+        "Batch: %d PDF(s), %d worker(s), output in %s", len(jobs), workers, batch_folder
+    )
+
+    entries = []
+    t0 = time.time()
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            entries.append(_batch_worker(job))
+    else:
+        # chunksize=1: documentos têm tamanhos muito diferentes, melhor balancear por arquivo
+        with multiprocessing.Pool(
+            processes=min(workers, len(jobs)),
+            initializer=setup_logging,
+            initargs=(quiet,),
+        ) as pool:
+            for entry in pool.imap_unordered(_batch_worker, jobs, chunksize=1):
+                entries.append(entry)
+                logging.info(
+                    "[%d/%d] %s: %s",
+                    len(entries),
+                    len(jobs),
+                    entry["status"],
+                    entry["source_path"],
+                )
+    entries.sort(key=lambda e: e["index"])
+
+    failed = [e for e in entries if e["status"] != "ok"]
+    index = {
+        "batch_folder": batch_folder,
+        "created_time": str(datetime.datetime.fromtimestamp(ts)),
+        "elapsed_seconds": round(time.time() - t0, 3),
+        "workers": workers,
+        "options": options,
+        "total": len(entries),
+        "succeeded": len(entries) - len(failed),
+        "failed": len(failed),
+        "documents": entries,
+    }
+    index_path = os.path.join(batch_folder, "batch_index.json")
+    with open(index_path, "w", encoding="utf-8") as jf:
+        json.dump(index, jf, indent=2, ensure_ascii=False)
+
+    logging.info(
+        "Batch done: %d ok, %d failed. Index: %s",
+        index["succeeded"],
+        index["failed"],
+        index_path,
+    )
+    return index
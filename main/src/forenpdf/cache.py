@@ -0,0 +1,296 @@
+# Cache de resultados (endereçado por conteúdo)
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+
+from . import __version__
+from .utils import ensure_dir
+
+CACHE_DEFAULT_MAX_BYTES = 10 * 1024 * 1024 * 1024
+# Campos que dependem do caso/cópia e não do conteúdo do PDF
+CACHE_CASE_FIELDS = (
+    "case_folder",
+    "source_path",
+    "evidence_path",
+    "file_size",
+    "created_time",
+    "modified_time",
+    "hashes",
+    "ingest",
+    "pretriage",
+    "escalated",
+    "metrics",
+    "tool",
+)
+_CACHE_MARKERS = {
+    "manifest": "@@FORENPDF_MANIFEST@@",
+    "evidence": "@@FORENPDF_EVIDENCE@@",
+    "case_folder": "@@FORENPDF_CASE_FOLDER@@",
+    "source": "@@FORENPDF_SOURCE@@",
+}
+
+
+def cache_key(sha256, options):
+    # options: somente parâmetros que alteram o resultado (não workers, caminhos etc.)
+    import fitz  # PyMuPDF; aqui só para a versão, sem pesar no --cache-stats
+
+    params = dict(options)
+    params.update(
+        sha256=sha256,
+        forenpdf_version=__version__,
+        pymupdf_version=getattr(fitz, "VersionBind", fitz.__doc__),
+    )
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def _cache_db(cache_dir):
+    ensure_dir(os.path.join(cache_dir, "objects"))
+    conn = sqlite3.connect(os.path.join(cache_dir, "cache.sqlite"), timeout=60)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            last_access REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        """)
+    return conn
+
+
+def _cache_count(conn, name):
+    conn.execute(
+        "INSERT INTO counters (name, value) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+        (name,),
+    )
+
+
+def _cache_entry_dir(cache_dir, key):
+    return os.path.join(cache_dir, "objects", key[:2], key)
+
+
+def _link_or_copy(src, dst):
+    ensure_dir(os.path.dirname(dst))
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _is_evidence(manifest, rel):
+    # A cópia da evidência (ingerida e conferida por hash neste caso) nunca é artefato
+    evidence = manifest.get("evidence_path")
+    return evidence is not None and os.path.abspath(
+        os.path.join(manifest["case_folder"], rel)
+    ) == os.path.abspath(evidence)
+
+
+def _cache_artifacts(manifest):
+    files = [img["file"] for img in manifest.get("images", [])]
+    files += manifest.get("extracted_files", [])
+    return [
+        f
+        for f in dict.fromkeys(files)
+        if not os.path.isabs(f)
+        and not os.path.normpath(f).startswith("..")
+        and not _is_evidence(manifest, f)
+    ]
+
+
+def cache_lookup(cache_dir, key):
+    entry_dir = _cache_entry_dir(cache_dir, key)
+    conn = _cache_db(cache_dir)
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT key FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row and os.path.isfile(os.path.join(entry_dir, "entry.json")):
+                conn.execute(
+                    "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                    (time.time(), key),
+                )
+                _cache_count(conn, "hits")
+                return entry_dir
+            _cache_count(conn, "misses")
+            return None
+    finally:
+        conn.close()
+
+
+def cache_restore(entry_dir, manifest, pdf_input, txt_report_path, json_report_path):
+    # Reconstrói manifest/relatório do caso atual a partir da entrada do cache,
+    # com hardlinks para os artefatos já extraídos
+    with open(os.path.join(entry_dir, "entry.json"), "r", encoding="utf-8") as fh:
+        entry = json.load(fh)
+    case_folder = manifest["case_folder"]
+    cached = entry["manifest"]
+    # entradas antigas guardavam a cópia da evidência como "arquivo" da revisão final;
+    # ela nunca é restaurada por cima (nem ao lado) da cópia recém-ingerida do caso
+    evidence_files = set()
+    for rev in (cached.get("revisions") or {}).get("revisions", ()):
+        if rev.get("file") and not rev["file"].startswith("revisions/"):
+            evidence_files.add(rev.pop("file"))
+            rev["evidence_copy"] = True
+    if evidence_files and "extracted_files" in cached:
+        cached["extracted_files"] = [
+            f for f in cached["extracted_files"] if f not in evidence_files
+        ]
+    for rel, size in entry["artifacts"].items():
+        if rel in evidence_files or _is_evidence(manifest, rel):
+            logging.warning("Cache entry lists the evidence copy %s; ignored", rel)
+            continue
+        src = os.path.join(entry_dir, "artifacts", rel)
+        if os.path.getsize(src) != size:
+            raise RuntimeError(f"Cached artifact changed size: {src}")
+        dst = os.path.join(case_folder, rel)
+        if os.path.exists(dst):
+            os.remove(dst)
+        _link_or_copy(src, dst)
+
+    for field in CACHE_CASE_FIELDS:
+        if field in manifest:
+            cached[field] = manifest[field]
+    cached["cache"] = {"hit": True, "key": os.path.basename(entry_dir)}
+
+    report = entry["report"]
+    m = _CACHE_MARKERS
+    report = report.replace(m["source"], str(pdf_input))
+    report = report.replace(m["manifest"], json_report_path)
+    report = report.replace(m["evidence"], manifest["evidence_path"])
+    report = report.replace(m["case_folder"], case_folder)
+    with open(txt_report_path, "w", encoding="utf-8") as fh:
+        fh.write(report)
+    return cached
+
+
+def cache_store(
+    cache_dir,
+    key,
+    manifest,
+    pdf_input,
+    txt_report_path,
+    json_report_path,
+    max_bytes=CACHE_DEFAULT_MAX_BYTES,
+):
+    entry_dir = _cache_entry_dir(cache_dir, key)
+    if os.path.isdir(entry_dir):
+        return entry_dir
+    case_folder = manifest["case_folder"]
+    with open(txt_report_path, "r", encoding="utf-8") as fh:
+        report = fh.read()
+    m = _CACHE_MARKERS
+    report = report.replace(f"Source: {pdf_input}\n", f"Source: {m['source']}\n", 1)
+    report = report.replace(json_report_path, m["manifest"])
+    report = report.replace(manifest["evidence_path"], m["evidence"])
+    report = report.replace(case_folder, m["case_folder"])
+
+    # Monta a entrada em diretório temporário e publica com rename atômico,
+    # para que workers concorrentes do modo lote não vejam entradas parciais
+    tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    artifacts = {}
+    for rel in _cache_artifacts(manifest):
+        src = os.path.join(case_folder, rel)
+        if os.path.isfile(src):
+            _link_or_copy(src, os.path.join(tmp_dir, "artifacts", rel))
+            artifacts[rel] = os.path.getsize(src)
+    entry = {
+        "key": key,
+        "manifest": {
+            k: v for k, v in manifest.items() if k not in CACHE_CASE_FIELDS + ("cache",)
+        },
+        "report": report,
+        "artifacts": artifacts,
+    }
+    ensure_dir(tmp_dir)
+    with open(os.path.join(tmp_dir, "entry.json"), "w", encoding="utf-8") as fh:
+        json.dump(entry, fh, ensure_ascii=False)
+    size = sum(artifacts.values()) + os.path.getsize(
+        os.path.join(tmp_dir, "entry.json")
+    )
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # outro worker publicou a mesma entrada primeiro
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return entry_dir
+
+    conn = _cache_db(cache_dir)
+    try:
+        with conn:
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, sha256, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, manifest["hashes"]["SHA256"], size, now, now),
+            )
+            _cache_count(conn, "stores")
+        cache_evict(cache_dir, max_bytes, conn=conn)
+    finally:
+        conn.close()
+    return entry_dir
+
+
+def cache_evict(cache_dir, max_bytes=CACHE_DEFAULT_MAX_BYTES, conn=None):
+    # LRU: remove as entradas acessadas há mais tempo até caber em max_bytes
+    own = conn is None
+    conn = conn or _cache_db(cache_dir)
+    evicted = 0
+    try:
+        with conn:
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()[0]
+            if total <= max_bytes:
+                return 0
+            for key, size in conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access ASC"
+            ).fetchall():
+                if total <= max_bytes:
+                    break
+                shutil.rmtree(_cache_entry_dir(cache_dir, key), ignore_errors=True)
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                _cache_count(conn, "evictions")
+                total -= size
+                evicted += 1
+    finally:
+        if own:
+            conn.close()
+    if evicted:
+        logging.info("Cache: evicted %d entr(y/ies) from %s", evicted, cache_dir)
+    return evicted
+
+
+def cache_stats(cache_dir):
+    conn = _cache_db(cache_dir)
+    try:
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+    finally:
+        conn.close()
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "cache_dir": os.path.abspath(cache_dir),
+        "entries": entries,
+        "total_bytes": total,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        "stores": counters.get("stores", 0),
+        "evictions": counters.get("evictions", 0),
+    }
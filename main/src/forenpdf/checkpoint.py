@@ -0,0 +1,124 @@
+# Diário de checkpoint: etapas e páginas concluídas, para retomar um processamento
+# interrompido sem refazer a cópia, os hashes e as páginas já extraídas
+
+import json
+import logging
+import os
+
+from .ingest import sha256_file
+
+# Páginas entre gravações (com fsync) do diário
+CHECKPOINT_PAGES = 50
+
+
+def checkpoint_path(case_folder, evidence_name):
+    stem = os.path.splitext(os.path.basename(evidence_name))[0]
+    return os.path.join(case_folder, "reports", f"{stem}_checkpoint.jsonl")
+
+
+def _options_key(options):
+    # tuplas viram listas no JSON: compara sempre a forma serializada
+    return json.loads(json.dumps(options, sort_keys=True))
+
+
+class CheckpointJournal:
+    # Uma linha JSON por evento ("start", "stage", "xref", "page"). Páginas ficam
+    # pendentes até o próximo checkpoint, que primeiro espera os artefatos serem gravados:
+    # uma página no diário sempre tem suas imagens no disco.
+
+    def __init__(self, path, writer, header=None, every=CHECKPOINT_PAGES, offset=None):
+        self.path = path
+        self.writer = writer
+        self.every = max(1, every)
+        self.pending = []
+        if offset is None:
+            self.fh = open(path, "w", encoding="utf-8")
+            self.record("start", header)
+            self.sync()
+        else:
+            # retomada: descarta a última linha truncada e continua o mesmo diário
+            with open(path, "r+b") as fh:
+                fh.truncate(offset)
+            self.fh = open(path, "a", encoding="utf-8")
+
+    def record(self, event, data):
+        self.pending.append(
+            json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+        )
+
+    def stage(self, name, data):
+        self.record("stage", {"name": name, "data": data})
+        self.sync()
+
+    def page(self, res):
+        self.record("page", {k: v for k, v in res.items() if k != "blobs"})
+        if len(self.pending) >= self.every:
+            self.sync()
+
+    def sync(self):
+        if not self.pending:
+            return
+        self.writer.flush()
+        self.fh.writelines(self.pending)
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        self.pending = []
+
+    def close(self, remove=False):
+        # remove=True: processamento concluído, o diário não serve mais
+        if not self.fh.closed:
+            if not remove:
+                self.sync()
+            self.fh.close()
+        if remove:
+            os.remove(self.path)
+
+
+def load_checkpoint(path, options, evidence_path):
+    # Estado do diário ({"start", "stages", "xrefs", "pages", "offset"}) ou None se não
+    # houver diário, se as opções mudaram ou se a cópia da evidência não confere
+    if not os.path.isfile(path):
+        return None
+    state = {"start": None, "stages": {}, "xrefs": [], "pages": [], "offset": 0}
+    with open(path, "rb") as fh:
+        for line in fh:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                ev = json.loads(line)
+            except ValueError:
+                break
+            event, data = ev["event"], ev["data"]
+            if event == "start":
+                state["start"] = data
+            elif event == "stage":
+                state["stages"][data["name"]] = data["data"]
+            elif event == "xref":
+                state["xrefs"].append(data)
+            elif event == "page":
+                # só o prefixo contíguo de páginas vale
+                if data["page_number"] != len(state["pages"]) + 1:
+                    break
+                state["pages"].append(data)
+            state["offset"] += len(line)
+    start = state["start"]
+    if start is None:
+        return None
+    if start["options"] != _options_key(options):
+        logging.warning("Checkpoint %s was written with other options; ignoring", path)
+        return None
+    if (
+        not os.path.isfile(evidence_path)
+        or sha256_file(evidence_path) != start["hashes"]["SHA256"]
+    ):
+        logging.warning("Evidence copy changed since checkpoint %s; ignoring", path)
+        return None
+    return state
+
+
+def checkpoint_header(options, hashes, ingest_stats):
+    return {
+        "options": _options_key(options),
+        "hashes": hashes,
+        "ingest": ingest_stats,
+    }
@@ -0,0 +1,573 @@
+# Linha de comando
+
+import argparse
+import json
+import logging
+import os
+
+# Só módulos leves no topo: PyMuPDF (core/batch) e o OCR são carregados depois do
+# parse dos argumentos, e apenas quando o comando precisa deles
+from .cache import CACHE_DEFAULT_MAX_BYTES, cache_stats
+from .checkpoint import CHECKPOINT_PAGES
+from .governor import STORE_SHRINK_PAGES
+from .ocr import OCR_MIN_PIXELS, PAGE_OCR_DPI, default_ocr_cache_path
+from .passwords import (
+    DEFAULT_PASSWORD_RULES,
+    PASSWORD_MAX_SECONDS,
+    PASSWORD_RULES,
+    PASSWORD_YEARS,
+    parse_password_rules,
+    parse_years,
+)
+from .phash import PHASH_MAX_DISTANCE
+from .pretriage import DEFAULT_ESCALATE_ON, iter_pretriage, parse_escalation_rules
+from .sinks import OUTPUT_SINKS
+from .utils import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forensic PDF processor")
+    parser.add_argument(
+        "pdf",
+        nargs="*",
+        help="PDF(s) to analyze; directories and glob patterns enable batch mode",
+    )
+    parser.add_argument("--out", help="Output folder base", default=None)
+    parser.add_argument(
+        "--no-ocr", action="store_true", help="Disable OCR even if available"
+    )
+    parser.add_argument(
+        "--ocr-workers",
+        type=int,
+        default=None,
+        help="OCR worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--ocr-min-pixels",
+        type=int,
+        default=OCR_MIN_PIXELS,
+        help=f"Skip OCR for images smaller than this many pixels (default: {OCR_MIN_PIXELS})",
+    )
+    parser.add_argument(
+        "--ocr-pages",
+        action="store_true",
+        help="Render pages without a text layer (scans) and OCR them; the OCR text goes "
+        "through IOC extraction like native text",
+    )
+    parser.add_argument(
+        "--render-dpi",
+        type=int,
+        default=PAGE_OCR_DPI,
+        help=f"Resolution for rendering text-less pages (default: {PAGE_OCR_DPI})",
+    )
+    parser.add_argument(
+        "--thumbnails",
+        action="store_true",
+        help="Save low-resolution thumbnails of the text-less pages",
+    )
+    parser.add_argument(
+        "--ocr-cache",
+        default=None,
+        help="SQLite OCR cache shared across cases (default: ~/.cache/forenpdf/ocr.sqlite)",
+    )
+    parser.add_argument(
+        "--no-ocr-cache", action="store_true", help="Do not read or write the OCR cache"
+    )
+    parser.add_argument(
+        "--max-xref",
+        type=int,
+        default=0,
+        help="Max xref objects to triage (default: 0 = whole document)",
+    )
+    parser.add_argument(
+        "--no-embedded",
+        action="store_true",
+        help="Do not attempt to extract embedded files",
+    )
+    parser.add_argument(
+        "--embedded-depth",
+        type=int,
+        default=None,
+        help="Nesting levels of embedded PDFs to analyze (default: 3, 0 = extract only)",
+    )
+    parser.add_argument(
+        "--embedded-max-size",
+        type=int,
+        default=None,
+        help="Byte budget in MB for all embedded files of a document (default: 256)",
+    )
+    parser.add_argument(
+        "--embedded-workers",
+        type=int,
+        default=1,
+        help="Processes analyzing embedded PDFs in parallel (default: 1)",
+    )
+    parser.add_argument(
+        "--file-list", help="Text file with one PDF path per line (batch mode)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes in batch mode (default: CPU count)",
+    )
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        help="Descend into subdirectories when a directory is given",
+    )
+    parser.add_argument(
+        "--page-workers",
+        type=int,
+        default=1,
+        help="Worker processes for page-parallel extraction of a single PDF",
+    )
+    parser.add_argument(
+        "--text-level",
+        choices=("plain", "blocks", "words", "rawdict"),
+        default="plain",
+        help="Text view per page besides plain text, from the same parse: block "
+        "bboxes, word bboxes or character-level rawdict files (default: plain)",
+    )
+    parser.add_argument(
+        "--phash",
+        action="store_true",
+        help="Compute aHash/dHash/pHash of every extracted image (needs NumPy) and "
+        "group near-duplicates in the report",
+    )
+    parser.add_argument(
+        "--phash-distance",
+        type=int,
+        default=PHASH_MAX_DISTANCE,
+        help="Maximum pHash Hamming distance between near-duplicate images "
+        f"(default: {PHASH_MAX_DISTANCE})",
+    )
+    parser.add_argument(
+        "--page-timeout",
+        type=float,
+        default=None,
+        help="Wall-time budget in seconds per page; remaining stages of a slow page are "
+        "skipped and the page is marked partial",
+    )
+    parser.add_argument(
+        "--doc-timeout",
+        type=float,
+        default=None,
+        help="Wall-time budget in seconds per document; later pages and stages are "
+        "skipped once it is spent",
+    )
+    parser.add_argument(
+        "--image-max-size",
+        type=int,
+        default=None,
+        help="Skip images whose declared decoded size exceeds this many MB "
+        "(decompression bombs)",
+    )
+    parser.add_argument(
+        "--max-rss",
+        type=int,
+        default=None,
+        help="RSS budget in MB; over it the MuPDF store is freed and, if that is not "
+        "enough, page stages are skipped",
+    )
+    parser.add_argument(
+        "--store-shrink-pages",
+        type=int,
+        default=STORE_SHRINK_PAGES,
+        help=f"Free the MuPDF store every N pages (default: {STORE_SHRINK_PAGES}, "
+        "0 = never)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run in the same --out from its checkpoint journal "
+        "(batch mode: finished documents are skipped)",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=CHECKPOINT_PAGES,
+        metavar="N",
+        help=f"Sync the checkpoint journal every N pages (default: {CHECKPOINT_PAGES}, "
+        "0 = no journal)",
+    )
+    parser.add_argument(
+        "--xref-iocs",
+        action="store_true",
+        help="Also scan raw object/stream content for IOCs during xref triage",
+    )
+    parser.add_argument(
+        "--stream-manifest",
+        action="store_true",
+        help="Write the manifest as JSON Lines while processing (bounded memory)",
+    )
+    parser.add_argument(
+        "--finalize-manifest",
+        metavar="JSONL",
+        help="Build the single-JSON manifest from a *_manifest.jsonl stream and exit",
+    )
+    parser.add_argument(
+        "--output-sink",
+        choices=OUTPUT_SINKS,
+        default="dir",
+        help="Where extracted artifacts go: loose files (dir), one SQLite database "
+        "or one append-only tar per case",
+    )
+    parser.add_argument(
+        "--cache-dir", help="Reuse results of byte-identical PDFs from this cache"
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        default=CACHE_DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="Cache size limit in MB before LRU eviction (default: 10240)",
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Print cache hit/miss statistics for --cache-dir and exit",
+    )
+    parser.add_argument(
+        "--index-db",
+        metavar="PATH",
+        help="SQLite cross-case correlation index: every run records its IOCs, image "
+        "hashes, metadata and suspicious-xref hashes here",
+    )
+    parser.add_argument(
+        "--index-query",
+        metavar="VALUE",
+        help="Print the documents in --index-db that contain this value and exit",
+    )
+    parser.add_argument(
+        "--index-kind",
+        action="append",
+        metavar="KIND",
+        help="Restrict --index-query/--index-pivot to this observable kind "
+        "(e.g. urls, image_sha256, metadata.author); repeatable",
+    )
+    parser.add_argument(
+        "--index-pivot",
+        metavar="SHA256",
+        help="Print the documents in --index-db sharing any observable with the "
+        "document of this SHA256 and exit",
+    )
+    parser.add_argument(
+        "--index-import",
+        action="append",
+        metavar="PATH",
+        help="Backfill --index-db from existing *_manifest.json files or case "
+        "directories and exit; repeatable",
+    )
+    parser.add_argument(
+        "--index-stats",
+        action="store_true",
+        help="Print document/observable counts of --index-db and exit",
+    )
+    parser.add_argument(
+        "--index-limit",
+        type=int,
+        default=1000,
+        help="Maximum rows printed by --index-query/--index-pivot (default: 1000)",
+    )
+    parser.add_argument(
+        "--revisions",
+        action="store_true",
+        help="Carve every incremental-update revision with its own hashes and diff "
+        "consecutive revisions at the object level",
+    )
+    parser.add_argument(
+        "--triage-only",
+        action="store_true",
+        help="Only run the raw-byte pre-triage (no PyMuPDF, no copies) and print one "
+        "JSON line per file",
+    )
+    parser.add_argument(
+        "--escalate-on",
+        metavar="RULES",
+        help="Pre-triage every file and run the full pipeline only if one of these "
+        "comma-separated rules matches (e.g. javascript,launch,trailing_data; "
+        "'default' or 'all')",
+    )
+    parser.add_argument(
+        "--password",
+        action="append",
+        default=[],
+        help="Known or suspected password of encrypted PDFs (repeatable; tried first)",
+    )
+    parser.add_argument(
+        "--password-word",
+        action="append",
+        default=[],
+        metavar="WORD",
+        help="Case-specific base word for password recovery, e.g. a suspect's name, "
+        "nickname or date (repeatable); the rules generate its variants",
+    )
+    parser.add_argument(
+        "--wordlist",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="Password candidate list, one per line (repeatable); the rules also "
+        "apply to every line",
+    )
+    parser.add_argument(
+        "--password-rules",
+        metavar="RULES",
+        default="default",
+        help="Comma-separated variant rules for password recovery "
+        f"({', '.join(PASSWORD_RULES)}; 'default' = "
+        f"{','.join(DEFAULT_PASSWORD_RULES)}, 'all' or 'none')",
+    )
+    parser.add_argument(
+        "--password-years",
+        metavar="START-END",
+        default=f"{PASSWORD_YEARS[0]}-{PASSWORD_YEARS[1]}",
+        help="Year range of the years/combined/dates rules "
+        f"(default: {PASSWORD_YEARS[0]}-{PASSWORD_YEARS[1]})",
+    )
+    parser.add_argument(
+        "--password-timeout",
+        type=float,
+        default=PASSWORD_MAX_SECONDS,
+        help="Wall-time budget in seconds for password recovery per document "
+        f"(default: {PASSWORD_MAX_SECONDS}, 0 = no limit)",
+    )
+    parser.add_argument(
+        "--password-workers",
+        type=int,
+        default=None,
+        help="Worker processes for password recovery (default: CPU count)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Service mode: watch the given directories and process new PDFs as they "
+        "arrive (requires --out)",
+    )
+    parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=None,
+        help="Watch mode: seconds a file must stay unchanged before processing "
+        "(default: 5)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=None,
+        help="Watch mode: directory scan interval when inotify is not used (default: 2)",
+    )
+    parser.add_argument(
+        "--no-inotify",
+        action="store_true",
+        help="Watch mode: always poll (e.g. for SMB/NFS shares)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=None,
+        help="Watch mode: documents queued beyond the busy workers (default: 2 x workers)",
+    )
+    parser.add_argument(
+        "--status-file",
+        help="Watch mode: JSON status file (default: <out>/watch_status.json)",
+    )
+    parser.add_argument(
+        "--status-socket",
+        help="Watch mode: also serve the status JSON on this Unix socket",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        metavar="PATH",
+        help="Also export run metrics in Prometheus textfile format (node_exporter)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run under cProfile and save the stats next to the reports",
+    )
+    parser.add_argument("--quiet", action="store_true", help="Less logging")
+    args = parser.parse_args()
+
+    if args.finalize_manifest:
+        from .manifest import finalize_manifest
+
+        print(finalize_manifest(args.finalize_manifest))
+        return 0
+    if args.cache_stats:
+        if not args.cache_dir:
+            parser.error("--cache-stats requires --cache-dir")
+        print(json.dumps(cache_stats(args.cache_dir), indent=2))
+        return 0
+    if args.index_query or args.index_pivot or args.index_import or args.index_stats:
+        if not args.index_db:
+            parser.error("the --index-* commands require --index-db")
+        from . import correlation
+
+        if args.index_import:
+            setup_logging(quiet=args.quiet)
+            result = correlation.import_manifests(args.index_db, args.index_import)
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+            return 1 if result["errors"] else 0
+        if args.index_stats:
+            print(json.dumps(correlation.index_stats(args.index_db), indent=2))
+            return 0
+        if args.index_query:
+            rows = correlation.query_index(
+                args.index_db, args.index_query, args.index_kind, args.index_limit
+            )
+        else:
+            rows = correlation.pivot_index(
+                args.index_db, args.index_pivot, args.index_kind, args.index_limit
+            )
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        return 0
+    if not args.pdf and not args.file_list:
+        parser.error("give at least one PDF, directory or glob, or --file-list")
+    escalate_on = None
+    if args.escalate_on:
+        try:
+            escalate_on = parse_escalation_rules(args.escalate_on)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.triage_only:
+        setup_logging(quiet=True)
+        from .batch import collect_pdf_inputs
+
+        inputs = collect_pdf_inputs(args.pdf, args.file_list, recursive=args.recursive)
+        errors = 0
+        for result in iter_pretriage(
+            inputs,
+            workers=args.workers or os.cpu_count() or 1,
+            escalate_on=escalate_on or DEFAULT_ESCALATE_ON,
+        ):
+            errors += "error" in result
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+        return 1 if errors else 0
+
+    try:
+        password_rules = parse_password_rules(args.password_rules)
+        password_years = parse_years(args.password_years)
+    except ValueError as e:
+        parser.error(str(e))
+    missing = [p for p in args.wordlist if not os.path.isfile(p)]
+    if missing:
+        parser.error(f"wordlist not found: {', '.join(missing)}")
+
+    if args.resume and (not args.out or args.watch):
+        parser.error("--resume needs the --out of the interrupted run (not --watch)")
+
+    setup_logging(quiet=args.quiet)
+    options = dict(
+        max_xref=args.max_xref or None,
+        do_ocr=not args.no_ocr,
+        extract_embedded=(not args.no_embedded),
+        embedded_max_depth=args.embedded_depth,
+        embedded_max_bytes=(
+            args.embedded_max_size * 1024 * 1024
+            if args.embedded_max_size is not None
+            else None
+        ),
+        embedded_workers=args.embedded_workers,
+        page_workers=args.page_workers,
+        text_level=args.text_level,
+        perceptual_hashes=args.phash,
+        phash_distance=args.phash_distance,
+        page_max_seconds=args.page_timeout,
+        doc_max_seconds=args.doc_timeout,
+        image_max_bytes=(
+            args.image_max_size * 1024 * 1024
+            if args.image_max_size is not None
+            else None
+        ),
+        rss_max_bytes=args.max_rss * 1024 * 1024 if args.max_rss is not None else None,
+        store_shrink_pages=args.store_shrink_pages,
+        resume=args.resume,
+        checkpoint_pages=args.checkpoint_every,
+        xref_iocs=args.xref_iocs,
+        stream_manifest=args.stream_manifest,
+        output_sink=args.output_sink,
+        ocr_workers=args.ocr_workers,
+        ocr_min_pixels=args.ocr_min_pixels,
+        ocr_pages=args.ocr_pages,
+        render_dpi=args.render_dpi,
+        thumbnails=args.thumbnails,
+        ocr_cache=(
+            None if args.no_ocr_cache else (args.ocr_cache or default_ocr_cache_path())
+        ),
+        escalate_on=escalate_on,
+        revisions=args.revisions,
+        passwords=args.password,
+        password_words=args.password_word,
+        password_wordlists=[os.path.abspath(p) for p in args.wordlist],
+        password_rules=password_rules,
+        password_years=password_years,
+        password_max_seconds=args.password_timeout or None,
+        password_workers=args.password_workers,
+        index_db=os.path.abspath(args.index_db) if args.index_db else None,
+        cache_dir=os.path.abspath(args.cache_dir) if args.cache_dir else None,
+        cache_max_bytes=args.cache_max_size * 1024 * 1024,
+        profile=args.profile,
+    )
+
+    if args.watch:
+        if not args.out or not args.pdf:
+            parser.error("--watch needs one or more directories and --out")
+        missing = [d for d in args.pdf if not os.path.isdir(d)]
+        if missing:
+            parser.error(f"not a directory: {', '.join(missing)}")
+        from .watch import WatchService
+
+        service = WatchService(
+            args.pdf,
+            args.out,
+            workers=args.workers,
+            queue_size=args.queue_size,
+            recursive=args.recursive,
+            settle_seconds=args.settle_seconds,
+            poll_interval=args.poll_interval,
+            use_inotify=not args.no_inotify,
+            status_file=args.status_file,
+            status_socket=args.status_socket,
+            quiet=args.quiet,
+            **options,
+        )
+        counts = service.run()
+        return 1 if counts["failed"] else 0
+
+    from .batch import GLOB_CHARS, collect_pdf_inputs, process_batch
+    from .core import process_pdf
+    from .metrics import write_prometheus_textfile
+
+    batch = (
+        args.file_list
+        or len(args.pdf) > 1
+        or any(os.path.isdir(p) or any(c in p for c in GLOB_CHARS) for p in args.pdf)
+    )
+    if not batch:
+        manifest = process_pdf(args.pdf[0], out_base=args.out, **options)
+        if args.metrics_textfile:
+            write_prometheus_textfile(
+                args.metrics_textfile,
+                [(os.path.basename(manifest["case_folder"]), manifest.get("metrics"))],
+            )
+        return 0
+
+    inputs = collect_pdf_inputs(args.pdf, args.file_list, recursive=args.recursive)
+    if not inputs:
+        logging.error("No PDF files found in the given inputs.")
+        return 1
+    index = process_batch(
+        inputs, out_base=args.out, workers=args.workers, quiet=args.quiet, **options
+    )
+    if args.metrics_textfile:
+        write_prometheus_textfile(
+            args.metrics_textfile,
+            [
+                (os.path.basename(e["case_folder"]), e.get("metrics"))
+                for e in index["documents"]
+            ],
+        )
+    return 1 if index["failed"] else 0
@@ -0,0 +1,871 @@
+# Processamento de um PDF
+
+import cProfile
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+
+import fitz  # PyMuPDF
+
+from . import __version__
+from .cache import (
+    CACHE_DEFAULT_MAX_BYTES,
+    cache_key,
+    cache_lookup,
+    cache_restore,
+    cache_store,
+)
+from .checkpoint import (
+    CHECKPOINT_PAGES,
+    CheckpointJournal,
+    checkpoint_header,
+    checkpoint_path,
+    load_checkpoint,
+)
+from .correlation import index_manifest
+from .embedded import (
+    EMBEDDED_MAX_BYTES,
+    EMBEDDED_MAX_DEPTH,
+    analyze_embedded,
+    embedded_report_line,
+)
+from .governor import STORE_SHRINK_PAGES, ResourceGovernor
+from .ingest import ingest_evidence, sha256_file
+from .manifest import (
+    STREAM_LIST_KEYS,
+    ManifestStream,
+    finalize_manifest,
+    iter_stream_events,
+    stream_manifest_path,
+)
+from .metrics import RunMetrics, write_profile
+from .ocr import OCR_MIN_PIXELS, PAGE_OCR_DPI, OcrPool, ocr_available
+from .pages import (
+    TEXT_LEVELS,
+    add_extracted_file,
+    format_image_clusters,
+    iter_page_results,
+    merge_page_result,
+)
+from .passwords import (
+    DEFAULT_PASSWORD_RULES,
+    PASSWORD_MAX_SECONDS,
+    PASSWORD_YEARS,
+    iter_candidates,
+    recover_password,
+    wordlist_sources,
+)
+from .phash import PHASH_MAX_DISTANCE, PerceptualIndex, perceptual_available
+from .pretriage import format_pretriage, pretriage_file, write_pretriage_report
+from .render import PageRenderer
+from .revisions import carve_revisions, format_revisions
+from .sinks import ArtifactWriter, open_sink
+from .triage import (
+    EMBEDDEDFILE_KEYWORDS,
+    JAVASCRIPT_KEYWORDS,
+    dump_javascript,
+    javascript_code,
+    triage_xrefs,
+)
+from .utils import ensure_dir, report_paths, safe_decode
+
+
+def _update_index(index_db, manifest, json_report_path):
+    # Falha no índice de correlação não invalida o processamento do documento
+    try:
+        if "manifest_stream" in manifest:
+            # no modo streaming as listas só existem no manifest finalizado
+            with open(json_report_path, "r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        count = index_manifest(index_db, manifest, json_report_path)
+        logging.info("Correlation index %s: %d observable(s) recorded", index_db, count)
+    except Exception as e:
+        logging.warning("Could not update correlation index %s: %s", index_db, e)
+
+
+def process_pdf(
+    pdf_input,
+    out_base=None,
+    max_xref=None,
+    do_ocr=True,
+    extract_embedded=True,
+    page_workers=1,
+    text_level="plain",
+    xref_iocs=False,
+    ocr_workers=None,
+    ocr_min_pixels=OCR_MIN_PIXELS,
+    ocr_cache=None,
+    ocr_pages=False,
+    render_dpi=PAGE_OCR_DPI,
+    thumbnails=False,
+    perceptual_hashes=False,
+    phash_distance=PHASH_MAX_DISTANCE,
+    stream_manifest=False,
+    output_sink="dir",
+    embedded_max_depth=None,
+    embedded_max_bytes=None,
+    embedded_workers=1,
+    escalate_on=None,
+    revisions=False,
+    passwords=None,
+    password_words=None,
+    password_wordlists=None,
+    password_rules=DEFAULT_PASSWORD_RULES,
+    password_years=PASSWORD_YEARS,
+    password_max_seconds=PASSWORD_MAX_SECONDS,
+    password_workers=None,
+    index_db=None,
+    page_max_seconds=None,
+    doc_max_seconds=None,
+    image_max_bytes=None,
+    rss_max_bytes=None,
+    store_shrink_pages=STORE_SHRINK_PAGES,
+    resume=False,
+    checkpoint_pages=CHECKPOINT_PAGES,
+    cache_dir=None,
+    cache_max_bytes=CACHE_DEFAULT_MAX_BYTES,
+    profile=False,
+):
+    if not os.path.isfile(pdf_input):
+        raise FileNotFoundError(pdf_input)
+    out_base = out_base or f"evidence_{int(time.time())}"
+    if profile:
+        # Reexecuta sob o cProfile com os mesmos argumentos; workers de página e de OCR
+        # rodam em outros processos e ficam fora do perfil
+        options = dict(locals(), profile=False)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(process_pdf, **options)
+        finally:
+            write_profile(profiler, os.path.abspath(out_base), pdf_input)
+    if text_level not in TEXT_LEVELS:
+        raise ValueError(f"text_level must be one of {', '.join(TEXT_LEVELS)}")
+    do_ocr = bool(do_ocr) and ocr_available()
+    if ocr_pages and not do_ocr:
+        logging.info("OCR unavailable or disabled: text-less pages are not OCRed")
+    ocr_pages = bool(ocr_pages) and do_ocr
+    render_pages = ocr_pages or bool(thumbnails)
+    if perceptual_hashes and not perceptual_available():
+        logging.warning("NumPy not installed: perceptual hashes disabled")
+    perceptual_hashes = bool(perceptual_hashes) and perceptual_available()
+    if embedded_max_depth is None:
+        embedded_max_depth = EMBEDDED_MAX_DEPTH
+    if embedded_max_bytes is None:
+        embedded_max_bytes = EMBEDDED_MAX_BYTES
+    metrics = RunMetrics()
+    governor = ResourceGovernor(
+        page_seconds=page_max_seconds,
+        doc_seconds=doc_max_seconds,
+        image_max_bytes=image_max_bytes,
+        rss_max_bytes=rss_max_bytes,
+        store_shrink_pages=store_shrink_pages,
+    )
+    budget_report = {
+        "budgets": {
+            k: v for k, v in governor.budgets().items() if k != "deadline" and v
+        },
+        "partial_pages": [],
+        "images_skipped": 0,
+        "skipped_stages": [],
+        "store_shrinks": 0,
+    }
+
+    def stage_allowed(name):
+        # Etapas do documento puladas quando o orçamento de tempo/RSS já estourou
+        reason = governor.exceeded(page=False)
+        if reason:
+            logging.warning("Budget exceeded (%s): skipping stage %s", reason, name)
+            budget_report["skipped_stages"].append({"stage": name, "reason": reason})
+        return reason is None
+
+    case_folder = os.path.abspath(out_base)
+    ensure_dir(case_folder)
+
+    original_copy_path = os.path.join(case_folder, os.path.basename(pdf_input))
+    txt_report_path, json_report_path = report_paths(case_folder, original_copy_path)
+    # Parâmetros que alteram o resultado: chave do cache e validade do checkpoint
+    result_options = {
+        "max_xref": max_xref,
+        "do_ocr": do_ocr,
+        "ocr_min_pixels": ocr_min_pixels if do_ocr else None,
+        "extract_embedded": bool(extract_embedded),
+        "embedded_max_depth": embedded_max_depth if extract_embedded else None,
+        "embedded_max_bytes": embedded_max_bytes if extract_embedded else None,
+        "xref_iocs": bool(xref_iocs),
+        "text_level": text_level,
+        "revisions": bool(revisions),
+        "ocr_pages": ocr_pages,
+        "render_dpi": render_dpi if ocr_pages else None,
+        "thumbnails": bool(thumbnails),
+        "perceptual_hashes": perceptual_hashes,
+        "phash_distance": phash_distance if perceptual_hashes else None,
+    }
+
+    journal_path = checkpoint_path(case_folder, original_copy_path)
+    resumed = None
+    if resume and output_sink != "dir":
+        logging.info("Resume is only available with the directory sink")
+    elif resume:
+        with metrics.stage("resume"):
+            resumed = load_checkpoint(journal_path, result_options, original_copy_path)
+            if resumed is not None:
+                # o diário vale para a cópia do caso; a origem também tem de ser a mesma
+                # (outro arquivo com o mesmo nome, ou o original alterado, recomeça)
+                metrics.count("bytes_read", os.path.getsize(pdf_input))
+                if sha256_file(pdf_input) != resumed["start"]["hashes"]["SHA256"]:
+                    logging.warning(
+                        "Source %s differs from checkpoint %s; starting over",
+                        pdf_input,
+                        journal_path,
+                    )
+                    resumed = None
+        if (
+            resumed is None
+            and not os.path.exists(journal_path)
+            and os.path.isfile(json_report_path)
+        ):
+            # sem diário e com manifest: o caso já foi concluído (modo lote retomado)
+            with open(json_report_path, "r", encoding="utf-8") as fh:
+                done = json.load(fh)
+            if not done.get("incomplete") and done.get("hashes", {}).get(
+                "SHA256"
+            ) == sha256_file(pdf_input):
+                logging.info("Resume: %s is already complete", case_folder)
+                return done
+
+    if resumed:
+        # a cópia foi rehasheada para validar o diário
+        metrics.count("bytes_read", os.path.getsize(original_copy_path))
+        hashes = resumed["start"]["hashes"]
+        ingest_stats = resumed["start"]["ingest"]
+        logging.info(
+            "Resuming from checkpoint %s: %d page(s) and stages %s already done",
+            journal_path,
+            len(resumed["pages"]),
+            ", ".join(resumed["stages"]) or "none",
+        )
+    else:
+        with metrics.stage("ingest"):
+            hashes, ingest_stats = ingest_evidence(pdf_input, original_copy_path)
+        # a verificação relê a cópia inteira
+        metrics.count(
+            "bytes_read", ingest_stats["bytes"] * (2 if ingest_stats["verified"] else 1)
+        )
+        metrics.count("bytes_written", ingest_stats["bytes"])
+        logging.info(
+            "Copied original to evidence folder: %s (%s MB/s, verified=%s)",
+            original_copy_path,
+            ingest_stats["throughput_mb_s"],
+            ingest_stats["verified"],
+        )
+
+    st = os.stat(original_copy_path)
+    created_time = datetime.datetime.fromtimestamp(st.st_ctime)
+    modified_time = datetime.datetime.fromtimestamp(st.st_mtime)
+
+    manifest = {
+        "case_folder": case_folder,
+        "source_path": os.path.abspath(pdf_input),
+        "evidence_path": original_copy_path,
+        "file_size": st.st_size,
+        "created_time": str(created_time),
+        "modified_time": str(modified_time),
+        "hashes": hashes,
+        "ingest": ingest_stats,
+        "pages": [],
+        "images": [],
+        "links": [],
+        "ioc_index": {},
+        "suspicious": {"javascript_xrefs": [], "embeddedfile_xrefs": []},
+        "extracted_files": [],
+        "embedded_files": [],
+        "tool": {
+            "python_version": sys.version,
+            "pymupdf_version": fitz.__doc__ if hasattr(fitz, "__doc__") else str(fitz),
+            "forenpdf_version": __version__,
+        },
+    }
+
+    # Prepare output dirs
+    reports_dir = os.path.join(case_folder, "reports")
+    ensure_dir(reports_dir)
+
+    if escalate_on:
+        # Política de escalonamento: a cópia da evidência é mapeada e varrida crua; só
+        # segue para o PyMuPDF se alguma regra casar
+        with metrics.stage("pretriage"):
+            pre = pretriage_file(original_copy_path, escalate_on)
+        metrics.count("bytes_read", st.st_size)
+        manifest["pretriage"] = pre
+        manifest["escalated"] = bool(pre["matched"])
+        if not pre["matched"]:
+            write_pretriage_report(txt_report_path, manifest)
+            manifest["metrics"] = metrics.as_dict()
+            with open(json_report_path, "w", encoding="utf-8") as jf:
+                json.dump(manifest, jf, indent=2, ensure_ascii=False)
+            if index_db:
+                _update_index(index_db, manifest, json_report_path)
+            logging.info(
+                "Pre-triage: no escalation rule matched, full processing skipped. "
+                "Reports: %s and %s",
+                txt_report_path,
+                json_report_path,
+            )
+            return manifest
+        logging.info("Pre-triage matched %s; escalating", ", ".join(pre["matched"]))
+    if output_sink == "dir":
+        ensure_dir(os.path.join(case_folder, "extracted_images"))
+
+    key = None
+    if cache_dir and (stream_manifest or output_sink != "dir"):
+        logging.info(
+            "Result cache is only used with the directory sink and a regular manifest"
+        )
+    elif cache_dir:
+        key = cache_key(hashes["SHA256"], result_options)
+        with metrics.stage("cache_lookup"):
+            entry_dir = cache_lookup(cache_dir, key)
+        if entry_dir:
+            try:
+                with metrics.stage("cache_restore"):
+                    manifest = cache_restore(
+                        entry_dir,
+                        manifest,
+                        pdf_input,
+                        txt_report_path,
+                        json_report_path,
+                    )
+                metrics.count("result_cache_hits")
+                manifest["metrics"] = metrics.as_dict()
+                with open(json_report_path, "w", encoding="utf-8") as jf:
+                    json.dump(manifest, jf, indent=2, ensure_ascii=False)
+                if index_db:
+                    _update_index(index_db, manifest, json_report_path)
+                logging.info(
+                    "Cache hit (%s). Reports: %s and %s",
+                    key[:12],
+                    txt_report_path,
+                    json_report_path,
+                )
+                return manifest
+            except Exception as e:
+                logging.warning("Cache entry %s unusable, reprocessing: %s", key, e)
+        metrics.count("result_cache_misses")
+
+    stream = None
+    if stream_manifest:
+        stream = ManifestStream(stream_manifest_path(json_report_path))
+        manifest["manifest_stream"] = os.path.relpath(stream.path, case_folder)
+        stream.emit(
+            "start", {k: v for k, v in manifest.items() if k not in STREAM_LIST_KEYS}
+        )
+        # tempos de cada página também viram eventos, fora de metrics.per_page
+        metrics.on_page = lambda row: stream.emit("page_metrics", row)
+
+    sink = open_sink(output_sink, case_folder)
+    if sink.container:
+        manifest["output"] = {"sink": sink.name, "container": sink.container}
+    writer = ArtifactWriter(sink)
+    journal = None
+    if checkpoint_pages and output_sink == "dir":
+        journal = CheckpointJournal(
+            journal_path,
+            writer,
+            checkpoint_header(result_options, hashes, ingest_stats),
+            every=checkpoint_pages,
+            offset=resumed["offset"] if resumed else None,
+        )
+    ocr = None
+    if do_ocr:
+
+        def on_ocr(rec):
+            # no modo streaming o registro da imagem já foi gravado: OCR vira evento
+            stream.emit(
+                "ocr",
+                {k: rec[k] for k in ("hash", "file", "ocr_snippet")},
+            )
+
+        ocr = OcrPool(
+            ocr_workers,
+            ocr_cache,
+            min_pixels=ocr_min_pixels,
+            on_result=on_ocr if stream is not None else None,
+        )
+
+    renderer = None
+
+    # Open doc
+    with metrics.stage("open"):
+        doc = fitz.open(original_copy_path)
+    try:
+        # PDF criptografado (doc.needs_pass): senhas informadas, palavras do caso e
+        # listas, com as regras de variação, são testadas em paralelo; a senha achada
+        # destrava este handle e é repassada aos workers, que abrem o seu
+        password = None
+        if getattr(doc, "needs_pass", False):
+            if resumed and "password_recovery" in resumed["stages"]:
+                recovery = resumed["stages"]["password_recovery"]
+            elif passwords or password_words or password_wordlists:
+                wordlists = list(password_wordlists or ())
+                with metrics.stage("password_recovery"):
+                    recovery = recover_password(
+                        original_copy_path,
+                        iter_candidates(
+                            passwords or (),
+                            password_words or (),
+                            wordlists,
+                            password_rules,
+                            password_years,
+                        ),
+                        workers=password_workers,
+                        max_seconds=password_max_seconds,
+                    )
+                recovery.update(
+                    wordlists=wordlist_sources(wordlists),
+                    words=list(password_words or ()),
+                    passwords_given=len(passwords or ()),
+                    rules=list(password_rules),
+                    years=list(password_years),
+                )
+                metrics.count("password_attempts", recovery["attempts"])
+                if journal is not None and recovery["password"] is not None:
+                    journal.stage("password_recovery", recovery)
+            else:
+                recovery = None
+            if recovery is None or recovery["password"] is None:
+                msg = "Encrypted PDF"
+                if recovery is not None:
+                    msg += (
+                        f": password not recovered ({recovery['status']} after "
+                        f"{recovery['attempts']} attempt(s) in {recovery['seconds']}s)"
+                    )
+                else:
+                    msg += ": give --password, --password-word or --wordlist"
+                logging.warning("%s", msg)
+                raise RuntimeError(msg)
+            password = recovery["password"]
+            doc.authenticate(password)
+            recovery["encryption"] = doc.metadata.get("encryption")
+            manifest["password_recovery"] = recovery
+            logging.info(
+                "Password recovered (%s, %d attempt(s) in %ss); document unlocked",
+                recovery["authenticated_as"],
+                recovery["attempts"],
+                recovery["seconds"],
+            )
+
+        # Extrai metadados padrão do PDF e adiciona no manifest
+        with metrics.stage("metadata"):
+            metadata_pdf = doc.metadata
+        manifest["pdf_metadata"] = metadata_pdf
+        manifest["page_count"] = doc.page_count
+
+        if render_pages:
+            # o orçamento de imagem também limita a resolução das páginas renderizadas
+            renderer = PageRenderer(
+                original_copy_path,
+                hashes["SHA256"],
+                ocr if ocr_pages else None,
+                thumbnails=thumbnails,
+                dpi=render_dpi,
+                workers=ocr_workers,
+                max_pixels=image_max_bytes,
+                governor=governor,
+                password=password,
+            )
+
+        # open text report
+        with open(txt_report_path, "w", encoding="utf-8") as report:
+            # header
+            report.write("FORENSIC PDF REPORT\n\n")
+            report.write(f"Source: {pdf_input}\n")
+            report.write(f"Evidence copy: {original_copy_path}\n")
+            report.write(f"Size: {st.st_size} bytes\n")
+            report.write(f"Hashes: {json.dumps(hashes)}\n\n")
+            if "password_recovery" in manifest:
+                recovery = manifest["password_recovery"]
+                report.write(
+                    f"ENCRYPTED: {recovery['encryption']}, password recovered "
+                    f"({recovery['authenticated_as']}) after {recovery['attempts']} "
+                    f"attempt(s) in {recovery['seconds']}s with {recovery['workers']} "
+                    f"worker(s): {recovery['password']!r}\n\n"
+                )
+            if "pretriage" in manifest:
+                report.write(format_pretriage(manifest["pretriage"]))
+
+            # attempt header/xref sample
+            try:
+                header = doc.xref_object(0, compressed=False)
+                header_s = safe_decode(header)
+                if header_s.startswith("%PDF-"):
+                    report.write(f"PDF header: {header_s.splitlines()[0]}\n\n")
+                    manifest["pdf_version"] = header_s[5:8]
+            except Exception as e:
+                logging.debug("Could not extract xref 0 header: %s", e)
+
+            # xref triage (documento inteiro, inclusive object streams)
+            def on_triage_hit(hit, replay=False):
+                xref = hit["xref"]
+                if any(k in hit["keywords"] for k in JAVASCRIPT_KEYWORDS):
+                    manifest["suspicious"]["javascript_xrefs"].append(xref)
+                    try:
+                        add_extracted_file(
+                            manifest, dump_javascript(doc, xref, writer), stream
+                        )
+                        code = javascript_code(doc, xref)
+                        if code:
+                            hit["javascript_sha256"] = hashlib.sha256(code).hexdigest()
+                    except Exception as e:
+                        logging.debug("Could not dump JS of xref %s: %s", xref, e)
+                if any(k in hit["keywords"] for k in EMBEDDEDFILE_KEYWORDS):
+                    manifest["suspicious"]["embeddedfile_xrefs"].append(xref)
+                if stream is not None:
+                    stream.emit("xref", hit)
+                if journal is not None and not replay:
+                    journal.record("xref", hit)
+
+            with metrics.stage("triage"):
+                if resumed and "triage" in resumed["stages"]:
+                    triage = resumed["stages"]["triage"]
+                    if stream is None:
+                        triage["hits"] = resumed["xrefs"]
+                    manifest["xref_triage"] = triage
+                    for hit in resumed["xrefs"]:
+                        on_triage_hit(hit, replay=True)
+                else:
+                    triage = triage_xrefs(
+                        doc,
+                        max_xref=max_xref,
+                        with_iocs=xref_iocs,
+                        on_hit=on_triage_hit if stream is not None else None,
+                    )
+                    manifest["xref_triage"] = triage
+                    for hit in triage["hits"]:
+                        on_triage_hit(hit)
+                    if journal is not None:
+                        # as ocorrências já estão no diário como eventos "xref"
+                        journal.stage("triage", dict(triage, hits=[]))
+            metrics.count("objects_scanned", triage["xrefs_scanned"])
+            metrics.count("streams_scanned", triage["streams_scanned"])
+            metrics.count("object_bytes_scanned", triage["bytes_scanned"])
+            logging.info(
+                "Xref triage: %d objects, %d streams, %d hits in %.2fs",
+                triage["xrefs_scanned"],
+                triage["streams_scanned"],
+                triage["hits_total"],
+                triage["seconds"],
+            )
+            if triage["keyword_counts"]:
+                report.write(
+                    f"XREF TRIAGE keyword counts: {json.dumps(triage['keyword_counts'])}\n"
+                )
+
+            if (
+                manifest["suspicious"]["javascript_xrefs"]
+                or manifest["suspicious"]["embeddedfile_xrefs"]
+            ):
+                report.write("SUSPICIOUS XREFS (triage)\n")
+                report.write(
+                    json.dumps(manifest["suspicious"], indent=2, ensure_ascii=False)
+                    + "\n\n"
+                )
+
+            if revisions and resumed and "revisions" in resumed["stages"]:
+                manifest["revisions"] = resumed["stages"]["revisions"]
+            elif revisions and stage_allowed("revisions"):
+                with metrics.stage("revisions"):
+                    manifest["revisions"] = carve_revisions(original_copy_path, writer)
+                if journal is not None:
+                    journal.stage("revisions", manifest["revisions"])
+            if "revisions" in manifest:
+                metrics.count("revisions", manifest["revisions"]["count"])
+                for rev in manifest["revisions"]["revisions"]:
+                    if "file" in rev:
+                        add_extracted_file(manifest, rev["file"], stream)
+                report.write(format_revisions(manifest["revisions"], writer))
+
+            if stream is not None:
+                # modo streaming: a deduplicação de imagens e links fica no disco
+                seen_image_hashes = stream.spill("image_hashes")
+                seen_links = stream.spill("links")
+            else:
+                seen_image_hashes = {}
+                seen_links = set()
+            phash_index = PerceptualIndex(phash_distance) if perceptual_hashes else None
+
+            # Retomada: páginas do diário são reaplicadas (relatório, manifest, OCR) sem
+            # nova extração; a extração recomeça na primeira página incompleta
+            done_pages = resumed["pages"] if resumed else []
+
+            def page_results():
+                for res in done_pages:
+                    if renderer is not None:
+                        renderer.replayed(res)
+                    yield res, True
+                extracted = iter_page_results(
+                    doc,
+                    original_copy_path,
+                    writer,
+                    page_workers,
+                    text_level,
+                    governor,
+                    perceptual=perceptual_hashes,
+                    start=len(done_pages),
+                    image_refs=[
+                        ref for res in done_pages for ref in res.get("image_refs", ())
+                    ],
+                    password=password,
+                )
+                if renderer is not None:
+                    # páginas sem texto: renderização e OCR antes do merge
+                    extracted = renderer.iter_results(extracted, writer)
+                for res in extracted:
+                    yield res, False
+
+            with metrics.stage("pages"):
+                for res, replay in page_results():
+                    if replay:
+                        metrics.count("pages_resumed")
+                    else:
+                        metrics.page(
+                            res["page_number"],
+                            res["seconds"],
+                            res["cpu_seconds"],
+                            res.get("stage_seconds"),
+                        )
+                        metrics.count("artifacts_written", res.get("files_written", 0))
+                        metrics.count("bytes_written", res.get("bytes_written", 0))
+                    if "partial" in res:
+                        budget_report["partial_pages"].append(res["page_number"])
+                    budget_report["images_skipped"] += len(
+                        res.get("images_skipped", ())
+                    )
+                    budget_report["store_shrinks"] += res.get("store_shrinks", 0)
+                    merge_page_result(
+                        res,
+                        manifest,
+                        report,
+                        case_folder,
+                        seen_image_hashes,
+                        seen_links,
+                        ocr,
+                        writer,
+                        stream,
+                        phash_index,
+                    )
+                    if journal is not None and not replay:
+                        journal.page(res)
+            if phash_index is not None:
+                # quase duplicatas pelo pHash: o relatório lista clusters, não cópias
+                with metrics.stage("image_clusters"):
+                    manifest["image_clusters"] = phash_index.clusters()
+                metrics.count("image_clusters", len(manifest["image_clusters"]))
+                if phash_index.images or phash_index.unhashed:
+                    report.write(
+                        "\n"
+                        + format_image_clusters(
+                            phash_index, manifest["image_clusters"], writer
+                        )
+                    )
+            if renderer is not None:
+                manifest["page_ocr"] = renderer.finish()
+                metrics.count("pages_rendered", manifest["page_ocr"]["rendered"])
+                metrics.count("page_ocr_cache_hits", manifest["page_ocr"]["cache_hits"])
+                page_ocr = manifest["page_ocr"]
+                report.write(
+                    f"\nTEXT-LESS PAGES: {page_ocr['textless_pages']}, "
+                    f"rendered {page_ocr['rendered']}"
+                    + (
+                        f" at {render_dpi} dpi, OCR text on {page_ocr['ocr_pages']}"
+                        if ocr_pages
+                        else ""
+                    )
+                    + "\n"
+                )
+
+            # Arquivos embutidos: extraídos, hasheados e, se forem PDFs, analisados
+            # recursivamente a partir da memória
+            with metrics.stage("embedded"):
+                if extract_embedded and resumed and "embedded" in resumed["stages"]:
+                    nodes = resumed["stages"]["embedded"]["nodes"]
+                    for rel in resumed["stages"]["embedded"]["files"]:
+                        add_extracted_file(manifest, rel, stream)
+                elif extract_embedded and stage_allowed("embedded"):
+                    try:
+                        nodes, blobs = analyze_embedded(
+                            doc,
+                            hashes["SHA256"],
+                            manifest["suspicious"]["embeddedfile_xrefs"],
+                            max_depth=embedded_max_depth,
+                            max_bytes=embedded_max_bytes,
+                            workers=embedded_workers,
+                            max_xref=max_xref,
+                            xref_iocs=xref_iocs,
+                        )
+                    except Exception as e:
+                        logging.warning("Embedded file analysis failed: %s", e)
+                        nodes, blobs = [], {}
+                    for rel, data in blobs.items():
+                        writer.write(rel, data)
+                        add_extracted_file(manifest, rel, stream)
+                    if journal is not None:
+                        journal.stage(
+                            "embedded", {"nodes": nodes, "files": list(blobs)}
+                        )
+                else:
+                    nodes = []
+                if nodes:
+                    report.write("EMBEDDED FILES\n")
+                for node in nodes:
+                    metrics.count("embedded_files")
+                    if node.get("type") == "pdf":
+                        metrics.count("embedded_pdfs")
+                    metrics.count("embedded_bytes", node.get("size", 0))
+                    if stream is not None:
+                        stream.emit("embedded_file", node)
+                    else:
+                        manifest["embedded_files"].append(node)
+                    report.write(embedded_report_line(node, writer) + "\n")
+                if nodes:
+                    report.write("\n")
+
+            if journal is not None:
+                journal.sync()
+            with metrics.stage("artifact_flush"):
+                writer.close()
+            metrics.count("artifacts_written", writer.files_written)
+            metrics.count("bytes_written", writer.bytes_written)
+            if ocr is not None:
+                with metrics.stage("ocr"):
+                    manifest["ocr"] = ocr.finish()
+                metrics.count("ocr_calls", manifest["ocr"]["submitted"])
+                metrics.count("ocr_cache_hits", manifest["ocr"]["cache_hits"])
+                metrics.count("ocr_errors", manifest["ocr"]["errors"])
+                if stream is not None:
+                    stream.flush()
+                    snippets = [
+                        data for _, data in iter_stream_events(stream.path, ("ocr",))
+                    ]
+                else:
+                    snippets = [
+                        img for img in manifest["images"] if "ocr_snippet" in img
+                    ]
+                if snippets:
+                    report.write("\nOCR RESULTS\n")
+                    for img in snippets:
+                        report.write(
+                            f"[OCR snippet] {img['file']} (sha256={img['hash']}): "
+                            f"{img['ocr_snippet']}\n"
+                        )
+
+            manifest["resource_budget"] = budget_report
+            if budget_report["partial_pages"] or budget_report["skipped_stages"]:
+                logging.warning(
+                    "Budget exceeded: %d partial page(s), skipped stages: %s",
+                    len(budget_report["partial_pages"]),
+                    ", ".join(s["stage"] for s in budget_report["skipped_stages"])
+                    or "none",
+                )
+                report.write(
+                    "\nRESOURCE BUDGET EXCEEDED: "
+                    f"partial pages {budget_report['partial_pages']}, "
+                    f"skipped stages {budget_report['skipped_stages']}\n"
+                )
+
+            if stream is not None:
+                manifest["summary"] = {
+                    "total_images": stream.counts.get("image", 0),
+                    "total_links": stream.counts.get("link", 0),
+                    "total_embedded_files": stream.counts.get("embedded_file", 0),
+                }
+            else:
+                manifest["summary"] = {
+                    "total_images": len(manifest["images"]),
+                    "total_links": len(manifest["links"]),
+                    "total_embedded_files": len(manifest["embedded_files"]),
+                }
+            report.write("\nSUMMARY:\n")
+            report.write(
+                json.dumps(manifest["summary"], indent=2, ensure_ascii=False) + "\n"
+            )
+            report.write(f"Manifest saved to: {json_report_path}\n")
+        metrics.count("images", manifest["summary"]["total_images"])
+        metrics.count("links", manifest["summary"]["total_links"])
+        manifest["metrics"] = metrics.as_dict()
+        if stream is not None:
+            # sem o evento "end" o finalizador marca o manifest como incompleto
+            stream.emit(
+                "end", {k: v for k, v in manifest.items() if k not in STREAM_LIST_KEYS}
+            )
+    except BaseException:
+        # o diário recebe as páginas pendentes antes de fechar os artefatos: é dele que
+        # uma execução com --resume continua
+        if journal is not None:
+            try:
+                journal.close()
+            except Exception as e:
+                logging.warning("Could not write checkpoint %s: %s", journal_path, e)
+        # fecha o contêiner mesmo em falha, para não deixar o tar/SQLite truncado
+        writer.close()
+        sink.close()
+        raise
+    finally:
+        writer.close()
+        if renderer is not None:
+            renderer.close()
+        if ocr is not None:
+            ocr.close()
+        if stream is not None:
+            stream.close()
+        try:
+            doc.close()
+        except Exception:
+            pass
+
+    if stream is not None:
+        finalize_manifest(stream.path, json_report_path)
+    else:
+        with open(json_report_path, "w", encoding="utf-8") as jf:
+            json.dump(manifest, jf, indent=2, ensure_ascii=False)
+    sink.close(json_report_path)
+    if journal is not None:
+        journal.close(remove=True)
+
+    if key and (
+        budget_report["partial_pages"]
+        or budget_report["skipped_stages"]
+        or budget_report["images_skipped"]
+    ):
+        # resultado incompleto por orçamento não serve para outras execuções
+        logging.info("Partial result not stored in the cache")
+    elif key:
+        try:
+            cache_store(
+                cache_dir,
+                key,
+                manifest,
+                pdf_input,
+                txt_report_path,
+                json_report_path,
+                cache_max_bytes,
+            )
+        except Exception as e:
+            logging.warning("Could not store result in cache: %s", e)
+    if index_db:
+        _update_index(index_db, manifest, json_report_path)
+
+    logging.info(
+        "Processing done in %.2fs (%s). Reports: %s and %s",
+        manifest["metrics"]["wall_seconds"],
+        ", ".join(
+            f"{name}={st['wall_seconds']:.2f}s"
+            for name, st in manifest["metrics"]["stages"].items()
+        ),
+        txt_report_path,
+        json_report_path,
+    )
+    return manifest
@@ -0,0 +1,324 @@
+# Índice de correlação entre casos (SQLite): IOCs, hashes de imagens, metadados e
+# hashes de conteúdo de xrefs suspeitos, de todos os manifests processados
+
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from .utils import ensure_dir
+
+MANIFEST_SUFFIX = "_manifest.json"
+# Campos de doc.metadata indexados (vazios são ignorados)
+CORRELATION_METADATA_FIELDS = (
+    "title",
+    "author",
+    "subject",
+    "keywords",
+    "creator",
+    "producer",
+    "creationDate",
+    "modDate",
+)
+# Tipos em que a caixa não importa
+_LOWERCASE_KINDS = frozenset(
+    ("domains", "emails", "md5", "sha1", "sha256", "eth_addresses")
+)
+# Referências (páginas/xrefs) guardadas por ocorrência; a contagem é sempre completa
+CORRELATION_MAX_LOCATIONS = 100
+IMPORT_BATCH_SIZE = 500
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        manifest_path TEXT NOT NULL UNIQUE,
+        case_folder TEXT,
+        source_path TEXT,
+        file_size INTEGER,
+        indexed REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256);
+    CREATE TABLE IF NOT EXISTS observables (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        value TEXT NOT NULL,
+        UNIQUE (kind, value)
+    );
+    CREATE INDEX IF NOT EXISTS observables_value ON observables (value);
+    CREATE TABLE IF NOT EXISTS occurrences (
+        observable_id INTEGER NOT NULL,
+        document_id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        locations TEXT,
+        PRIMARY KEY (observable_id, document_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS occurrences_document
+        ON occurrences (document_id, observable_id);
+"""
+
+
+def _index_db(path):
+    ensure_dir(os.path.dirname(os.path.abspath(path)))
+    conn = sqlite3.connect(path, timeout=60)
+    # WAL: workers do modo lote/serviço gravam em paralelo com consultas em andamento
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _add(found, kind, value, count, ref_key=None, refs=()):
+    if not isinstance(value, str):
+        value = str(value)
+    value = value.strip()
+    if not value:
+        return
+    if kind in _LOWERCASE_KINDS or kind.endswith("_sha256"):
+        value = value.lower()
+    entry = found.get((kind, value))
+    if entry is None:
+        entry = found[(kind, value)] = [0, {}]
+    entry[0] += count
+    if ref_key:
+        bucket = entry[1].setdefault(ref_key, [])
+        for ref in refs:
+            if len(bucket) >= CORRELATION_MAX_LOCATIONS:
+                break
+            if ref not in bucket:
+                bucket.append(ref)
+
+
+def _add_pdf(found, pdf, embedded_sha256=None):
+    # Partes comuns ao documento principal e aos PDFs embutidos já triados; nos embutidos
+    # a localização é o SHA256 do anexo
+    def where(ref_key, refs):
+        if embedded_sha256:
+            return "embedded", [embedded_sha256]
+        return ref_key, refs
+
+    for kind, values in (pdf.get("ioc_index") or {}).items():
+        for value, entry in values.items():
+            _add(found, kind, value, entry["count"], *where("pages", entry["pages"]))
+    xref_triage = pdf.get("xref_triage") or {}
+    for kind, values in (xref_triage.get("iocs") or {}).items():
+        for value, entry in values.items():
+            _add(found, kind, value, entry["count"], *where("xrefs", entry["xrefs"]))
+    for hit in xref_triage.get("hits") or ():
+        for kind in ("sha256", "javascript_sha256"):
+            if hit.get(kind):
+                obs_kind = "xref_sha256" if kind == "sha256" else kind
+                _add(found, obs_kind, hit[kind], 1, *where("xrefs", [hit["xref"]]))
+    metadata = pdf.get("pdf_metadata") or {}
+    for field in CORRELATION_METADATA_FIELDS:
+        if metadata.get(field):
+            _add(found, f"metadata.{field}", metadata[field], 1, *where(None, ()))
+
+
+def manifest_observables(manifest):
+    # {(tipo, valor): [contagem, {"pages"|"xrefs"|"embedded": [...]}]} de um manifest
+    found = {}
+    _add_pdf(found, manifest)
+    for img in manifest.get("images") or ():
+        _add(found, "image_sha256", img["hash"], 1, "pages", [img["page"]])
+    for node in manifest.get("embedded_files") or ():
+        sha256 = (node.get("hashes") or {}).get("SHA256")
+        if not sha256:
+            continue
+        _add(found, "embedded_sha256", sha256, 1, "parents", [node["parent_sha256"]])
+        if node.get("pdf"):
+            _add_pdf(found, node["pdf"], sha256)
+    return found
+
+
+def _index_document(conn, manifest, manifest_path):
+    # Reindexar o mesmo manifest substitui as ocorrências anteriores
+    manifest_path = os.path.abspath(manifest_path)
+    doc = (
+        manifest["hashes"]["SHA256"].lower(),
+        manifest.get("case_folder"),
+        manifest.get("source_path"),
+        manifest.get("file_size"),
+        time.time(),
+    )
+    row = conn.execute(
+        "SELECT id FROM documents WHERE manifest_path = ?", (manifest_path,)
+    ).fetchone()
+    if row:
+        doc_id = row[0]
+        conn.execute("DELETE FROM occurrences WHERE document_id = ?", (doc_id,))
+        conn.execute(
+            "UPDATE documents SET sha256 = ?, case_folder = ?, source_path = ?, "
+            "file_size = ?, indexed = ? WHERE id = ?",
+            doc + (doc_id,),
+        )
+    else:
+        doc_id = conn.execute(
+            "INSERT INTO documents "
+            "(sha256, case_folder, source_path, file_size, indexed, manifest_path) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            doc + (manifest_path,),
+        ).lastrowid
+    found = manifest_observables(manifest)
+    conn.executemany(
+        "INSERT OR IGNORE INTO observables (kind, value) VALUES (?, ?)", found.keys()
+    )
+    conn.executemany(
+        "INSERT INTO occurrences (observable_id, document_id, count, locations) "
+        "SELECT id, ?, ?, ? FROM observables WHERE kind = ? AND value = ?",
+        (
+            (
+                doc_id,
+                count,
+                json.dumps(locations, separators=(",", ":")) if locations else None,
+                kind,
+                value,
+            )
+            for (kind, value), (count, locations) in found.items()
+        ),
+    )
+    return len(found)
+
+
+def index_manifest(db_path, manifest, manifest_path):
+    # Uma transação por documento processado
+    conn = _index_db(db_path)
+    try:
+        with conn:
+            return _index_document(conn, manifest, manifest_path)
+    finally:
+        conn.close()
+
+
+def iter_manifest_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(MANIFEST_SUFFIX):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def import_manifests(db_path, paths, batch_size=IMPORT_BATCH_SIZE):
+    # Carga retroativa de manifests existentes (arquivos ou diretórios percorridos
+    # recursivamente), em transações de batch_size documentos
+    t0 = time.perf_counter()
+    stats = {"manifests": 0, "observables": 0, "errors": []}
+    conn = _index_db(db_path)
+    try:
+        pending = 0
+        conn.execute("BEGIN")
+        for path in iter_manifest_paths(paths):
+            # savepoint: um manifest inválido não deixa documento pela metade no lote
+            conn.execute("SAVEPOINT manifest")
+            try:
+                with open(path, "r", encoding="utf-8") as fh:
+                    manifest = json.load(fh)
+                stats["observables"] += _index_document(conn, manifest, path)
+                conn.execute("RELEASE manifest")
+            except Exception as e:
+                conn.execute("ROLLBACK TO manifest")
+                conn.execute("RELEASE manifest")
+                logging.warning("Could not index %s: %s", path, e)
+                stats["errors"].append(
+                    {"path": path, "error": f"{type(e).__name__}: {e}"}
+                )
+                continue
+            stats["manifests"] += 1
+            pending += 1
+            if pending >= batch_size:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+                pending = 0
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    return stats
+
+
+def _rows(cursor):
+    cols = [c[0] for c in cursor.description]
+    for row in cursor:
+        rec = dict(zip(cols, row))
+        if rec.get("locations"):
+            rec["locations"] = json.loads(rec["locations"])
+        yield rec
+
+
+def query_index(db_path, value, kinds=None, limit=1000):
+    # Documentos que contêm um valor (de qualquer tipo, ou só dos tipos informados)
+    value = value.strip()
+    conn = _index_db(db_path)
+    try:
+        where = "o.value IN (?, ?)"
+        params = [value, value.lower()]
+        if kinds:
+            where += f" AND o.kind IN ({', '.join('?' * len(kinds))})"
+            params += list(kinds)
+        cur = conn.execute(
+            "SELECT o.kind, o.value, d.sha256, d.case_folder, d.source_path, "
+            "d.manifest_path, oc.count, oc.locations "
+            "FROM observables o "
+            "JOIN occurrences oc ON oc.observable_id = o.id "
+            "JOIN documents d ON d.id = oc.document_id "
+            f"WHERE {where} ORDER BY o.kind, d.indexed LIMIT ?",
+            params + [limit],
+        )
+        return list(_rows(cur))
+    finally:
+        conn.close()
+
+
+def pivot_index(db_path, sha256, kinds=None, limit=1000):
+    # Outros documentos que compartilham qualquer observável com o documento informado;
+    # cópias idênticas (mesmo SHA256, outros casos) ficam de fora
+    conn = _index_db(db_path)
+    try:
+        where = "d.sha256 = ?"
+        params = [sha256.strip().lower()]
+        if kinds:
+            where += f" AND o.kind IN ({', '.join('?' * len(kinds))})"
+            params += list(kinds)
+        cur = conn.execute(
+            "SELECT DISTINCT o.kind, o.value, d2.sha256, d2.case_folder, "
+            "d2.source_path, d2.manifest_path, oc2.count, oc2.locations "
+            "FROM documents d "
+            "JOIN occurrences oc ON oc.document_id = d.id "
+            "JOIN observables o ON o.id = oc.observable_id "
+            "JOIN occurrences oc2 ON oc2.observable_id = oc.observable_id "
+            "AND oc2.document_id != d.id "
+            "JOIN documents d2 ON d2.id = oc2.document_id AND d2.sha256 != d.sha256 "
+            f"WHERE {where} ORDER BY o.kind, o.value, d2.indexed LIMIT ?",
+            params + [limit],
+        )
+        return list(_rows(cur))
+    finally:
+        conn.close()
+
+
+def index_stats(db_path):
+    conn = _index_db(db_path)
+    try:
+        documents, observables, occurrences = (
+            conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("documents", "observables", "occurrences")
+        )
+        kinds = dict(
+            conn.execute(
+                "SELECT kind, COUNT(*) FROM observables GROUP BY kind ORDER BY kind"
+            ).fetchall()
+        )
+    finally:
+        conn.close()
+    return {
+        "index_db": os.path.abspath(db_path),
+        "documents": documents,
+        "observables": observables,
+        "occurrences": occurrences,
+        "observables_by_kind": kinds,
+    }
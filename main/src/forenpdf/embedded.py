@@ -0,0 +1,385 @@
+# Análise recursiva de arquivos embutidos (PDFs aninhados abertos direto da memória)
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+
+import fitz  # PyMuPDF
+
+from .iocs import index_iocs, scan_iocs
+from .pages import artifact_display
+from .sinks import BlobCollector
+from .triage import (
+    EMBEDDEDFILE_KEYWORDS,
+    JAVASCRIPT_KEYWORDS,
+    dump_javascript,
+    javascript_code,
+    triage_xrefs,
+)
+from .utils import calculate_hashes_bytes, setup_logging
+
+EMBEDDED_DIR = "embedded_files"
+EMBEDDED_MAX_DEPTH = 3
+EMBEDDED_MAX_BYTES = 256 * 1024 * 1024
+# Leitores aceitam o cabeçalho %PDF- deslocado dentro do primeiro KiB
+PDF_MAGIC_WINDOW = 1024
+_UNSAFE_NAME_RE = re.compile(r"[^\w.\- ]")
+
+
+def is_pdf_bytes(data):
+    return b"%PDF-" in data[:PDF_MAGIC_WINDOW]
+
+
+def safe_artifact_name(name):
+    # Nomes de anexos vêm do documento: sem separadores nem "..", para não escapar da pasta
+    name = os.path.basename(str(name).replace("\\", "/"))
+    name = _UNSAFE_NAME_RE.sub("_", name).strip(". ")
+    return name or "attachment"
+
+
+def _declared_size(doc, xref):
+    for key in ("DL", "Params/Size", "Length"):
+        try:
+            kind, value = doc.xref_get_key(xref, key)
+            if kind == "int":
+                return int(value)
+        except Exception:
+            pass
+    return None
+
+
+def _embedded_stream(doc, xref):
+    # (xref do stream /EmbeddedFile, nome, origem) a partir de um xref da triagem
+    try:
+        if doc.xref_get_key(xref, "Type") == ("name", "/EmbeddedFile"):
+            if doc.xref_is_stream(xref):
+                return xref, None, "stream"
+            return None, None, None
+        for prefix, source in (("FS/", "annotation"), ("", "filespec")):
+            kind, value = doc.xref_get_key(xref, f"{prefix}EF/F")
+            if kind != "xref":
+                continue
+            stream_xref = int(value.split()[0])
+            if not doc.xref_is_stream(stream_xref):
+                break
+            for key in ("UF", "F"):
+                kind, name = doc.xref_get_key(xref, f"{prefix}{key}")
+                if kind == "string" and name:
+                    return stream_xref, name, source
+            return stream_xref, None, source
+    except Exception:
+        pass
+    return None, None, None
+
+
+def iter_attachments(doc, embeddedfile_xrefs=(), max_bytes=None):
+    # Anexos da árvore /EmbeddedFiles e, em seguida, streams /EmbeddedFile fora dela
+    # (anexos de anotações ou órfãos) encontrados pela triagem. Gera dicionários com
+    # name/source/data/hashes ou, se o anexo não pôde ser lido, error/skipped. Streams
+    # da própria árvore aparecem também na triagem e são reconhecidos pelo conteúdo.
+    seen_xrefs = set()
+    listed = set()
+    listed_skipped = set()
+    for i in range(doc.embfile_count()):
+        try:
+            info = doc.embfile_info(i)
+        except Exception as e:
+            yield {"name": f"#{i}", "source": "embfile", "error": str(e)}
+            continue
+        name = info.get("filename") or info.get("name") or f"#{i}"
+        item = {"name": name, "source": "embfile"}
+        # tamanho declarado: evita descompactar algo que já não cabe no orçamento
+        if max_bytes is not None and (info.get("size") or 0) > max_bytes:
+            item.update(skipped="size_budget", declared_size=info["size"])
+            listed_skipped.add(info["size"])
+            yield item
+            continue
+        try:
+            item["data"] = doc.embfile_get(i)
+        except Exception as e:
+            item["error"] = str(e)
+        else:
+            item["hashes"] = calculate_hashes_bytes(item["data"])
+            listed.add(item["hashes"]["SHA256"])
+        yield item
+    for hit in embeddedfile_xrefs:
+        # o próprio stream ou uma anotação /FileAttachment que aponta para ele
+        xref, name, source = _embedded_stream(doc, hit)
+        if xref is None or xref in seen_xrefs:
+            continue
+        seen_xrefs.add(xref)
+        item = {"name": name or f"xref_{xref}.bin", "source": source, "xref": xref}
+        declared = _declared_size(doc, xref)
+        if max_bytes is not None and declared is not None and declared > max_bytes:
+            if declared not in listed_skipped:
+                item.update(skipped="size_budget", declared_size=declared)
+                yield item
+            continue
+        try:
+            item["data"] = doc.xref_stream(xref)
+        except Exception as e:
+            item["error"] = str(e)
+        else:
+            item["hashes"] = calculate_hashes_bytes(item["data"])
+            if item["hashes"]["SHA256"] in listed:
+                continue
+        yield item
+
+
+def _triage_pdf(data, max_xref=None, xref_iocs=False):
+    # Triagem de um PDF aninhado: metadados, xrefs, IOCs do texto e dumps de JavaScript
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        info = {"encrypted": bool(doc.needs_pass)}
+        if doc.needs_pass:
+            return info, None, {}
+        info["page_count"] = doc.page_count
+        info["pdf_metadata"] = doc.metadata
+        triage = triage_xrefs(doc, max_xref=max_xref, with_iocs=xref_iocs)
+        suspicious = {"javascript_xrefs": [], "embeddedfile_xrefs": []}
+        collector = BlobCollector()
+        for hit in triage["hits"]:
+            if any(k in hit["keywords"] for k in JAVASCRIPT_KEYWORDS):
+                suspicious["javascript_xrefs"].append(hit["xref"])
+                try:
+                    dump_javascript(doc, hit["xref"], collector)
+                    code = javascript_code(doc, hit["xref"])
+                    if code:
+                        hit["javascript_sha256"] = hashlib.sha256(code).hexdigest()
+                except Exception as e:
+                    logging.debug("Could not dump JS of xref %s: %s", hit["xref"], e)
+            if any(k in hit["keywords"] for k in EMBEDDEDFILE_KEYWORDS):
+                suspicious["embeddedfile_xrefs"].append(hit["xref"])
+        info["xref_triage"] = triage
+        info["suspicious"] = suspicious
+        ioc_index = {}
+        for pno in range(doc.page_count):
+            index_iocs(
+                ioc_index, scan_iocs(doc.load_page(pno).get_text() or ""), pno + 1
+            )
+        info["ioc_index"] = ioc_index
+        attachments = list(iter_attachments(doc, suspicious["embeddedfile_xrefs"]))
+        return info, attachments, collector.blobs
+    finally:
+        doc.close()
+
+
+def analyze_attachment(item, parent_sha256, depth, rel_dir, state, options):
+    # Hash, gravação e triagem de um anexo; PDFs são abertos da memória e seus anexos
+    # analisados recursivamente (serial, dentro do mesmo processo). Retorna (nós, blobs):
+    # os nós formam uma lista plana, ligada pelo parent_sha256.
+    node = {
+        "name": item["name"],
+        "source": item["source"],
+        "depth": depth,
+        "parent_sha256": parent_sha256,
+    }
+    if "xref" in item:
+        node["xref"] = item["xref"]
+    for key in ("skipped", "declared_size", "error"):
+        if key in item:
+            node[key] = item[key]
+    data = item.get("data")
+    if data is None:
+        return [node], {}
+    data = bytes(data)
+    hashes = item.get("hashes") or calculate_hashes_bytes(data)
+    sha256 = hashes["SHA256"]
+    node.update(
+        hashes=hashes, size=len(data), type="pdf" if is_pdf_bytes(data) else "other"
+    )
+    if sha256 in state["ancestors"]:
+        node["skipped"] = "cycle"
+        return [node], {}
+    if sha256 in state["seen"]:
+        node["duplicate_of"] = state["seen"][sha256]
+        return [node], {}
+    if len(data) > state["budget"]:
+        node["skipped"] = "size_budget"
+        return [node], {}
+    state["budget"] -= len(data)
+
+    rel = f"{rel_dir}/{safe_artifact_name(item['name'])}"
+    used = state["used_names"]
+    if rel in used:
+        stem, ext = os.path.splitext(rel)
+        rel = f"{stem}_{sha256[:8]}{ext}"
+    used.add(rel)
+    state["seen"][sha256] = rel
+    node["file"] = rel
+    nodes, blobs = [node], {rel: data}
+    if node["type"] != "pdf" or not options.get("recurse", True):
+        return nodes, blobs
+    if depth > options["max_depth"]:
+        node["skipped"] = "max_depth"
+        return nodes, blobs
+    try:
+        info, attachments, js_blobs = _triage_pdf(
+            data, options.get("max_xref"), options.get("xref_iocs")
+        )
+    except Exception as e:
+        node["error"] = f"{type(e).__name__}: {e}"
+        return nodes, blobs
+    child_dir = f"{EMBEDDED_DIR}/{sha256[:16]}"
+    node["pdf"] = info
+    node["children"] = 0
+    for js_rel, js_data in js_blobs.items():
+        blobs[f"{child_dir}/{js_rel}"] = js_data
+    info["extracted_files"] = [f"{child_dir}/{r}" for r in js_blobs]
+    state["ancestors"].add(sha256)
+    try:
+        for child in attachments or ():
+            child_nodes, child_blobs = analyze_attachment(
+                child, sha256, depth + 1, child_dir, state, options
+            )
+            node["children"] += 1
+            nodes += child_nodes
+            blobs.update(child_blobs)
+    finally:
+        state["ancestors"].discard(sha256)
+    return nodes, blobs
+
+
+def new_analysis_state(budget, ancestors=(), seen=None, used_names=None):
+    return {
+        "budget": budget,
+        "ancestors": set(ancestors),
+        "seen": dict(seen or {}),
+        "used_names": set(used_names or ()),
+    }
+
+
+def _embedded_worker_init(quiet):
+    setup_logging(quiet=quiet)
+
+
+def _embedded_worker_run(job):
+    item, parent_sha256, budget, options = job
+    state = new_analysis_state(budget, ancestors=(parent_sha256,))
+    return analyze_attachment(item, parent_sha256, 1, EMBEDDED_DIR, state, options)
+
+
+def analyze_embedded(
+    doc,
+    parent_sha256,
+    embeddedfile_xrefs=(),
+    max_depth=EMBEDDED_MAX_DEPTH,
+    max_bytes=EMBEDDED_MAX_BYTES,
+    workers=1,
+    max_xref=None,
+    xref_iocs=False,
+):
+    # Anexos diretos do documento, cada PDF analisado com sua subárvore em um pool de
+    # processos. O orçamento de bytes cobre a árvore inteira: os anexos diretos o consomem
+    # em ordem e o restante é dividido igualmente entre os PDFs, de modo que o resultado
+    # não depende do número de workers.
+    options = {"max_depth": max_depth, "max_xref": max_xref, "xref_iocs": xref_iocs}
+    state = new_analysis_state(max_bytes, ancestors=(parent_sha256,))
+    direct = []
+    for item in iter_attachments(doc, embeddedfile_xrefs, max_bytes=max_bytes):
+        # só o nó do anexo direto: a recursão fica para os jobs abaixo
+        nodes, blobs = analyze_attachment(
+            item, parent_sha256, 1, EMBEDDED_DIR, state, dict(options, recurse=False)
+        )
+        direct.append((item, nodes[0], blobs))
+
+    pdfs = [
+        (item, node)
+        for item, node, _ in direct
+        if node.get("type") == "pdf" and "file" in node
+    ]
+    if max_depth < 1:
+        for _, node in pdfs:
+            node["skipped"] = "max_depth"
+        pdfs = []
+    share = state["budget"] // len(pdfs) if pdfs else 0
+    # o anexo direto já foi contado no orçamento: o job o desconta de novo
+    jobs = [
+        (
+            {
+                "name": item["name"],
+                "source": item["source"],
+                "data": item["data"],
+                "hashes": node["hashes"],
+            },
+            parent_sha256,
+            share + node["size"],
+            options,
+        )
+        for item, node in pdfs
+    ]
+
+    if workers > 1 and multiprocessing.current_process().daemon:
+        logging.debug("Embedded-file pool unavailable inside a pool worker; serial run")
+        workers = 1
+    if workers > 1 and len(jobs) > 1:
+        quiet = logging.getLogger().getEffectiveLevel() > logging.DEBUG
+        with multiprocessing.Pool(
+            processes=min(workers, len(jobs)),
+            initializer=_embedded_worker_init,
+            initargs=(quiet,),
+        ) as pool:
+            subtrees = pool.map(_embedded_worker_run, jobs)
+    else:
+        subtrees = [_embedded_worker_run(job) for job in jobs]
+    subtree_of = {id(node): sub for (_, node), sub in zip(pdfs, subtrees)}
+
+    # Consolida na ordem dos anexos, no único processo que grava. Cada subárvore foi
+    # analisada isoladamente: duplicatas entre subárvores são resolvidas aqui, e os
+    # descendentes de uma duplicata (os mesmos da primeira ocorrência) são omitidos.
+    seen = dict(state["seen"])
+    nodes, blobs = [], {}
+    for _, node, node_blobs in direct:
+        blobs.update(node_blobs)
+        sub = subtree_of.get(id(node))
+        if sub is None:
+            nodes.append(node)
+            continue
+        sub_nodes, sub_blobs = sub
+        # a raiz da subárvore substitui o nó direto, com o caminho já reservado
+        sub_nodes[0]["file"] = node["file"]
+        sub_blobs.pop(f"{EMBEDDED_DIR}/{safe_artifact_name(node['name'])}", None)
+        nodes.append(sub_nodes[0])
+        dup_depth = None
+        for child in sub_nodes[1:]:
+            if dup_depth is not None and child["depth"] > dup_depth:
+                sub_blobs.pop(child.get("file"), None)
+                continue
+            dup_depth = None
+            sha256 = child.get("hashes", {}).get("SHA256")
+            rel = child.get("file")
+            if rel and seen.setdefault(sha256, rel) != rel:
+                sub_blobs.pop(rel, None)
+                for key in ("file", "pdf", "children"):
+                    child.pop(key, None)
+                child["duplicate_of"] = seen[sha256]
+                dup_depth = child["depth"]
+            nodes.append(child)
+        for rel, data in sub_blobs.items():
+            blobs.setdefault(rel, data)
+    return nodes, blobs
+
+
+def embedded_report_line(node, writer):
+    # Uma linha por nó, indentada pela profundidade na árvore
+    parts = [f"[{node.get('type', '?')}] {node['name']}"]
+    if "hashes" in node:
+        parts.append(f"sha256={node['hashes']['SHA256']} size={node['size']}")
+    if "file" in node:
+        parts.append(f"-> {artifact_display(writer, node['file'])}")
+    pdf = node.get("pdf")
+    if pdf:
+        if pdf.get("encrypted"):
+            parts.append("encrypted")
+        else:
+            parts.append(f"pages={pdf['page_count']}")
+            counts = pdf["xref_triage"]["keyword_counts"]
+            if counts:
+                parts.append(f"keywords={json.dumps(counts)}")
+    for key in ("duplicate_of", "skipped", "error"):
+        if key in node:
+            parts.append(f"{key}={node[key]}")
+    return "  " * node["depth"] + " ".join(parts)
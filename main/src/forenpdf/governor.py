@@ -0,0 +1,114 @@
+# Governador de recursos: orçamentos de tempo (página/documento), tamanho de imagem
+# decodificada e RSS, mais a redução periódica do store do MuPDF
+
+import logging
+import os
+import time
+
+# Páginas entre reduções do store do MuPDF (fontes, imagens e listas de exibição em cache)
+STORE_SHRINK_PAGES = 200
+# Componentes por espaço de cor para estimar o tamanho decodificado; desconhecido = 4
+_COLORSPACE_COMPONENTS = {
+    "DeviceGray": 1,
+    "CalGray": 1,
+    "Indexed": 1,
+    "Separation": 1,
+    "DeviceRGB": 3,
+    "CalRGB": 3,
+    "Lab": 3,
+    "DeviceCMYK": 4,
+}
+
+
+def current_rss():
+    # RSS atual (não o pico do getrusage); None fora do Linux
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def estimated_image_bytes(width, height, bpc, colorspace):
+    components = _COLORSPACE_COMPONENTS.get(colorspace, 4)
+    return (width * height * components * max(bpc or 8, 1) + 7) // 8
+
+
+class ResourceGovernor:
+    # O PyMuPDF não pode ser interrompido no meio de uma chamada em C: os orçamentos são
+    # conferidos entre as etapas de cada página, e a etapa seguinte é pulada quando um
+    # deles estoura. Imagens são barradas antes da decodificação, pelo tamanho declarado.
+    # Os prazos usam time.time() para valer também nos workers de página.
+
+    def __init__(
+        self,
+        page_seconds=None,
+        doc_seconds=None,
+        image_max_bytes=None,
+        rss_max_bytes=None,
+        store_shrink_pages=STORE_SHRINK_PAGES,
+        deadline=None,
+    ):
+        self.page_seconds = page_seconds
+        self.doc_seconds = doc_seconds
+        self.image_max_bytes = image_max_bytes
+        self.rss_max_bytes = rss_max_bytes
+        self.store_shrink_pages = store_shrink_pages
+        if deadline is None and doc_seconds:
+            deadline = time.time() + doc_seconds
+        self.deadline = deadline
+        self.page_deadline = None
+        self.pages_done = 0
+        self.store_shrinks = 0
+
+    def budgets(self):
+        # argumentos para recriar o governador (com o mesmo prazo) em outro processo
+        return {
+            "page_seconds": self.page_seconds,
+            "doc_seconds": self.doc_seconds,
+            "image_max_bytes": self.image_max_bytes,
+            "rss_max_bytes": self.rss_max_bytes,
+            "store_shrink_pages": self.store_shrink_pages,
+            "deadline": self.deadline,
+        }
+
+    def start_page(self):
+        self.page_deadline = (
+            time.time() + self.page_seconds if self.page_seconds else None
+        )
+
+    def exceeded(self, page=True):
+        # Motivo do primeiro orçamento estourado ("doc_time", "page_time", "rss") ou None;
+        # page=False para etapas do documento, fora do laço de páginas
+        now = time.time()
+        if self.deadline is not None and now > self.deadline:
+            return "doc_time"
+        if page and self.page_deadline is not None and now > self.page_deadline:
+            return "page_time"
+        if self.rss_max_bytes:
+            rss = current_rss()
+            if rss is not None and rss > self.rss_max_bytes:
+                # primeiro devolve o cache do MuPDF; só então desiste da etapa
+                self.shrink_store()
+                rss = current_rss()
+                if rss is not None and rss > self.rss_max_bytes:
+                    return "rss"
+        return None
+
+    def image_over_budget(self, width, height, bpc, colorspace):
+        if not self.image_max_bytes:
+            return None
+        size = estimated_image_bytes(width, height, bpc, colorspace)
+        return size if size > self.image_max_bytes else None
+
+    def end_page(self):
+        self.pages_done += 1
+        if self.store_shrink_pages and self.pages_done % self.store_shrink_pages == 0:
+            self.shrink_store()
+
+    def shrink_store(self):
+        import fitz  # PyMuPDF; fora do topo para a CLI importar os padrões sem ele
+
+        fitz.TOOLS.store_shrink(100)
+        self.store_shrinks += 1
+        logging.debug("MuPDF store shrunk (%d time(s))", self.store_shrinks)
@@ -0,0 +1,90 @@
+# Ingest (cópia + hashes em uma única leitura)
+
+import hashlib
+import os
+import queue
+import shutil
+import threading
+import time
+
+INGEST_BUFFER_SIZE = 4 * 1024 * 1024
+INGEST_QUEUE_DEPTH = 4
+
+
+def _drain_chunks(q, consume, errors):
+    # Após um erro continua consumindo a fila para não bloquear o leitor
+    failed = False
+    while True:
+        chunk = q.get()
+        if chunk is None:
+            return
+        if failed:
+            continue
+        try:
+            consume(chunk)
+        except Exception as e:
+            errors.append(e)
+            failed = True
+
+
+def sha256_file(path, buffer_size=INGEST_BUFFER_SIZE):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(buffer_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def ingest_evidence(src, dst, buffer_size=INGEST_BUFFER_SIZE, verify=True):
+    # Lê a origem uma única vez: cada bloco vai para a cópia e para MD5/SHA1/SHA256,
+    # cada um em sua thread (hashlib e write liberam o GIL em blocos grandes)
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    digests = {"MD5": hashlib.md5(), "SHA1": hashlib.sha1(), "SHA256": hashlib.sha256()}
+    errors = []
+    total = 0
+    t0 = time.perf_counter()
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        consumers = [d.update for d in digests.values()] + [fout.write]
+        queues = [queue.Queue(maxsize=INGEST_QUEUE_DEPTH) for _ in consumers]
+        threads = [
+            threading.Thread(target=_drain_chunks, args=(q, fn, errors), daemon=True)
+            for q, fn in zip(queues, consumers)
+        ]
+        for t in threads:
+            t.start()
+        try:
+            for chunk in iter(lambda: fin.read(buffer_size), b""):
+                total += len(chunk)
+                for q in queues:
+                    q.put(chunk)
+        finally:
+            for q in queues:
+                q.put(None)
+            for t in threads:
+                t.join()
+    if errors:
+        raise errors[0]
+    shutil.copystat(src, dst)
+    elapsed = time.perf_counter() - t0
+
+    hashes = {name: d.hexdigest() for name, d in digests.items()}
+    stats = {
+        "bytes": total,
+        "buffer_size": buffer_size,
+        "seconds": round(elapsed, 6),
+        "throughput_mb_s": (
+            round(total / (1024 * 1024) / elapsed, 2) if elapsed else None
+        ),
+        "verified": False,
+    }
+    if verify:
+        t1 = time.perf_counter()
+        copy_sha256 = sha256_file(dst, buffer_size)
+        stats["verify_seconds"] = round(time.perf_counter() - t1, 6)
+        if copy_sha256 != hashes["SHA256"]:
+            raise RuntimeError(
+                f"Evidence copy hash mismatch: source {hashes['SHA256']} != copy {copy_sha256}"
+            )
+        stats["verified"] = True
+    return hashes, stats
@@ -0,0 +1,235 @@
+# Scanner de IOCs
+
+import hashlib
+import ipaddress
+import re
+
+# Regexes mais robustas (mantidas para compatibilidade; o scanner usa IOC_RE)
+URL_RE = re.compile(r"https?://[^\s\)\]\}\'\"<>]+", re.IGNORECASE)
+# IP valid: 0-255 per octet
+IP_RE = re.compile(
+    r"\b(?:(?:25[0-5]|2[0-4]\d|1\d{2}|[1-9]?\d)\.){3}(?:25[0-5]|2[0-4]\d|1\d{2}|[1-9]?\d)\b"
+)
+EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+
+
+# Tipos de IOC na ordem do manifest; urls/ips/emails mantêm os nomes antigos
+IOC_TYPES = (
+    "urls",
+    "ips",
+    "emails",
+    "defanged_urls",
+    "ipv6",
+    "domains",
+    "md5",
+    "sha1",
+    "sha256",
+    "btc_addresses",
+    "eth_addresses",
+)
+_DEFANG = r"(?:\[\.\]|\(\.\)|\[dot\])"
+# Início de token para os tipos novos (domínios, hashes, carteiras, IPv6): não casam no
+# meio de uma palavra, de um domínio ou de um e-mail. URLs, e-mails e IPs mantêm as
+# fronteiras das regexes antigas (x-http://..., host-10.0.0.1 continuam achados).
+_START = r"(?<![\w.@-])"
+_IOC_PATTERNS = (
+    (
+        "defanged_urls",
+        r"(?i:(?:hxxps?|fxp)(?:\[:\]|:)//|https?\[:\]//|https?://(?=[^\s<>\"']*"
+        + _DEFANG
+        + r"))[^\s<>\"']+|"
+        + _START
+        + r"(?i:(?:[a-z0-9-]+(?:\.|"
+        + _DEFANG
+        + r"))*[a-z0-9-]+"
+        + _DEFANG
+        + r"[a-z]{2,63}\b)",
+    ),
+    # URL_RE tem re.IGNORECASE, que não vem junto com .pattern
+    ("urls", f"(?i:{URL_RE.pattern})"),
+    ("emails", EMAIL_RE.pattern),
+    ("ips", IP_RE.pattern),
+    ("eth_addresses", _START + r"0x[0-9a-fA-F]{40}\b"),
+    ("sha256", _START + r"[0-9a-fA-F]{64}\b"),
+    ("sha1", _START + r"[0-9a-fA-F]{40}\b"),
+    ("md5", _START + r"[0-9a-fA-F]{32}\b"),
+    (
+        "ipv6",
+        _START + r"(?<!:)(?:[0-9a-fA-F]{0,4}:){2,7}[0-9a-fA-F]{0,4}(?![\w:])",
+    ),
+    (
+        "btc_addresses",
+        _START + r"(?:bc1[02-9ac-hj-np-z]{11,71}|[13][1-9A-HJ-NP-Za-km-z]{25,34})\b",
+    ),
+    (
+        "domains",
+        _START + r"(?i:(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}\b)",
+    ),
+)
+# Uma única expressão com grupos nomeados; a ordem da alternância resolve ambiguidades
+# (URL defanged antes de URL, e-mail antes de domínio, hashes antes de BTC)
+IOC_RE = re.compile(
+    "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _IOC_PATTERNS)
+)
+# Nenhum indicador contém espaço em branco, e as fronteiras nas bordas de um token valem o
+# mesmo que no texto inteiro: IOC_RE roda só nos tokens que têm a estrutura mínima de
+# algum tipo (@, ://, dois ":", ponto antes de letra, d.d.d, defang ou 14+ caracteres
+# alfanuméricos) e o resultado é idêntico ao de varrer o texto todo
+_ANCHOR_CHARS = frozenset(".:@[(")
+_STRUCTURE_RE = re.compile(
+    r"@|://|:[^:]*:|\.[A-Za-z]|\d\.\d+\.\d|\[:\]|" + _DEFANG + r"|[0-9A-Za-z]{14}"
+)
+_URL_HOST_RE = re.compile(
+    r"^[a-z]+(?:\[:\]|:)//(?:[^@/\s]*@)?(\[[^\]]+\]|[^/:?#\s]+)", re.I
+)
+_REFANG_RE = re.compile(_DEFANG, re.I)
+COMMON_TLDS = frozenset(
+    "com net org info biz gov edu mil int io co me tv cc ws xyz top online site club "
+    "app dev live shop store tech cloud space website pro mobi name asia tk ml ga cf gq "
+    "onion".split()
+)
+# Extensões de arquivo comuns que também seriam ccTLDs válidos
+_NOT_TLDS = frozenset("js py gz xz db cs rb sh ps md so pl".split())
+_B58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def _valid_base58check(addr):
+    n = 0
+    for c in addr:
+        n = n * 58 + _B58.index(c)
+    raw = n.to_bytes(25, "big") if n.bit_length() <= 200 else b""
+    return (
+        len(raw) == 25
+        and hashlib.sha256(hashlib.sha256(raw[:-4]).digest()).digest()[:4] == raw[-4:]
+    )
+
+
+def _valid_domain(value):
+    tld = value.rsplit(".", 1)[-1].lower()
+    return tld in COMMON_TLDS or (len(tld) == 2 and tld not in _NOT_TLDS)
+
+
+def _valid_ipv6(value):
+    if sum(c not in ":" for c in value) < 3:
+        return False
+    try:
+        return ipaddress.IPv6Address(value).version == 6
+    except ValueError:
+        return False
+
+
+def _host_kind(host):
+    host = _REFANG_RE.sub(".", host.strip("[]"))
+    if IP_RE.fullmatch(host):
+        return "ips", host
+    if ":" in host and _valid_ipv6(host):
+        return "ipv6", host
+    if "." in host and _valid_domain(host):
+        return "domains", host.lower()
+    return None, None
+
+
+def _iter_matches(text):
+    anchors, structure, matches = _ANCHOR_CHARS, _STRUCTURE_RE.search, IOC_RE.finditer
+    for tok in text.split():
+        if (len(tok) >= 14 or not anchors.isdisjoint(tok)) and structure(tok):
+            yield from matches(tok)
+
+
+def scan_iocs(text, found=None):
+    # Uma passada sobre o texto; retorna {tipo: {valor: ocorrências}} em ordem de aparição
+    found = {} if found is None else found
+    for m in _iter_matches(text):
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "ipv6" and not _valid_ipv6(value):
+            continue
+        if kind == "domains" and not _valid_domain(value):
+            continue
+        if (
+            kind == "defanged_urls"
+            and "//" not in value
+            and not _valid_domain(_REFANG_RE.sub(".", value))
+        ):
+            # forma sem esquema (evil[.]com): como os domínios, exige um TLD conhecido;
+            # payload[.]exe e report[.]docx são nomes de arquivo
+            continue
+        if (
+            kind == "btc_addresses"
+            and value[0] != "b"
+            and not _valid_base58check(value)
+        ):
+            continue
+        if kind == "domains":
+            value = value.lower()
+        elif kind == "urls":
+            # pontuação final costuma ser da frase, não do indicador
+            value = value.rstrip(".,;:")
+        bucket = found.setdefault(kind, {})
+        bucket[value] = bucket.get(value, 0) + 1
+
+        # host de URLs e domínio de e-mails também são indicadores
+        host = None
+        if kind in ("urls", "defanged_urls"):
+            hm = _URL_HOST_RE.match(value)
+            host = hm.group(1) if hm else (value if kind == "defanged_urls" else None)
+        elif kind == "emails":
+            # e-mails ficam como a regex antiga os acha (inclusive um "." final)
+            host = value.rsplit("@", 1)[-1].rstrip(".")
+        if host:
+            hkind, hvalue = _host_kind(host)
+            if hkind:
+                bucket = found.setdefault(hkind, {})
+                bucket[hvalue] = bucket.get(hvalue, 0) + 1
+        if kind == "defanged_urls":
+            # URLs normais coladas na defanged (hxxp://a[.]b/x=http://c.d) são achadas
+            # pela regex antiga; a que só é o começo desta defanged (https://evil[) não
+            defang = _REFANG_RE.search(value)
+            for um in URL_RE.finditer(value):
+                if (
+                    um.start() == 0
+                    and defang
+                    and defang.start() < um.end() <= defang.end()
+                ):
+                    continue
+                bucket = found.setdefault("urls", {})
+                url = um.group().rstrip(".,;:")
+                bucket[url] = bucket.get(url, 0) + 1
+        if kind in ("urls", "defanged_urls") and "//" in value:
+            # e-mails e IPs dentro da URL (usuário, caminho, parâmetros), como as
+            # regexes antigas, que varriam o texto cada uma por si (inclusive a
+            # pontuação final tirada da URL)
+            raw = m.group(kind)
+            rest = raw[raw.index("//") + 2 :]
+            for em in EMAIL_RE.finditer(rest):
+                bucket = found.setdefault("emails", {})
+                bucket[em.group()] = bucket.get(em.group(), 0) + 1
+            host_ip = hvalue if host and hkind == "ips" else None
+            for ip in IP_RE.finditer(rest):
+                if ip.group() == host_ip:
+                    # o host já foi contado acima
+                    host_ip = None
+                    continue
+                bucket = found.setdefault("ips", {})
+                bucket[ip.group()] = bucket.get(ip.group(), 0) + 1
+    return found
+
+
+def scan_iocs_bytes(data, found=None):
+    # Conteúdo de objetos/streams: latin-1 preserva 1 caractere por byte
+    return scan_iocs(data.decode("latin-1"), found)
+
+
+def index_iocs(index, found, ref, ref_key="pages"):
+    # Índice por documento: primeira ocorrência, referências (páginas/xrefs) e contagem
+    for kind, values in found.items():
+        bucket = index.setdefault(kind, {})
+        for value, count in values.items():
+            entry = bucket.get(value)
+            if entry is None:
+                bucket[value] = {"first_seen": ref, ref_key: [ref], "count": count}
+            else:
+                entry["count"] += count
+                if entry[ref_key][-1] != ref:
+                    entry[ref_key].append(ref)
+    return index
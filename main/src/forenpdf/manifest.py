@@ -0,0 +1,316 @@
+# Manifest em streaming (JSON Lines)
+
+import functools
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+
+# Listas do manifest que, no modo streaming, viram eventos no arquivo .jsonl
+STREAM_LIST_EVENTS = (
+    ("pages", "page"),
+    ("images", "image"),
+    ("links", "link"),
+    ("embedded_files", "embedded_file"),
+    ("extracted_files", "extracted_file"),
+)
+STREAM_LIST_KEYS = (
+    "pages",
+    "images",
+    "links",
+    "embedded_files",
+    "extracted_files",
+    "ioc_index",
+)
+# Listas dentro de outras seções que também viram eventos: (caminho no manifest, evento)
+STREAM_NESTED_EVENTS = (
+    (("xref_triage", "hits"), "xref"),
+    (("metrics", "pages", "per_page"), "page_metrics"),
+)
+
+
+def stream_manifest_path(json_report_path):
+    return os.path.splitext(json_report_path)[0] + ".jsonl"
+
+
+class SpillIndex:
+    # Conjunto/dicionário de chaves vistas (hashes de imagens, links) em uma tabela do
+    # SQLite de ManifestStream, para a deduplicação não crescer em memória
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        db.execute(f"CREATE TABLE {table} (key TEXT PRIMARY KEY, value TEXT)")
+
+    def __contains__(self, key):
+        return (
+            self.db.execute(
+                f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            is not None
+        )
+
+    def get(self, key, default=None):
+        row = self.db.execute(
+            f"SELECT value FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row is not None else default
+
+    def __setitem__(self, key, value):
+        self.db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)",
+            (key, value),
+        )
+
+    def add(self, key):
+        self[key] = None
+
+
+class ManifestStream:
+    # Grava eventos page/image/link/xref/embedded_file/extracted_file/page_metrics à
+    # medida que são produzidos; em memória ficam apenas contadores, e os conjuntos de
+    # deduplicação (spill) ficam em um SQLite temporário ao lado do stream
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = open(path, "w", encoding="utf-8")
+        self.counts = {}
+        self.spill_path = path + ".spill.sqlite"
+        self.db = None
+
+    def spill(self, name):
+        if self.db is None:
+            if os.path.exists(self.spill_path):
+                os.remove(self.spill_path)
+            self.db = sqlite3.connect(self.spill_path)
+            self.db.execute("PRAGMA journal_mode = OFF")
+            self.db.execute("PRAGMA synchronous = OFF")
+        return SpillIndex(self.db, name)
+
+    def emit(self, event, data):
+        self.fh.write(
+            json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+        )
+        self.counts[event] = self.counts.get(event, 0) + 1
+
+    def flush(self):
+        self.fh.flush()
+
+    def close(self):
+        if not self.fh.closed:
+            self.fh.close()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+            os.remove(self.spill_path)
+
+
+def iter_stream_events(path, events=None):
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            try:
+                ev = json.loads(line)
+            except ValueError:
+                # última linha truncada (processo interrompido)
+                break
+            if events is None or ev["event"] in events:
+                yield ev["event"], ev["data"]
+
+
+def _write_events(out, jsonl_path, event, items=(), indent="  ", transform=None):
+    # Lista JSON escrita item a item: os itens já em memória e depois os eventos
+    out.write("[")
+    first = True
+    for _, data in itertools.chain(
+        ((event, item) for item in items), iter_stream_events(jsonl_path, (event,))
+    ):
+        if transform is not None:
+            data = transform(data)
+        out.write(
+            (f"\n{indent}  " if first else f",\n{indent}  ")
+            + json.dumps(data, ensure_ascii=False)
+        )
+        first = False
+    out.write("]" if first else f"\n{indent}]")
+
+
+def _write_nested(out, jsonl_path, value, path, event):
+    # value com a lista em path (ex.: ("pages", "per_page")) lida dos eventos do stream
+    if not path:
+        _write_events(out, jsonl_path, event, value or ())
+        return
+    key = path[0]
+    out.write("{")
+    for k, v in value.items():
+        if k != key:
+            out.write(f"{json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}, ")
+    out.write(f"{json.dumps(key)}: ")
+    _write_nested(out, jsonl_path, value.get(key) or {}, path[1:], event)
+    out.write("}")
+
+
+def _spill_ioc_index(jsonl_path, db_path):
+    # ioc_index (eventos "page") e textos do OCR (eventos "ocr") montados em um SQLite
+    # temporário: o número de valores distintos, de páginas por valor e de imagens não
+    # tem limite, e não fica em memória
+    db = sqlite3.connect(db_path)
+    db.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE iocs (
+            id INTEGER PRIMARY KEY,
+            kind TEXT,
+            value TEXT,
+            first_seen INTEGER,
+            last_page INTEGER,
+            count INTEGER,
+            UNIQUE (kind, value)
+        );
+        CREATE TABLE ioc_pages (ioc INTEGER, page INTEGER);
+        CREATE TABLE ocr (hash TEXT PRIMARY KEY, snippet TEXT);
+        """)
+    for event, data in iter_stream_events(jsonl_path, ("page", "ocr")):
+        if event == "ocr":
+            db.execute(
+                "INSERT OR REPLACE INTO ocr VALUES (?, ?)",
+                (data["hash"], data["ocr_snippet"]),
+            )
+            continue
+        pno = data["page_number"]
+        for kind, values in data.get("ioc_counts", {}).items():
+            for value, count in values.items():
+                row = db.execute(
+                    "SELECT id, last_page FROM iocs WHERE kind = ? AND value = ?",
+                    (kind, value),
+                ).fetchone()
+                if row is None:
+                    ioc = db.execute(
+                        "INSERT INTO iocs (kind, value, first_seen, last_page, count) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (kind, value, pno, pno, count),
+                    ).lastrowid
+                else:
+                    ioc = row[0]
+                    db.execute(
+                        "UPDATE iocs SET count = count + ?, last_page = ? WHERE id = ?",
+                        (count, pno, ioc),
+                    )
+                    if row[1] == pno:
+                        continue
+                db.execute("INSERT INTO ioc_pages VALUES (?, ?)", (ioc, pno))
+    db.execute("CREATE INDEX ioc_pages_ioc ON ioc_pages (ioc)")
+    return db
+
+
+def _write_ioc_index(out, db):
+    # Mesmo formato de index_iocs: tipos e valores em ordem de primeira aparição
+    out.write("{")
+    kinds = db.execute("SELECT kind FROM iocs GROUP BY kind ORDER BY MIN(id)")
+    kinds = [kind for (kind,) in kinds]
+    for i, kind in enumerate(kinds):
+        out.write(f"{',' if i else ''}\n    {json.dumps(kind)}: {{")
+        rows = db.execute(
+            "SELECT id, value, first_seen, count FROM iocs WHERE kind = ? ORDER BY id",
+            (kind,),
+        )
+        for j, (ioc, value, first_seen, count) in enumerate(rows):
+            pages = db.execute(
+                "SELECT page FROM ioc_pages WHERE ioc = ? ORDER BY rowid", (ioc,)
+            )
+            entry = {
+                "first_seen": first_seen,
+                "pages": [page for (page,) in pages],
+                "count": count,
+            }
+            out.write(
+                f"{',' if j else ''}\n      {json.dumps(value, ensure_ascii=False)}: "
+                + json.dumps(entry)
+            )
+        out.write("\n    }")
+    out.write("\n  }" if kinds else "}")
+
+
+def finalize_manifest(jsonl_path, json_path=None):
+    # Monta o manifest JSON único a partir do stream; cada lista (inclusive as ocorrências
+    # da triagem e os tempos por página) é escrita em uma passada própria sobre o .jsonl,
+    # e o ioc_index e os textos do OCR vêm de um SQLite temporário: nada cresce com o
+    # documento em memória
+    json_path = json_path or os.path.splitext(jsonl_path)[0] + ".json"
+    manifest = {}
+    end = None
+    for event, data in iter_stream_events(jsonl_path, ("start", "end")):
+        if event == "start":
+            manifest.update(data)
+        else:
+            end = data
+    if end is not None:
+        manifest.update(end)
+    else:
+        manifest["incomplete"] = True
+    # streams antigos traziam extracted_files no evento "end"
+    in_memory = {"extracted_files": manifest.get("extracted_files") or ()}
+    for key in STREAM_LIST_KEYS:
+        manifest.pop(key, None)
+
+    fd, db_path = tempfile.mkstemp(
+        prefix=".ioc_index_",
+        suffix=".sqlite",
+        dir=os.path.dirname(os.path.abspath(json_path)),
+    )
+    os.close(fd)
+    db = None
+    try:
+        db = _spill_ioc_index(jsonl_path, db_path)
+        with open(json_path, "w", encoding="utf-8") as out:
+            out.write("{\n")
+            for k, v in manifest.items():
+                out.write(f"  {json.dumps(k)}: ")
+                nested = [
+                    (path, event)
+                    for path, event in STREAM_NESTED_EVENTS
+                    if path[0] == k and isinstance(v, dict)
+                ]
+                if nested:
+                    path, event = nested[0]
+                    _write_nested(out, jsonl_path, v, path[1:], event)
+                else:
+                    out.write(json.dumps(v, ensure_ascii=False))
+                out.write(",\n")
+            out.write('  "ioc_index": ')
+            _write_ioc_index(out, db)
+            out.write(",\n")
+            for i, (key, event) in enumerate(STREAM_LIST_EVENTS):
+                out.write(f'  "{key}": ')
+                _write_events(
+                    out,
+                    jsonl_path,
+                    event,
+                    in_memory.get(key, ()),
+                    transform=functools.partial(_list_item, event, db),
+                )
+                out.write(",\n" if i < len(STREAM_LIST_EVENTS) - 1 else "\n")
+            out.write("}\n")
+    finally:
+        if db is not None:
+            db.close()
+        os.remove(db_path)
+    return json_path
+
+
+def _list_item(event, db, data):
+    if event == "page":
+        data.pop("ioc_counts", None)
+    elif event == "image":
+        row = db.execute(
+            "SELECT snippet FROM ocr WHERE hash = ?", (data["hash"],)
+        ).fetchone()
+        if row is not None:
+            data["ocr_snippet"] = row[0]
+    elif event == "link":
+        data = data["url"]
+    elif event == "extracted_file" and isinstance(data, dict):
+        data = data["file"]
+    return data
@@ -0,0 +1,201 @@
+# Métricas e profiling
+
+import contextlib
+import heapq
+import logging
+import os
+import pstats
+import time
+
+from .utils import ensure_dir
+
+METRICS_SLOWEST_PAGES = 10
+# Partes de cada página com tempo próprio (res["stage_seconds"] de pages.extract_page)
+PAGE_PARTS = ("text", "images", "links")
+PROFILE_TOP_FUNCTIONS = 50
+
+
+def page_row(row):
+    # [página, segundos de parede, segundos de CPU, parede do texto, das imagens e dos
+    # links]
+    pno, wall, cpu, parts = row
+    return [pno, round(wall, 6), round(cpu, 6)] + [round(part, 6) for part in parts]
+
+
+class RunMetrics:
+    # Tempo de parede e de CPU (processo principal) por etapa, tempos por página e
+    # contadores; vai para manifest["metrics"] e, opcionalmente, para o Prometheus
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.c0 = time.process_time()
+        self.stages = {}
+        self.counters = {}
+        self.pages = {"count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0}
+        self.slowest = []
+        self.per_page = []
+        # modo streaming: cada linha de per_page vai para on_page(linha) em vez da lista
+        self.on_page = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - t0, time.process_time() - c0)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_stage(self, name, wall, cpu):
+        # Tempo medido fora deste processo (partes da página nos workers)
+        st = self.stages.setdefault(
+            name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0}
+        )
+        st["wall_seconds"] += wall
+        st["cpu_seconds"] += cpu
+        st["calls"] += 1
+
+    def page(self, pno, wall, cpu, parts=None):
+        # parts: {"text"|"images"|"links": [parede, CPU]} de pages.extract_page, somados
+        # nas etapas "page_text", "page_images" e "page_links"
+        self.pages["count"] += 1
+        self.pages["wall_seconds"] += wall
+        self.pages["cpu_seconds"] += cpu
+        parts = parts or {}
+        for name, (part_wall, part_cpu) in parts.items():
+            self.add_stage(f"page_{name}", part_wall, part_cpu)
+        row = (pno, wall, cpu, tuple(parts.get(n, (0.0,))[0] for n in PAGE_PARTS))
+        if self.on_page is not None:
+            self.on_page(page_row(row))
+        else:
+            self.per_page.append(row)
+        item = (wall, pno, cpu)
+        if len(self.slowest) < METRICS_SLOWEST_PAGES:
+            heapq.heappush(self.slowest, item)
+        elif item > self.slowest[0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def as_dict(self):
+        return {
+            "wall_seconds": round(time.perf_counter() - self.t0, 6),
+            "cpu_seconds": round(time.process_time() - self.c0, 6),
+            "stages": {
+                name: {
+                    "wall_seconds": round(st["wall_seconds"], 6),
+                    "cpu_seconds": round(st["cpu_seconds"], 6),
+                    "calls": st["calls"],
+                }
+                for name, st in self.stages.items()
+            },
+            "pages": {
+                "count": self.pages["count"],
+                "wall_seconds": round(self.pages["wall_seconds"], 6),
+                "cpu_seconds": round(self.pages["cpu_seconds"], 6),
+                "slowest": [
+                    {
+                        "page": pno,
+                        "wall_seconds": round(wall, 6),
+                        "cpu_seconds": round(cpu, 6),
+                    }
+                    for wall, pno, cpu in sorted(self.slowest, reverse=True)
+                ],
+                "per_page": [page_row(row) for row in self.per_page],
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+def _prom_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def write_prometheus_textfile(path, cases):
+    # Formato do textfile collector do node_exporter; cases: [(nome do caso, metrics)].
+    # Grava em arquivo temporário e renomeia para o coletor nunca ler um arquivo parcial
+    series = {}
+
+    def add(name, help_text, labels, value):
+        entry = series.setdefault(name, (help_text, []))
+        label_s = ",".join(f'{k}="{_prom_label(v)}"' for k, v in labels)
+        entry[1].append(f"{name}{{{label_s}}} {value}")
+
+    for case, metrics in cases:
+        if not metrics:
+            continue
+        case_l = [("case", case)]
+        add(
+            "forenpdf_run_wall_seconds",
+            "Wall-clock time of the whole run.",
+            case_l,
+            metrics["wall_seconds"],
+        )
+        add(
+            "forenpdf_run_cpu_seconds",
+            "CPU time of the main process.",
+            case_l,
+            metrics["cpu_seconds"],
+        )
+        for stage, st in metrics["stages"].items():
+            labels = case_l + [("stage", stage)]
+            add(
+                "forenpdf_stage_wall_seconds",
+                "Wall-clock time per processing stage.",
+                labels,
+                st["wall_seconds"],
+            )
+            add(
+                "forenpdf_stage_cpu_seconds",
+                "Main-process CPU time per processing stage.",
+                labels,
+                st["cpu_seconds"],
+            )
+        pages = metrics["pages"]
+        add("forenpdf_pages", "Pages extracted.", case_l, pages["count"])
+        add(
+            "forenpdf_page_wall_seconds",
+            "Wall-clock time summed over page extraction.",
+            case_l,
+            pages["wall_seconds"],
+        )
+        add(
+            "forenpdf_page_cpu_seconds",
+            "CPU time summed over page extraction, including page workers.",
+            case_l,
+            pages["cpu_seconds"],
+        )
+        for name, value in metrics["counters"].items():
+            add(f"forenpdf_{name}", f"Counter {name} of the run.", case_l, value)
+
+    lines = []
+    for name, (help_text, samples) in series.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(samples)
+    ensure_dir(os.path.dirname(os.path.abspath(path)))
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+    return path
+
+
+def profile_paths(case_folder, evidence_name):
+    reports_dir = os.path.join(case_folder, "reports")
+    stem = os.path.splitext(os.path.basename(evidence_name))[0]
+    return (
+        os.path.join(reports_dir, f"{stem}_profile.pstats"),
+        os.path.join(reports_dir, f"{stem}_profile.txt"),
+    )
+
+
+def write_profile(profiler, case_folder, evidence_name):
+    stats_path, text_path = profile_paths(case_folder, evidence_name)
+    ensure_dir(os.path.dirname(stats_path))
+    profiler.dump_stats(stats_path)
+    with open(text_path, "w", encoding="utf-8") as fh:
+        stats = pstats.Stats(profiler, stream=fh)
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    logging.info("Profile saved to: %s", stats_path)
+    return stats_path
@@ -0,0 +1,243 @@
+# OCR (pool assíncrono + cache por SHA256 da imagem)
+
+import concurrent.futures
+import functools
+import importlib.util
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import time
+from io import BytesIO
+
+from .utils import ensure_dir
+
+OCR_MIN_SIDE = 32
+OCR_MIN_PIXELS = 10000
+OCR_SNIPPET_CHARS = 1000
+# Quebras do pool (worker morto) toleradas antes de desligar o OCR do documento
+OCR_POOL_RESTARTS = 2
+# Resolução da renderização de páginas sem texto para o OCR
+PAGE_OCR_DPI = 300
+
+
+def default_ocr_cache_path():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "forenpdf", "ocr.sqlite")
+
+
+@functools.lru_cache(maxsize=None)
+def ocr_modules():
+    # Pillow e pytesseract (opcionais) só são importados quando o OCR é de fato usado
+    try:
+        from PIL import Image
+        import pytesseract
+    except Exception:
+        return None
+    return Image, pytesseract
+
+
+@functools.lru_cache(maxsize=None)
+def ocr_available():
+    # Pillow e pytesseract instalados e tesseract no PATH, sem importar nada: a conferência
+    # completa (ocr_ready) fica para a primeira imagem enviada ao OCR
+    if not all(importlib.util.find_spec(name) for name in ("PIL", "pytesseract")):
+        return False
+    if shutil.which("tesseract") is None:
+        logging.warning("tesseract not found in PATH, OCR disabled")
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def ocr_ready():
+    # Importa os módulos e executa o tesseract uma vez (get_tesseract_version)
+    modules = ocr_modules()
+    if modules is None:
+        logging.warning("Pillow/pytesseract could not be imported, OCR disabled")
+        return False
+    try:
+        modules[1].get_tesseract_version()
+    except Exception as e:
+        logging.warning("tesseract not usable, OCR disabled: %s", e)
+        return False
+    return True
+
+
+def _ocr_image_file(source):
+    # source: caminho do arquivo ou bytes da imagem (sinks em contêiner). Exceções do
+    # pytesseract nem sempre voltam do worker por pickle (e quebram o pool): toda falha
+    # vira RuntimeError com a mensagem original
+    try:
+        Image, pytesseract = ocr_modules()
+        im = Image.open(source if isinstance(source, str) else BytesIO(source))
+        # convert to RGB to avoid palette/CMYK issues
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        return (pytesseract.image_to_string(im) or "").strip()
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+class OcrPool:
+    # OCR fora do laço de extração: as imagens vão para um pool limitado e o resultado
+    # é gravado no próprio registro de manifest["images"] quando fica pronto
+
+    def __init__(
+        self,
+        workers=None,
+        cache_path=None,
+        min_pixels=OCR_MIN_PIXELS,
+        min_side=OCR_MIN_SIDE,
+        on_result=None,
+    ):
+        self.on_result = on_result
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_pending = self.workers * 2
+        self.min_pixels = min_pixels
+        self.min_side = min_side
+        self.pending = {}
+        self.new_results = []
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "cache_hits": 0,
+            "skipped_small": 0,
+            "errors": 0,
+            "pool_restarts": 0,
+        }
+        self.disabled = False
+        self.t0 = time.perf_counter()
+        self.executor = None
+        self.cache = None
+        if cache_path:
+            ensure_dir(os.path.dirname(os.path.abspath(cache_path)))
+            self.cache = sqlite3.connect(cache_path, timeout=60)
+            self.cache.execute(
+                "CREATE TABLE IF NOT EXISTS ocr ("
+                "sha256 TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def _executor(self):
+        if self.executor is None:
+            # tesseract já roda como subprocesso; dentro de um worker do modo lote
+            # (daemon, sem filhos) threads bastam para manter o paralelismo
+            if multiprocessing.current_process().daemon:
+                self.executor = concurrent.futures.ThreadPoolExecutor(self.workers)
+            else:
+                self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+        return self.executor
+
+    def _broken(self, executor, error):
+        # Pool que perdeu um worker: descartado e recriado no próximo envio; depois de
+        # OCR_POOL_RESTARTS quebras as imagens seguintes ficam sem OCR
+        if executor is not self.executor:
+            return
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        if self.stats["pool_restarts"] >= OCR_POOL_RESTARTS:
+            logging.warning("OCR pool failed again (%s); OCR disabled", error)
+            self.disabled = True
+        else:
+            self.stats["pool_restarts"] += 1
+            logging.warning("OCR pool failed (%s); restarting it", error)
+
+    def ready(self):
+        # Primeiro envio ao OCR (imagem ou página renderizada): só então Pillow e
+        # pytesseract são importados; se não funcionarem, o OCR do documento é desligado
+        if not self.disabled and not ocr_ready():
+            self.disabled = True
+        return not self.disabled
+
+    def _apply(self, rec, text):
+        if text:
+            rec["ocr_snippet"] = text[:OCR_SNIPPET_CHARS]
+            if self.on_result is not None:
+                self.on_result(rec)
+
+    def _collect(self, futures):
+        for fut in futures:
+            rec, executor = self.pending.pop(fut)
+            try:
+                text = fut.result()
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.debug("OCR error on image xref %s: %s", rec.get("xref"), e)
+                if isinstance(e, concurrent.futures.BrokenExecutor):
+                    self._broken(executor, e)
+                continue
+            self.stats["completed"] += 1
+            self._apply(rec, text)
+            self.remember(rec["hash"], text)
+
+    def lookup(self, key):
+        # Texto em cache para a chave (SHA256 da imagem ou da página renderizada) ou None
+        if self.cache is None:
+            return None
+        row = self.cache.execute(
+            "SELECT text FROM ocr WHERE sha256 = ?", (key,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def remember(self, key, text):
+        # gravado no cache em finish(), junto com os resultados das imagens
+        self.new_results.append((key, text, time.time()))
+
+    def submit(self, rec, source):
+        if self.disabled:
+            self.stats["errors"] += 1
+            return
+        w, h = rec.get("width") or 0, rec.get("height") or 0
+        if w and h and (w * h < self.min_pixels or min(w, h) < self.min_side):
+            self.stats["skipped_small"] += 1
+            return
+        text = self.lookup(rec["hash"])
+        if text is not None:
+            self.stats["cache_hits"] += 1
+            self._apply(rec, text)
+            return
+        if not self.ready():
+            self.stats["errors"] += 1
+            return
+        if len(self.pending) >= self.max_pending:
+            done, _ = concurrent.futures.wait(
+                self.pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            self._collect(done)
+            if self.disabled:
+                self.stats["errors"] += 1
+                return
+        executor = self._executor()
+        try:
+            fut = executor.submit(_ocr_image_file, source)
+        except concurrent.futures.BrokenExecutor as e:
+            self.stats["errors"] += 1
+            self._broken(executor, e)
+            return
+        self.pending[fut] = (rec, executor)
+        self.stats["submitted"] += 1
+
+    def finish(self):
+        if self.pending:
+            done, _ = concurrent.futures.wait(self.pending)
+            self._collect(done)
+        if self.cache is not None and self.new_results:
+            with self.cache:
+                self.cache.executemany(
+                    "INSERT OR REPLACE INTO ocr (sha256, text, created) VALUES (?, ?, ?)",
+                    self.new_results,
+                )
+            self.new_results = []
+        self.stats["seconds"] = round(time.perf_counter() - self.t0, 3)
+        return self.stats
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
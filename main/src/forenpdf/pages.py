@@ -0,0 +1,575 @@
+# Extração por página (serial ou em pool de processos)
+
+import array
+import base64
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import fitz  # PyMuPDF
+
+from .governor import ResourceGovernor
+from .iocs import IOC_TYPES, index_iocs, scan_iocs
+from .passwords import open_document
+from .phash import PHASH_SIZE, hash_batch, reduce_gray
+from .sinks import ArtifactWriter, BlobCollector, DirectorySink
+from .utils import setup_logging
+
+PAGE_TEXT_PREVIEW = 20000
+# Níveis de extração de texto: além do texto e dos IOCs, só a visão do nível pedido
+TEXT_LEVELS = ("plain", "blocks", "words", "rawdict")
+TEXT_DIR = "text"
+# Flags do TextPage: sem imagens (já extraídas à parte); vale para todas as visões
+TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+def _pack(typecode, values):
+    # array compacto (little-endian) em base64, no lugar de listas de tuplas no JSON
+    arr = array.array(typecode, values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return base64.b64encode(arr.tobytes()).decode("ascii")
+
+
+def _unpack(typecode, data):
+    arr = array.array(typecode)
+    arr.frombytes(base64.b64decode(data))
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def pack_blocks(blocks):
+    # (x0, y0, x1, y1, texto, nº do bloco, tipo) -> bbox float32 + tipos uint8
+    bbox = array.array("f")
+    for b in blocks:
+        bbox.extend(b[:4])
+    return {
+        "count": len(blocks),
+        "text": [b[4] for b in blocks],
+        "bbox": _pack("f", bbox),
+        "type": _pack("B", (b[6] for b in blocks)),
+    }
+
+
+def pack_words(words):
+    # (x0, y0, x1, y1, palavra, bloco, linha, nº da palavra) -> bbox float32 + posições uint32
+    bbox = array.array("f")
+    position = array.array("I")
+    for w in words:
+        bbox.extend(w[:4])
+        position.extend(w[5:8])
+    return {
+        "count": len(words),
+        "text": [w[4] for w in words],
+        "bbox": _pack("f", bbox),
+        "position": _pack("I", position),
+    }
+
+
+def unpack_blocks(entry):
+    bbox = _unpack("f", entry["bbox"])
+    types = _unpack("B", entry["type"])
+    return [
+        (*bbox[4 * i : 4 * i + 4], text, i, types[i])
+        for i, text in enumerate(entry["text"])
+    ]
+
+
+def unpack_words(entry):
+    bbox = _unpack("f", entry["bbox"])
+    position = _unpack("I", entry["position"])
+    return [
+        (*bbox[4 * i : 4 * i + 4], text, *position[3 * i : 3 * i + 3])
+        for i, text in enumerate(entry["text"])
+    ]
+
+
+def reduced_image(doc, xref):
+    # Imagem decodificada e reduzida pelo MuPDF a 64-127 px no lado menor antes de ir para
+    # o NumPy (32x32, tons de cinza). O pixmap decodificado pode ser o do store do MuPDF:
+    # shrink() só numa cópia, e a conversão de cor (cara em resolução cheia) depois dela
+    src = fitz.Pixmap(doc, xref)
+    pix = fitz.Pixmap(src, 0)
+    del src
+    side = min(pix.width, pix.height)
+    if side >= 4 * PHASH_SIZE:
+        pix.shrink(int(math.log2(side / (2 * PHASH_SIZE))))
+    if pix.n != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    return reduce_gray(pix.samples, pix.width, pix.height, pix.stride)
+
+
+def _lap(res, stage, start):
+    # [parede, CPU da thread] desde start na parte da página; devolve o novo início
+    now = (time.perf_counter(), time.thread_time())
+    res["stage_seconds"][stage] = [now[0] - start[0], now[1] - start[1]]
+    return now
+
+
+def extract_page(
+    doc,
+    pno,
+    seen_image_hashes,
+    seen_xrefs,
+    writer,
+    text_level="plain",
+    governor=None,
+    perceptual=False,
+):
+    # Extrai texto, IOCs, imagens e links de uma página; o relatório é escrito depois
+    t0, c0 = time.perf_counter(), time.thread_time()
+    res = {
+        "page_number": pno + 1,
+        "text_preview": "\n",
+        "iocs": {},
+        "has_images": False,
+        "images": [],
+        "image_refs": [],
+        "annotations": [],
+        "link_uris": [],
+        "stage_seconds": {},
+    }
+    partial = {"reasons": [], "skipped": []}
+
+    def over_budget(stage, reason=None):
+        # Orçamento estourado: a etapa é pulada e a página fica marcada como parcial
+        if reason is None and governor is not None:
+            reason = governor.exceeded()
+        if reason is None:
+            return False
+        if reason not in partial["reasons"]:
+            partial["reasons"].append(reason)
+        if stage not in partial["skipped"]:
+            partial["skipped"].append(stage)
+        return True
+
+    if governor is not None:
+        governor.start_page()
+        shrinks = governor.store_shrinks
+    page = doc.load_page(pno)
+    lap = (time.perf_counter(), time.thread_time())
+    if not over_budget("text"):
+        # Um único TextPage (um parse do content stream) para o texto e a visão pedida
+        textpage = page.get_textpage(flags=TEXT_FLAGS)
+        page_text = page.get_text("text", textpage=textpage) or ""
+        # Write a limited preview if huge
+        res["text_preview"] = (
+            (page_text[:PAGE_TEXT_PREVIEW] + "...(truncated)\n")
+            if len(page_text) > PAGE_TEXT_PREVIEW
+            else page_text + "\n"
+        )
+        res["iocs"] = scan_iocs(page_text)
+        if text_level == "blocks" and not over_budget("blocks"):
+            res["blocks"] = pack_blocks(page.get_text("blocks", textpage=textpage))
+        elif text_level == "words" and not over_budget("words"):
+            res["words"] = pack_words(page.get_text("words", textpage=textpage))
+        elif text_level == "rawdict" and not over_budget("rawdict"):
+            # nível de caractere: volumoso demais para o manifest, vira artefato
+            rawdict = page.get_text("rawdict", textpage=textpage)
+            rel = f"{TEXT_DIR}/p{pno+1}_rawdict.json"
+            writer.write(
+                rel,
+                json.dumps(rawdict, ensure_ascii=False, separators=(",", ":")).encode(),
+            )
+            res["rawdict_file"] = rel
+        del textpage
+    lap = _lap(res, "text", lap)
+
+    # imagens novas da página, reduzidas, para os hashes perceptuais em um único lote
+    reduced = []
+    imgs = [] if over_budget("images") else page.get_images(full=True)
+    res["has_images"] = bool(imgs)
+    for imginfo in imgs:
+        xref = imginfo[0]
+        # Dedup por xref antes de decodificar: uma XObject reutilizada em todas as
+        # páginas é extraída e hasheada uma única vez
+        if xref in seen_xrefs:
+            h = seen_xrefs[xref]
+            if h is not None and (xref, h) not in res["image_refs"]:
+                res["image_refs"].append((xref, h))
+            continue
+        if over_budget("images"):
+            break
+        seen_xrefs[xref] = None
+        # Bombas de descompressão: barradas pelo tamanho declarado, antes de decodificar
+        oversize = governor and governor.image_over_budget(*imginfo[2:6])
+        if oversize:
+            over_budget("images", "image_size")
+            res.setdefault("images_skipped", []).append(
+                {
+                    "xref": xref,
+                    "width": imginfo[2],
+                    "height": imginfo[3],
+                    "estimated_bytes": oversize,
+                }
+            )
+            continue
+        try:
+            base = doc.extract_image(xref)
+            b = base["image"]
+            h = hashlib.sha256(b).hexdigest()
+            seen_xrefs[xref] = h
+            res["image_refs"].append((xref, h))
+            if h in seen_image_hashes:
+                logging.debug(
+                    "Duplicate image on page %s, xref %s => skipping duplicate write",
+                    pno + 1,
+                    xref,
+                )
+                continue
+            seen_image_hashes.add(h)
+            ext = base.get("ext", "bin")
+            rel = os.path.join("extracted_images", f"p{pno+1}_xref{xref}.{ext}")
+            writer.write(rel, b)
+            rec = {
+                "page": pno + 1,
+                "file": rel,
+                "hash": h,
+                "size": len(b),
+                "xref": xref,
+                "width": base.get("width"),
+                "height": base.get("height"),
+            }
+            res["images"].append(rec)
+            if perceptual and not over_budget("perceptual_hashes"):
+                try:
+                    reduced.append((rec, reduced_image(doc, xref)))
+                except Exception as e:
+                    logging.debug("No perceptual hash for xref %s: %s", xref, e)
+
+        except Exception as e:
+            logging.debug("Image extraction error on page %s: %s", pno + 1, e)
+    if reduced:
+        for (rec, _), hashes in zip(reduced, hash_batch([r for _, r in reduced])):
+            rec["perceptual_hashes"] = hashes
+        del reduced
+    lap = _lap(res, "images", lap)
+
+    # links (annotations)
+    if not over_budget("links"):
+        try:
+            for lk in page.get_links() or []:
+                res["annotations"].append(f"Annotation link: {lk}")
+                uri = lk.get("uri") if isinstance(lk, dict) else None
+                if uri:
+                    res["link_uris"].append(uri)
+        except Exception as e:
+            logging.debug("Error reading page links: %s", e)
+    _lap(res, "links", lap)
+    if partial["reasons"]:
+        res["partial"] = partial
+    if governor is not None:
+        governor.end_page()
+        if governor.store_shrinks > shrinks:
+            res["store_shrinks"] = governor.store_shrinks - shrinks
+    res["seconds"] = time.perf_counter() - t0
+    res["cpu_seconds"] = time.thread_time() - c0
+    return res
+
+
+def artifact_display(writer, rel):
+    path = writer.sink.local_path(rel)
+    return path if path is not None else f"{writer.sink.container}:{rel}"
+
+
+def format_image_clusters(index, clusters, writer):
+    # Seção do relatório com os clusters de quase duplicatas e as imagens sem par
+    lines = [
+        f"IMAGES ({len(index.images) + len(index.unhashed)} unique, "
+        f"{len(clusters)} near-duplicate "
+        f"cluster(s), pHash distance <= {index.max_distance})"
+    ]
+    clustered = set()
+    for c in clusters:
+        pages = ", ".join(map(str, c["pages"][:20])) + (
+            f", ... ({len(c['pages'])} pages)" if len(c["pages"]) > 20 else ""
+        )
+        lines.append(
+            f"Cluster {c['cluster']}: {c['size']} images on pages {pages} "
+            f"(max distance {c['max_distance']}), representative "
+            f"{artifact_display(writer, c['representative'])}"
+        )
+        clustered.update(img["sha256"] for img in c["images"])
+    for sha256, rel, page in index.images + index.unhashed:
+        if sha256 not in clustered:
+            lines.append(
+                f"Saved image: {artifact_display(writer, rel)} (page {page}, "
+                f"sha256={sha256})"
+            )
+    return "\n".join(lines) + "\n\n"
+
+
+def add_link(manifest, seen_links, uri, pno, stream=None):
+    if uri in seen_links:
+        return
+    seen_links.add(uri)
+    if stream is not None:
+        stream.emit("link", {"url": uri, "page": pno})
+    else:
+        manifest["links"].append(uri)
+
+
+def add_extracted_file(manifest, rel, stream=None):
+    if stream is not None:
+        stream.emit("extracted_file", {"file": rel})
+    else:
+        manifest["extracted_files"].append(rel)
+
+
+def merge_page_result(
+    res,
+    manifest,
+    report,
+    case_folder,
+    seen_image_hashes,
+    seen_links,
+    ocr=None,
+    writer=None,
+    stream=None,
+    phash_index=None,
+):
+    # Consolida uma página no manifest/relatório; chamado sempre em ordem de página.
+    # Com phash_index, as imagens vão para o agrupamento por similaridade e o relatório
+    # as lista no fim, por cluster, em vez de uma linha por página
+    pno = res["page_number"]
+    blobs = res.get("blobs")
+    report.write(f"\n=== PAGE {pno} ===\n")
+    report.write("[PAGE TEXT START]\n")
+    report.write(res["text_preview"])
+    report.write("[PAGE TEXT END]\n\n")
+    if "ocr_text" in res:
+        # página sem camada de texto, renderizada e lida pelo OCR
+        report.write(f"[PAGE OCR TEXT START] ({res['page_ocr']['chars']} chars)\n")
+        report.write(res["ocr_text"] + "\n")
+        report.write("[PAGE OCR TEXT END]\n\n")
+
+    iocs = res["iocs"]
+    page_entry = {"page_number": pno}
+    for kind in IOC_TYPES:
+        # urls/ips/emails sempre presentes; demais tipos só quando encontrados
+        if kind in iocs or kind in ("urls", "ips", "emails"):
+            page_entry[kind] = list(iocs.get(kind, ()))
+    for u in page_entry["urls"]:
+        add_link(manifest, seen_links, u, pno, stream)
+
+    report.write(
+        "IOCs: "
+        + " ".join(f"{k}={v}" for k, v in page_entry.items() if k != "page_number")
+        + "\n"
+    )
+    for view in ("blocks", "words"):
+        if view in res:
+            page_entry[view] = res[view]
+    if "rawdict_file" in res:
+        rel = res["rawdict_file"]
+        if blobs is not None:
+            writer.write(rel, blobs[rel])
+        page_entry["rawdict_file"] = rel
+        add_extracted_file(manifest, rel, stream)
+    if "page_ocr" in res:
+        page_entry["page_ocr"] = res["page_ocr"]
+    if "thumbnail" in res:
+        page_entry["thumbnail"] = res["thumbnail"]
+        add_extracted_file(manifest, res["thumbnail"], stream)
+        report.write(f"Thumbnail: {artifact_display(writer, res['thumbnail'])}\n")
+    if "partial" in res:
+        page_entry["partial"] = res["partial"]
+        report.write(
+            f"PARTIAL PAGE: budget exceeded ({', '.join(res['partial']['reasons'])}); "
+            f"skipped: {', '.join(res['partial']['skipped'])}\n"
+        )
+    for img in res.get("images_skipped", ()):
+        page_entry.setdefault("images_skipped", []).append(img)
+        report.write(
+            f"Skipped image xref {img['xref']}: {img['width']}x{img['height']}, "
+            f"~{img['estimated_bytes']} bytes decoded\n"
+        )
+    if "blocks" in res:
+        report.write(
+            f"Text layout: {res['blocks']['count']} blocks"
+            + (f", {res['words']['count']} words" if "words" in res else "")
+            + (
+                f", characters in {artifact_display(writer, res['rawdict_file'])}"
+                if "rawdict_file" in res
+                else ""
+            )
+            + "\n"
+        )
+
+    if res["has_images"]:
+        for rec in res["images"]:
+            h = rec["hash"]
+            rel = rec["file"]
+            if h in seen_image_hashes:
+                # Duplicata vista em outro intervalo de páginas (modo paralelo)
+                if blobs is None:
+                    writer.sink.remove(rel)
+                continue
+            seen_image_hashes[h] = rel
+            if blobs is not None:
+                writer.write(rel, blobs[rel])
+            if stream is not None:
+                stream.emit("image", rec)
+            else:
+                manifest["images"].append(rec)
+            if phash_index is not None:
+                phash_index.add(rec)
+            else:
+                report.write(
+                    f"Saved image: {artifact_display(writer, rel)} (sha256={h})\n"
+                )
+            # o texto da página renderizada já inclui o das suas imagens
+            if ocr is not None and "ocr_text" not in res:
+                writer.wait_for(rel)
+                source = writer.sink.local_path(rel)
+                if source is None:
+                    source = blobs[rel] if blobs is not None else writer.sink.read(rel)
+                ocr.submit(rec, source)
+    else:
+        report.write("No images on page.\n")
+    if res["image_refs"]:
+        # Quais artefatos cada página referencia, inclusive imagens repetidas
+        page_entry["image_refs"] = [
+            {"xref": xref, "sha256": h, "file": seen_image_hashes.get(h)}
+            for xref, h in res["image_refs"]
+        ]
+
+    for line in res["annotations"]:
+        report.write(line + "\n")
+    for uri in res["link_uris"]:
+        add_link(manifest, seen_links, uri, pno, stream)
+
+    if stream is not None:
+        # contagens por valor vão junto para o finalizador reconstruir o ioc_index
+        stream.emit("page", dict(page_entry, ioc_counts=iocs))
+        stream.flush()
+    else:
+        manifest["pages"].append(page_entry)
+        index_iocs(manifest["ioc_index"], iocs, pno)
+
+
+# Estado por processo do pool de páginas: cada worker mantém seu próprio handle fitz
+_page_worker_state = {}
+
+
+def _page_worker_init(
+    pdf_path, case_folder, sink_kind, text_level, budgets, perceptual, password, quiet
+):
+    setup_logging(quiet=quiet)
+    if sink_kind == "dir":
+        writer = ArtifactWriter(DirectorySink(case_folder))
+    else:
+        writer = BlobCollector()
+    _page_worker_state.update(
+        doc=open_document(pdf_path, password),
+        writer=writer,
+        text_level=text_level,
+        perceptual=perceptual,
+        # o prazo do documento vem pronto do processo principal
+        governor=ResourceGovernor(**budgets) if budgets else None,
+    )
+
+
+def _page_worker_run(page_range):
+    st = _page_worker_state
+    writer = st["writer"]
+    # Deduplicação local ao intervalo; a global é feita em merge_page_result
+    seen, seen_xrefs = set(), {}
+    results = []
+    for pno in range(*page_range):
+        if isinstance(writer, BlobCollector):
+            res = extract_page(
+                st["doc"],
+                pno,
+                seen,
+                seen_xrefs,
+                writer,
+                st["text_level"],
+                st["governor"],
+                st["perceptual"],
+            )
+            res["blobs"], writer.blobs = writer.blobs, {}
+        else:
+            # gravado no worker: o processo principal só soma nas métricas
+            files, size = writer.files_written, writer.bytes_written
+            res = extract_page(
+                st["doc"],
+                pno,
+                seen,
+                seen_xrefs,
+                writer,
+                st["text_level"],
+                st["governor"],
+                st["perceptual"],
+            )
+            res["files_written"] = writer.files_written - files
+            res["bytes_written"] = writer.bytes_written - size
+        results.append(res)
+    # O processo principal pode apagar duplicatas ou enviar ao OCR: arquivos já gravados
+    writer.flush()
+    return results
+
+
+def page_ranges(page_count, workers, start=0):
+    # Intervalos contíguos, vários por worker, para equilibrar páginas pesadas
+    chunk = max(1, min(64, -(-(page_count - start) // (workers * 8))))
+    return [(i, min(i + chunk, page_count)) for i in range(start, page_count, chunk)]
+
+
+def iter_page_results(
+    doc,
+    pdf_path,
+    writer,
+    page_workers=1,
+    text_level="plain",
+    governor=None,
+    perceptual=False,
+    start=0,
+    image_refs=(),
+    password=None,
+):
+    # start: primeira página a extrair; as anteriores vêm de um checkpoint, e seus pares
+    # (xref, sha256) em image_refs evitam reextrair as imagens já gravadas. password:
+    # senha de um documento criptografado, para os handles dos workers
+    page_count = doc.page_count
+    if page_workers > 1 and multiprocessing.current_process().daemon:
+        # workers do modo lote não podem criar subprocessos
+        logging.debug("Page-parallel mode unavailable inside a pool worker; serial run")
+        page_workers = 1
+    if page_workers <= 1 or page_count - start < 2:
+        seen_xrefs = {xref: h for xref, h in image_refs}
+        seen = set(seen_xrefs.values())
+        for pno in range(start, page_count):
+            yield extract_page(
+                doc, pno, seen, seen_xrefs, writer, text_level, governor, perceptual
+            )
+        return
+
+    workers = min(page_workers, page_count - start)
+    quiet = logging.getLogger().getEffectiveLevel() > logging.DEBUG
+    logging.info("Page-parallel extraction: %d pages, %d workers", page_count, workers)
+    with multiprocessing.Pool(
+        processes=workers,
+        initializer=_page_worker_init,
+        initargs=(
+            pdf_path,
+            writer.sink.case_folder,
+            writer.sink.name,
+            text_level,
+            governor.budgets() if governor is not None else None,
+            perceptual,
+            password,
+            quiet,
+        ),
+    ) as pool:
+        # imap preserva a ordem dos intervalos, então o merge segue a ordem das páginas
+        for results in pool.imap(
+            _page_worker_run, page_ranges(page_count, workers, start)
+        ):
+            yield from results
@@ -0,0 +1,334 @@
+# Recuperação de senha de PDFs criptografados (casos autorizados): candidatas de listas
+# e de regras de variação, testadas com doc.authenticate em um pool de processos
+
+import concurrent.futures
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+
+# Candidatas por tarefa do pool; o prazo e a parada são conferidos dentro dela
+PASSWORD_CHUNK = 256
+# Intervalo entre as linhas de progresso no log
+PASSWORD_PROGRESS_SECONDS = 10
+# Orçamento padrão da recuperação por documento (a CLI usa 0 para "sem limite")
+PASSWORD_MAX_SECONDS = 900
+# Anos das regras "years", "combined" e "dates"
+PASSWORD_YEARS = (1950, 2030)
+# Candidatas entre conferências do prazo e do sinal de parada no worker
+_CHECK_EVERY = 16
+_LEET = str.maketrans("aeiostAEIOST", "4310574310$7")
+_SYMBOLS = ("!", "@", "#", "$", "*", ".", "?")
+_DATE_FORMATS = (
+    "{d:02d}{m:02d}{y}",
+    "{d:02d}{m:02d}{yy:02d}",
+    "{y}{m:02d}{d:02d}",
+    "{d:02d}/{m:02d}/{y}",
+    "{d:02d}-{m:02d}-{y}",
+    "{d:02d}.{m:02d}.{y}",
+)
+_MONTH_DAYS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+# Resultado de doc.authenticate: bit 2 = senha de usuário, bit 4 = senha do dono
+_AUTH_KINDS = {2: "user", 4: "owner", 6: "user+owner"}
+
+
+def _case(word, years):
+    yield word.lower()
+    yield word.upper()
+    yield word.capitalize()
+    yield word.swapcase()
+
+
+def _reverse(word, years):
+    yield word[::-1]
+
+
+def _leet(word, years):
+    yield word.translate(_LEET)
+    yield word.lower().translate(_LEET)
+
+
+def _digits(word, years):
+    for i in range(10):
+        yield f"{word}{i}"
+    for i in range(100):
+        yield f"{word}{i:02d}"
+    for tail in ("123", "1234", "12345", "123456"):
+        yield word + tail
+
+
+def _years(word, years):
+    for y in range(years[0], years[1] + 1):
+        yield f"{word}{y}"
+        yield f"{word}{y % 100:02d}"
+
+
+def _symbols(word, years):
+    for s in _SYMBOLS:
+        yield word + s
+        yield s + word
+
+
+def _combined(word, years):
+    # Nome + ano + símbolo, a forma mais comum das políticas de senha "fortes"
+    for base in dict.fromkeys((word.lower(), word.capitalize())):
+        for y in range(years[0], years[1] + 1):
+            for stem in (f"{base}{y}", f"{base}{y % 100:02d}"):
+                yield stem
+                for s in _SYMBOLS[:4]:
+                    yield stem + s
+
+
+def iter_dates(years):
+    # Datas (nascimento, casamento, ...) do intervalo de anos, em formatos comuns
+    for y in range(years[0], years[1] + 1):
+        for m, days in enumerate(_MONTH_DAYS, 1):
+            for d in range(1, days + 1):
+                for fmt in _DATE_FORMATS:
+                    yield fmt.format(d=d, m=m, y=y, yy=y % 100)
+
+
+# Regras de variação aplicadas a cada palavra-base (do caso e das listas); "dates" não
+# parte de palavras: gera as datas do intervalo de anos
+PASSWORD_RULES = {
+    "case": _case,
+    "reverse": _reverse,
+    "leet": _leet,
+    "digits": _digits,
+    "years": _years,
+    "symbols": _symbols,
+    "combined": _combined,
+    "dates": None,
+}
+DEFAULT_PASSWORD_RULES = ("case", "digits", "years", "symbols", "combined", "dates")
+
+
+def parse_password_rules(spec):
+    # "case,years" -> ("case", "years"); "default", "all" e "none" são atalhos
+    rules = []
+    for name in (n.strip() for n in spec.split(",")):
+        if name == "default":
+            rules.extend(DEFAULT_PASSWORD_RULES)
+        elif name == "all":
+            rules.extend(PASSWORD_RULES)
+        elif name in PASSWORD_RULES:
+            rules.append(name)
+        elif name and name != "none":
+            raise ValueError(
+                f"unknown password rule {name!r} "
+                f"(choose from: {', '.join(PASSWORD_RULES)}, default, all, none)"
+            )
+    return tuple(dict.fromkeys(rules))
+
+
+def parse_years(spec):
+    # "1970-2005" -> (1970, 2005); um ano só vale como intervalo de um ano
+    start, _, end = spec.partition("-")
+    start, end = int(start), int(end or start)
+    if start > end:
+        raise ValueError(f"invalid year range {spec!r}")
+    return start, end
+
+
+def iter_wordlist(path):
+    # Uma candidata por linha; linhas que não são UTF-8 valem como Latin-1
+    with open(path, "rb") as fh:
+        for line in fh:
+            line = line.rstrip(b"\r\n")
+            if not line:
+                continue
+            try:
+                yield line.decode("utf-8")
+            except UnicodeDecodeError:
+                yield line.decode("latin-1")
+
+
+def wordlist_sources(paths):
+    # Identificação das listas usadas (cadeia de custódia): caminho, tamanho e SHA256
+    sources = []
+    for path in paths:
+        h = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1024 * 1024), b""):
+                h.update(block)
+        sources.append(
+            {
+                "path": os.path.abspath(path),
+                "size": os.path.getsize(path),
+                "sha256": h.hexdigest(),
+            }
+        )
+    return sources
+
+
+def iter_candidates(
+    passwords=(),
+    words=(),
+    wordlists=(),
+    rules=DEFAULT_PASSWORD_RULES,
+    years=PASSWORD_YEARS,
+):
+    # Ordem de probabilidade: senhas informadas, palavras do caso (nomes, apelidos,
+    # datas), listas; depois cada regra sobre as palavras do caso e então sobre as
+    # listas. As listas são relidas a cada passagem, nunca carregadas na memória.
+    def bases():
+        yield from words
+        for path in wordlists:
+            yield from iter_wordlist(path)
+
+    yield from passwords
+    yield from bases()
+    for name in rules:
+        rule = PASSWORD_RULES[name]
+        if rule is None:
+            yield from iter_dates(years)
+            continue
+        for word in bases():
+            # variações repetidas da mesma palavra (ex.: "2000" em _digits e _years)
+            # são testadas uma vez
+            seen = {word}
+            for variant in rule(word, years):
+                if variant and variant not in seen:
+                    seen.add(variant)
+                    yield variant
+
+
+def _chunks(candidates, size):
+    chunk = []
+    for pw in candidates:
+        chunk.append(pw)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def open_document(pdf_path, password=None):
+    # Handle fitz do documento, já destravado quando a senha é conhecida
+    import fitz  # PyMuPDF; fora do topo para a CLI importar as regras sem ele
+
+    doc = fitz.open(pdf_path)
+    if password is not None and doc.needs_pass:
+        doc.authenticate(password)
+    return doc
+
+
+# Estado por processo do pool de senhas: cada worker mantém seu próprio handle fitz
+_password_state = {}
+
+
+def _password_init(pdf_path, deadline, stop):
+    _password_state.update(doc=open_document(pdf_path), deadline=deadline, stop=stop)
+
+
+def _password_run(chunk):
+    # (senha, código do authenticate, tentativas) do lote; senha None se nenhuma serviu
+    st = _password_state
+    doc, deadline, stop = st["doc"], st["deadline"], st["stop"]
+    tried = 0
+    for pw in chunk:
+        if tried % _CHECK_EVERY == 0 and (
+            (deadline is not None and time.time() > deadline)
+            or (stop is not None and stop.is_set())
+        ):
+            break
+        tried += 1
+        rc = doc.authenticate(pw)
+        if rc:
+            return pw, rc, tried
+    return None, 0, tried
+
+
+def recover_password(
+    pdf_path,
+    candidates,
+    workers=None,
+    max_seconds=PASSWORD_MAX_SECONDS,
+    chunk_size=PASSWORD_CHUNK,
+    progress_seconds=PASSWORD_PROGRESS_SECONDS,
+):
+    # Testa as candidatas até achar a senha, esgotá-las ou estourar o prazo; devolve as
+    # estatísticas da tentativa ("status": "found", "exhausted" ou "timeout")
+    t0 = time.time()
+    deadline = t0 + max_seconds if max_seconds else None
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers > 1 and multiprocessing.current_process().daemon:
+        # workers do modo lote não podem criar subprocessos
+        logging.debug("Parallel password recovery unavailable in a pool worker")
+        workers = 1
+    stats = {
+        "status": "exhausted",
+        "password": None,
+        "authenticated_as": None,
+        "attempts": 0,
+        "workers": workers,
+    }
+    chunks = _chunks(candidates, chunk_size)
+    next_progress = t0 + progress_seconds
+
+    def account(result):
+        nonlocal next_progress
+        pw, rc, tried = result
+        stats["attempts"] += tried
+        if pw is not None and stats["password"] is None:
+            stats.update(
+                status="found",
+                password=pw,
+                authenticated_as=_AUTH_KINDS.get(rc & 6, str(rc)),
+            )
+        now = time.time()
+        if stats["password"] is None and deadline is not None and now > deadline:
+            stats["status"] = "timeout"
+        if now >= next_progress:
+            next_progress = now + progress_seconds
+            logging.info(
+                "Password recovery: %d candidate(s) tried in %.0fs (%.0f/s)",
+                stats["attempts"],
+                now - t0,
+                stats["attempts"] / max(now - t0, 1e-6),
+            )
+        return stats["status"] != "exhausted"
+
+    logging.info("Password recovery: %d worker(s)", workers)
+    if workers == 1:
+        _password_init(pdf_path, deadline, None)
+        try:
+            for chunk in chunks:
+                if account(_password_run(chunk)):
+                    break
+        finally:
+            _password_state.pop("doc").close()
+    else:
+        stop = multiprocessing.Event()
+        executor = concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_password_init, initargs=(pdf_path, deadline, stop)
+        )
+        pending = set()
+        done = False
+        try:
+            # no máximo dois lotes por worker em voo: listas enormes não vão inteiras
+            # para a fila do pool
+            for chunk in chunks:
+                pending.add(executor.submit(_password_run, chunk))
+                if len(pending) < workers * 2:
+                    continue
+                finished, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if any([account(f.result()) for f in finished]):
+                    done = True
+                    break
+            # os lotes em voo terminam (ou param pelo sinal) e também entram na conta
+            if done:
+                stop.set()
+            for f in concurrent.futures.as_completed(pending):
+                account(f.result())
+        finally:
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+    seconds = time.time() - t0
+    stats["seconds"] = round(seconds, 3)
+    stats["rate_per_second"] = round(stats["attempts"] / max(seconds, 1e-6), 1)
+    return stats
@@ -0,0 +1,230 @@
+# Hashes perceptuais (aHash, dHash, pHash) vetorizados com NumPy e agrupamento de
+# imagens quase duplicadas pela distância de Hamming
+
+import array
+import functools
+
+# Lado da imagem reduzida de onde saem os três hashes (pHash: DCT 32x32 -> 8x8)
+PHASH_SIZE = 32
+# Distância de Hamming máxima entre pHashes (64 bits) de duas imagens quase duplicadas
+PHASH_MAX_DISTANCE = 8
+# Linhas por bloco na comparação dentro de um balde: limita a matriz de XOR em memória e
+# compara cada bloco só com os membros seguintes (triângulo superior)
+_PAIR_BLOCK = 256
+
+
+@functools.lru_cache(maxsize=None)
+def numpy_module():
+    # NumPy (opcional) só é importado quando os hashes perceptuais são pedidos
+    try:
+        import numpy
+    except Exception:
+        return None
+    return numpy
+
+
+def perceptual_available():
+    return numpy_module() is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _area_matrix(src, dst):
+    # Matriz dst x src de redução por média de área (ampliação vira vizinho mais próximo)
+    np = numpy_module()
+    m = np.zeros((dst, src), dtype=np.float32)
+    scale = src / dst
+    for i in range(dst):
+        start, end = i * scale, (i + 1) * scale
+        for j in range(int(start), min(int(np.ceil(end)), src)):
+            m[i, j] = min(end, j + 1) - max(start, j)
+        m[i] /= m[i].sum()
+    return m
+
+
+@functools.lru_cache(maxsize=None)
+def _dct_matrix(n):
+    # DCT-II ortonormal: d @ x @ d.T é a DCT 2D de x
+    np = numpy_module()
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m.astype(np.float32)
+
+
+@functools.lru_cache(maxsize=None)
+def _popcount_table():
+    np = numpy_module()
+    return np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(values):
+    # Bits ligados de cada uint64 (np.bitwise_count no NumPy 2; tabela por byte antes)
+    np = numpy_module()
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    table = _popcount_table()
+    return table[values.view(np.uint8).reshape(values.shape + (8,))].sum(
+        axis=-1, dtype=np.uint8
+    )
+
+
+def reduce_gray(samples, width, height, stride=None):
+    # Amostras em tons de cinza (1 byte por pixel) -> matriz 32x32 float32
+    np = numpy_module()
+    img = np.frombuffer(samples, dtype=np.uint8).reshape(height, stride or width)
+    img = img[:, :width].astype(np.float32)
+    return _area_matrix(height, PHASH_SIZE) @ img @ _area_matrix(width, PHASH_SIZE).T
+
+
+def _pack(bits):
+    # (N, 64) bool -> N inteiros de 64 bits, primeiro bit = mais significativo
+    np = numpy_module()
+    return np.packbits(bits, axis=1).view(">u8").ravel().tolist()
+
+
+def hash_batch(images):
+    # Matrizes 32x32 de um lote -> [{"ahash", "dhash", "phash"}] (64 bits em hexadecimal)
+    np = numpy_module()
+    x = np.stack(images)
+    n = len(x)
+    # aHash: 8x8 pela média de blocos 4x4, bit = acima da média
+    small = x.reshape(n, 8, 4, 8, 4).mean(axis=(2, 4)).reshape(n, 64)
+    ahash = small > small.mean(axis=1, keepdims=True)
+    # dHash: 9 colunas x 8 linhas, bit = pixel mais claro que o vizinho da esquerda
+    wide = x.reshape(n, 8, 4, PHASH_SIZE).mean(axis=2) @ _area_matrix(PHASH_SIZE, 9).T
+    dhash = (wide[:, :, 1:] > wide[:, :, :-1]).reshape(n, 64)
+    # pHash: 8x8 frequências mais baixas da DCT 32x32, bit = acima da mediana
+    d = _dct_matrix(PHASH_SIZE)
+    low = (d @ x @ d.T)[:, :8, :8].reshape(n, 64)
+    phash = low > np.median(low, axis=1, keepdims=True)
+    return [
+        {"ahash": f"{a:016x}", "dhash": f"{b:016x}", "phash": f"{c:016x}"}
+        for a, b, c in zip(_pack(ahash), _pack(dhash), _pack(phash))
+    ]
+
+
+def near_duplicate_pairs(hashes, max_distance=PHASH_MAX_DISTANCE):
+    # Pares (i, j), i < j, a distância de Hamming <= max_distance. Pela casa dos pombos,
+    # dois hashes a essa distância coincidem em pelo menos um de max_distance + 1 blocos
+    # de bits: só pares que caem no mesmo balde de algum bloco são comparados
+    np = numpy_module()
+    h = np.asarray(hashes, dtype=np.uint64)
+    if max_distance >= 64:
+        # qualquer par está a 64 bits ou menos; 65 blocos não cabem em 64 bits
+        i, j = np.triu_indices(len(h), k=1)
+        return np.stack([i, j], axis=1).astype(np.intp)
+    # max_distance + 1 blocos disjuntos de bits, com fronteiras inteiras e não vazios
+    sizes = [len(part) for part in np.array_split(np.arange(64), max_distance + 1)]
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    found = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        mask = np.uint64((1 << int(hi - lo)) - 1)
+        key = (h >> np.uint64(lo)) & mask
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+        starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        multi = ends - starts > 1
+        for s, e in zip(starts[multi], ends[multi]):
+            # índices crescentes dentro do balde (argsort estável)
+            members = order[s:e]
+            for b in range(0, len(members), _PAIR_BLOCK):
+                rows = members[b : b + _PAIR_BLOCK]
+                cols = members[b:]
+                dist = popcount(h[rows][:, None] ^ h[cols][None, :])
+                i, j = np.nonzero(dist <= max_distance)
+                i, j = rows[i], cols[j]
+                keep = i < j
+                found.append(np.stack([i[keep], j[keep]], axis=1))
+    if not found:
+        return np.empty((0, 2), dtype=np.intp)
+    return np.unique(np.concatenate(found), axis=0)
+
+
+def cluster_labels(hashes, max_distance=PHASH_MAX_DISTANCE):
+    # Rótulo de cluster por hash: componentes conexos do grafo "distância <= máx.",
+    # rotulados pelo menor índice (hashes iguais são resolvidos antes, pelo np.unique)
+    np = numpy_module()
+    h = np.asarray(hashes, dtype=np.uint64)
+    uniq, first, inverse = np.unique(h, return_index=True, return_inverse=True)
+    labels = np.arange(len(uniq))
+    pairs = near_duplicate_pairs(uniq, max_distance)
+    if len(pairs):
+        i, j = pairs[:, 0], pairs[:, 1]
+        while True:
+            # propagação do menor rótulo com salto de ponteiros
+            new = labels.copy()
+            low = np.minimum(labels[i], labels[j])
+            np.minimum.at(new, i, low)
+            np.minimum.at(new, j, low)
+            new = new[new]
+            if np.array_equal(new, labels):
+                break
+            labels = new
+    # em termos das posições originais: o rótulo é a primeira imagem do cluster
+    first_of = np.full(len(uniq), len(h), dtype=np.intp)
+    np.minimum.at(first_of, labels, first)
+    return first_of[labels][inverse.ravel()]
+
+
+class PerceptualIndex:
+    # Imagens únicas (por SHA256) do documento, na ordem do merge, para o agrupamento
+    # final; 8 bytes por imagem além das referências
+
+    def __init__(self, max_distance=PHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.hashes = array.array("Q")
+        self.images = []
+        # imagens sem hash perceptual (decodificação falhou ou orçamento estourado)
+        self.unhashed = []
+
+    def add(self, rec):
+        ph = rec.get("perceptual_hashes")
+        if ph:
+            self.hashes.append(int(ph["phash"], 16))
+            self.images.append((rec["hash"], rec["file"], rec["page"]))
+        else:
+            self.unhashed.append((rec["hash"], rec["file"], rec["page"]))
+
+    def clusters(self):
+        # Clusters com 2+ imagens, na ordem da primeira aparição; a primeira imagem é a
+        # representante e cada membro leva sua distância até ela
+        np = numpy_module()
+        if len(self.hashes) < 2:
+            return []
+        h = np.frombuffer(self.hashes, dtype=np.uint64)
+        labels = cluster_labels(h, self.max_distance)
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        clusters = []
+        for s, e in zip(starts, ends):
+            if e - s < 2:
+                continue
+            members = order[s:e]
+            dist = popcount(h[members] ^ h[members[0]]).tolist()
+            images = [
+                {
+                    "sha256": self.images[m][0],
+                    "file": self.images[m][1],
+                    "page": self.images[m][2],
+                    "distance": d,
+                }
+                for m, d in zip(members.tolist(), dist)
+            ]
+            clusters.append(
+                {
+                    "size": len(images),
+                    "representative": images[0]["file"],
+                    "phash": f"{int(h[members[0]]):016x}",
+                    "pages": sorted({img["page"] for img in images}),
+                    "max_distance": max(dist),
+                    "images": images,
+                }
+            )
+        # rótulo = índice da primeira imagem: os clusters já saem na ordem de aparição
+        for n, c in enumerate(clusters, 1):
+            c["cluster"] = n
+        return clusters
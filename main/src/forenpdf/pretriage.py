@@ -0,0 +1,240 @@
+# Pré-triagem sobre os bytes brutos (mmap), sem abrir o documento com o PyMuPDF
+
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import time
+
+from .triage import ESCAPED_NAME_RE
+
+# Palavras-chave no estilo do pdfid; a contagem é feita sobre o arquivo inteiro, inclusive
+# dentro de streams compactados (onde só aparecem por acaso)
+PRETRIAGE_KEYWORDS = (
+    b"JS",
+    b"JavaScript",
+    b"AA",
+    b"OpenAction",
+    b"Launch",
+    b"ObjStm",
+    b"EmbeddedFile",
+    b"AcroForm",
+    b"XFA",
+    b"RichMedia",
+    b"JBIG2Decode",
+    b"Encrypt",
+    b"URI",
+    b"Page",
+)
+STRUCTURE_KEYWORDS = (
+    b"obj",
+    b"endobj",
+    b"stream",
+    b"endstream",
+    b"xref",
+    b"trailer",
+    b"startxref",
+)
+PDF_HEADER_WINDOW = 1024
+# Bytes após o último %%EOF inspecionados para decidir se são só espaços
+TRAILING_SCAN_LIMIT = 1024 * 1024
+
+_NAMES_RE = re.compile(
+    rb"/("
+    + b"|".join(re.escape(k) for k in sorted(PRETRIAGE_KEYWORDS, key=len, reverse=True))
+    + rb")(?=[\s()<>\[\]{}/%]|$)"
+)
+# Uma alternação sem prefixo literal é ~10x mais lenta no re: as palavras de estrutura são
+# contadas uma a uma como literais, e "endobj" é descontado de "obj" (idem stream/xref)
+_LITERAL_RES = {k: re.compile(re.escape(k)) for k in STRUCTURE_KEYWORDS + (b"%%EOF",)}
+_STRUCTURE_PARTS = {"obj": "endobj", "stream": "endstream", "xref": "startxref"}
+_HEADER_RE = re.compile(rb"%PDF-(\d\.\d)")
+_HEX_ESCAPE_RE = re.compile(rb"#([0-9A-Fa-f]{2})")
+_NAME_SET = frozenset(PRETRIAGE_KEYWORDS)
+
+
+def _has(*keywords):
+    return lambda r: any(r["keywords"][k] for k in keywords)
+
+
+# Regras da política de escalonamento: o documento segue para o process_pdf completo se
+# qualquer regra escolhida casar com o resultado da pré-triagem
+ESCALATION_RULES = {
+    "javascript": _has("/JS", "/JavaScript"),
+    "auto_action": _has("/OpenAction", "/AA"),
+    "launch": _has("/Launch"),
+    "embedded_file": _has("/EmbeddedFile"),
+    "acroform": _has("/AcroForm"),
+    "xfa": _has("/XFA"),
+    "richmedia": _has("/RichMedia"),
+    "objstm": _has("/ObjStm"),
+    "jbig2": _has("/JBIG2Decode"),
+    "encrypted": _has("/Encrypt"),
+    "uri": _has("/URI"),
+    "obfuscated_names": lambda r: bool(r["obfuscated_names"]),
+    "incremental_updates": lambda r: r["incremental_updates"] > 0,
+    "trailing_data": lambda r: r["trailing_bytes"] > 0,
+    "no_header": lambda r: r["header"] is None,
+}
+DEFAULT_ESCALATE_ON = (
+    "javascript",
+    "launch",
+    "embedded_file",
+    "xfa",
+    "richmedia",
+    "obfuscated_names",
+    "trailing_data",
+    "no_header",
+)
+
+
+def parse_escalation_rules(spec):
+    # "javascript,launch" -> ("javascript", "launch"); "default" e "all" são atalhos
+    rules = []
+    for name in (n.strip() for n in spec.split(",")):
+        if name == "default":
+            rules.extend(DEFAULT_ESCALATE_ON)
+        elif name == "all":
+            rules.extend(ESCALATION_RULES)
+        elif name in ESCALATION_RULES:
+            rules.append(name)
+        elif name:
+            raise ValueError(
+                f"unknown escalation rule {name!r} "
+                f"(choose from: {', '.join(ESCALATION_RULES)}, default, all)"
+            )
+    return tuple(dict.fromkeys(rules))
+
+
+def match_escalation(result, rules=DEFAULT_ESCALATE_ON):
+    return [name for name in rules if ESCALATION_RULES[name](result)]
+
+
+def _scan(buf, size):
+    keywords = {"/" + k.decode(): 0 for k in PRETRIAGE_KEYWORDS}
+    for m in _NAMES_RE.finditer(buf):
+        keywords["/" + m.group(1).decode()] += 1
+    structure = {
+        k.decode(): sum(1 for _ in _LITERAL_RES[k].finditer(buf))
+        for k in STRUCTURE_KEYWORDS
+    }
+    for short, long in _STRUCTURE_PARTS.items():
+        structure[short] -= structure[long]
+    obfuscated = {}
+    if buf.find(b"#") != -1:
+        for m in ESCAPED_NAME_RE.finditer(buf):
+            name = _HEX_ESCAPE_RE.sub(
+                lambda h: bytes([int(h.group(1), 16)]), m.group(1)
+            )
+            if name in _NAME_SET:
+                key = "/" + name.decode()
+                obfuscated[key] = obfuscated.get(key, 0) + 1
+
+    head = buf[:PDF_HEADER_WINDOW]
+    hm = _HEADER_RE.search(head)
+    header = {"version": hm.group(1).decode(), "offset": hm.start()} if hm else None
+
+    eof_offsets = [m.start() for m in _LITERAL_RES[b"%%EOF"].finditer(buf)]
+    trailing = 0
+    trailing_magic = None
+    if eof_offsets:
+        end = eof_offsets[-1] + 5
+        rest = size - end
+        tail = buf[end : end + min(rest, TRAILING_SCAN_LIMIT)]
+        stripped = tail.lstrip(b"\r\n\t\f\x00 ")
+        if stripped or rest > TRAILING_SCAN_LIMIT:
+            trailing = rest - (len(tail) - len(stripped))
+            trailing_magic = stripped[:8].hex() if stripped else None
+    # arquivos linearizados têm um %%EOF a mais já na primeira seção
+    linearized = b"/Linearized" in head
+    updates = max(0, len(eof_offsets) - (2 if linearized else 1))
+    return {
+        "header": header,
+        "eof_count": len(eof_offsets),
+        "eof_offsets": eof_offsets,
+        "linearized": linearized,
+        "incremental_updates": updates,
+        "trailing_bytes": trailing,
+        "trailing_magic": trailing_magic,
+        "keywords": keywords,
+        "obfuscated_names": obfuscated,
+        "structure": structure,
+    }
+
+
+def pretriage_file(path, escalate_on=DEFAULT_ESCALATE_ON):
+    # Mapeia o arquivo somente-leitura e faz uma única varredura dos bytes; nada é
+    # copiado para a memória do processo além das regiões que o kernel pagina
+    t0 = time.perf_counter()
+    size = os.path.getsize(path)
+    result = {"path": os.path.abspath(path), "size": size}
+    with open(path, "rb") as fh:
+        if size == 0:
+            scan = _scan(b"", 0)
+        else:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, "madvise"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                scan = _scan(mm, size)
+    result.update(scan)
+    result["matched"] = match_escalation(result, escalate_on)
+    result["seconds"] = round(time.perf_counter() - t0, 6)
+    return result
+
+
+def _pretriage_job(job):
+    path, escalate_on = job
+    try:
+        return pretriage_file(path, escalate_on)
+    except Exception as e:
+        return {"path": os.path.abspath(path), "error": f"{type(e).__name__}: {e}"}
+
+
+def iter_pretriage(paths, workers=1, escalate_on=DEFAULT_ESCALATE_ON):
+    # Resultados na ordem das entradas; com workers > 1 a varredura (CPU) vai para um pool
+    jobs = [(p, escalate_on) for p in paths]
+    if workers <= 1 or len(jobs) <= 1:
+        yield from map(_pretriage_job, jobs)
+        return
+    with multiprocessing.Pool(min(workers, len(jobs))) as pool:
+        yield from pool.imap(_pretriage_job, jobs, chunksize=4)
+
+
+def format_pretriage(result):
+    lines = ["PRE-TRIAGE (raw bytes)"]
+    header = result["header"]
+    lines.append(
+        f"Header: PDF {header['version']} at offset {header['offset']}"
+        if header
+        else "Header: not found in the first KiB"
+    )
+    lines.append(
+        f"%%EOF markers: {result['eof_count']} "
+        f"(incremental updates: {result['incremental_updates']}"
+        f"{', linearized' if result['linearized'] else ''})"
+    )
+    if result["trailing_bytes"]:
+        lines.append(
+            f"Trailing data after last %%EOF: {result['trailing_bytes']} bytes "
+            f"(starts with {result['trailing_magic']})"
+        )
+    counts = {k: v for k, v in result["keywords"].items() if v}
+    lines.append(f"Keywords: {json.dumps(counts)}")
+    if result["obfuscated_names"]:
+        lines.append(f"Obfuscated names: {json.dumps(result['obfuscated_names'])}")
+    lines.append(f"Structure: {json.dumps(result['structure'])}")
+    lines.append(f"Escalation rules matched: {', '.join(result['matched']) or 'none'}")
+    return "\n".join(lines) + "\n\n"
+
+
+def write_pretriage_report(txt_report_path, manifest):
+    # Relatório de um documento que não passou da pré-triagem
+    with open(txt_report_path, "w", encoding="utf-8") as report:
+        report.write("FORENSIC PDF REPORT (pre-triage only)\n\n")
+        report.write(f"Source: {manifest['source_path']}\n")
+        report.write(f"Evidence copy: {manifest['evidence_path']}\n")
+        report.write(f"Size: {manifest['file_size']} bytes\n")
+        report.write(f"Hashes: {json.dumps(manifest['hashes'])}\n\n")
+        report.write(format_pretriage(manifest["pretriage"]))
+        report.write("No escalation rule matched: full processing skipped.\n")
@@ -0,0 +1,258 @@
+# Páginas sem camada de texto (digitalizadas): renderização, OCR e miniaturas em um
+# pool de processos, só para as páginas que precisam
+
+import collections
+import concurrent.futures
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+import fitz  # PyMuPDF
+
+from .iocs import scan_iocs
+from .ocr import PAGE_OCR_DPI, ocr_modules
+from .pages import PAGE_TEXT_PREVIEW
+from .passwords import open_document
+from .utils import setup_logging
+
+# Abaixo disto (caracteres visíveis) a página conta como sem texto: um carimbo ou um
+# número de página não faz de um scan uma página com texto
+TEXTLESS_MAX_CHARS = 16
+THUMBNAIL_SIDE = 256
+THUMBNAIL_DIR = "thumbnails"
+
+# Estado por processo do pool de renderização: cada worker mantém seu próprio handle fitz
+_render_state = {}
+
+
+def _render_init(pdf_path, dpi, max_pixels, thumbnails, password, quiet):
+    setup_logging(quiet=quiet)
+    _render_state.update(
+        doc=open_document(pdf_path, password),
+        dpi=dpi,
+        max_pixels=max_pixels,
+        thumbnails=thumbnails,
+    )
+
+
+def _render_run(job):
+    pno, do_ocr = job
+    st = _render_state
+    t0 = time.perf_counter()
+    page = st["doc"].load_page(pno)
+    out = {"page_number": pno + 1}
+    if do_ocr:
+        dpi = st["dpi"]
+        if st["max_pixels"]:
+            # a resolução cai até a página caber no orçamento de imagem (1 byte/pixel)
+            inches = page.rect.width * page.rect.height / (72 * 72)
+            dpi = max(1, min(dpi, int((st["max_pixels"] / max(inches, 1e-6)) ** 0.5)))
+        # cinza e sem alfa: 1 byte por pixel, que o tesseract binariza de qualquer jeito
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+        out.update(dpi=dpi, width=pix.width, height=pix.height)
+        try:
+            Image, pytesseract = ocr_modules()
+            im = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+            out["text"] = (pytesseract.image_to_string(im) or "").strip()
+        except Exception as e:
+            out["error"] = f"{type(e).__name__}: {e}"
+        del pix
+    if st["thumbnails"]:
+        zoom = THUMBNAIL_SIDE / max(page.rect.width, page.rect.height, 1)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        out["thumbnail"] = pix.tobytes("png")
+    out["seconds"] = round(time.perf_counter() - t0, 3)
+    return out
+
+
+def is_textless(res):
+    # Página cujo texto nativo foi extraído (não pulado por orçamento) e está vazio
+    if "partial" in res and "text" in res["partial"]["skipped"]:
+        return False
+    return len("".join(res["text_preview"].split())) < TEXTLESS_MAX_CHARS
+
+
+class PageRenderer:
+    # As páginas sem texto seguem para o pool enquanto a extração continua; os resultados
+    # voltam em ordem de página, já com o texto do OCR e seus IOCs, antes do merge
+
+    def __init__(
+        self,
+        pdf_path,
+        doc_sha256,
+        ocr=None,
+        thumbnails=False,
+        dpi=PAGE_OCR_DPI,
+        workers=None,
+        max_pixels=None,
+        governor=None,
+        password=None,
+    ):
+        self.pdf_path = pdf_path
+        self.password = password
+        self.doc_sha256 = doc_sha256
+        self.ocr = ocr
+        self.thumbnails = thumbnails
+        self.dpi = dpi
+        self.max_pixels = max_pixels
+        self.governor = governor
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_pending = self.workers * 2
+        # páginas com texto esperando uma página sem texto anterior ficar pronta
+        self.max_window = self.max_pending * 8
+        self.pending = 0
+        self.executor = None
+        self.stats = {
+            "dpi": dpi if ocr is not None else None,
+            "textless_pages": 0,
+            "rendered": 0,
+            "ocr_pages": 0,
+            "cache_hits": 0,
+            "thumbnails": 0,
+            "skipped_budget": 0,
+            "errors": 0,
+            "render_seconds": 0.0,
+        }
+
+    def _initargs(self):
+        quiet = logging.getLogger().getEffectiveLevel() > logging.DEBUG
+        return (
+            self.pdf_path,
+            self.dpi,
+            self.max_pixels,
+            self.thumbnails,
+            self.password,
+            quiet,
+        )
+
+    def _submit_job(self, job):
+        if self.executor is None:
+            if self.workers > 1 and not multiprocessing.current_process().daemon:
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    self.workers,
+                    initializer=_render_init,
+                    initargs=self._initargs(),
+                )
+            else:
+                # workers do modo lote não podem criar subprocessos: renderiza aqui mesmo
+                _render_init(*self._initargs())
+                self.executor = False
+        if self.executor:
+            return self.executor.submit(_render_run, job)
+        fut = concurrent.futures.Future()
+        try:
+            fut.set_result(_render_run(job))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def cache_key(self, pno):
+        # O cache de OCR é indexado por SHA256: aqui, o da página renderizada
+        # (documento, página, resolução e orçamento de pixels)
+        ident = [self.doc_sha256, pno, self.dpi, self.max_pixels]
+        return hashlib.sha256(json.dumps(ident).encode()).hexdigest()
+
+    def submit(self, res):
+        # Future do trabalho da página, ou None se nada precisa ser renderizado
+        if not is_textless(res):
+            return None
+        self.stats["textless_pages"] += 1
+        reason = self.governor.exceeded(page=False) if self.governor else None
+        if reason:
+            self.stats["skipped_budget"] += 1
+            partial = res.setdefault("partial", {"reasons": [], "skipped": []})
+            if reason not in partial["reasons"]:
+                partial["reasons"].append(reason)
+            partial["skipped"].append("page_ocr")
+            return None
+        pno = res["page_number"] - 1
+        do_ocr = self.ocr is not None
+        if do_ocr:
+            text = self.ocr.lookup(self.cache_key(pno))
+            if text is not None:
+                self.stats["cache_hits"] += 1
+                self._apply_text(res, text, {"cached": True})
+                do_ocr = False
+            else:
+                do_ocr = self.ocr.ready()
+        if not do_ocr and not self.thumbnails:
+            return None
+        self.pending += 1
+        return self._submit_job((pno, do_ocr))
+
+    def replayed(self, res):
+        # Página retomada de um checkpoint: já renderizada, só entra nas contagens
+        if is_textless(res):
+            self.stats["textless_pages"] += 1
+        info = res.get("page_ocr", {})
+        self.stats["rendered"] += "seconds" in info
+        self.stats["ocr_pages"] += "ocr_text" in res
+        self.stats["thumbnails"] += "thumbnail" in res
+
+    def _apply_text(self, res, text, info):
+        res["page_ocr"] = dict(info, chars=len(text))
+        if text:
+            self.stats["ocr_pages"] += 1
+            res["ocr_text"] = (
+                (text[:PAGE_TEXT_PREVIEW] + "...(truncated)")
+                if len(text) > PAGE_TEXT_PREVIEW
+                else text
+            )
+            # o texto do OCR passa pela mesma extração de IOCs do texto nativo
+            scan_iocs(text, res["iocs"])
+
+    def _finish(self, res, fut, writer):
+        if fut is None:
+            return res
+        self.pending -= 1
+        try:
+            out = fut.result()
+        except Exception as e:
+            out = {"error": f"{type(e).__name__}: {e}"}
+        self.stats["rendered"] += "seconds" in out
+        self.stats["render_seconds"] += out.get("seconds", 0)
+        if "error" in out:
+            self.stats["errors"] += 1
+            logging.debug("Page OCR failed on page %s: %s", res["page_number"], out)
+            res["page_ocr"] = {"error": out["error"]}
+        if "text" in out:
+            self._apply_text(
+                res,
+                out["text"],
+                {k: out[k] for k in ("dpi", "width", "height", "seconds")},
+            )
+            self.ocr.remember(self.cache_key(res["page_number"] - 1), out["text"])
+        if "thumbnail" in out:
+            rel = f"{THUMBNAIL_DIR}/p{res['page_number']}.png"
+            writer.write(rel, out["thumbnail"])
+            res["thumbnail"] = rel
+            self.stats["thumbnails"] += 1
+        return res
+
+    def iter_results(self, results, writer):
+        window = collections.deque()
+        for res in results:
+            window.append((res, self.submit(res)))
+            while window and (
+                window[0][1] is None
+                or window[0][1].done()
+                or self.pending > self.max_pending
+                or len(window) > self.max_window
+            ):
+                yield self._finish(*window.popleft(), writer)
+        while window:
+            yield self._finish(*window.popleft(), writer)
+
+    def finish(self):
+        self.stats["render_seconds"] = round(self.stats["render_seconds"], 3)
+        return self.stats
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        elif self.executor is False:
+            _render_state.pop("doc").close()
+        self.executor = None
@@ -0,0 +1,503 @@
+# Revisões de atualizações incrementais: separação por %%EOF, hashes por revisão e diff
+# de objetos a partir das seções xref (sem reabrir cada revisão no PyMuPDF)
+
+import hashlib
+import mmap
+import os
+import re
+import time
+import zlib
+
+from .triage import scan_keywords
+
+HASH_ALGORITHMS = ("MD5", "SHA1", "SHA256")
+# Revisões acima disto não são gravadas como arquivos (só hashes e diff)
+REVISION_CARVE_MAX_BYTES = 512 * 1024 * 1024
+
+_EOF_RE = re.compile(rb"%%EOF")
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+_OBJ_HEADER_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+_XREF_ROW_RE = re.compile(rb"(\d+)[ \t]+(\d+)(?:[ \t]+([nf]))?")
+_REF_RE = rb"\s+(\d+)\s+(\d+)\s+R"
+_TRAILER_KEYS = {
+    "Root": re.compile(rb"/Root" + _REF_RE),
+    "Info": re.compile(rb"/Info" + _REF_RE),
+    "Encrypt": re.compile(rb"/Encrypt" + _REF_RE),
+}
+_INT_KEY_RE = {
+    k: re.compile(rb"/" + k.encode() + rb"\s+(\d+)(?!\s+\d+\s+R)")
+    for k in ("Size", "Prev", "XRefStm", "N", "First", "Predictor", "Columns")
+}
+_FILTER_RE = re.compile(rb"/Filter\s*(\[[^\]]*\]|/\w+)")
+_LENGTH_RE = re.compile(rb"/Length\s+(\d+)(?:\s+(\d+)\s+R)?")
+_ARRAY_RE = {
+    k: re.compile(rb"/" + k.encode() + rb"\s*\[([^\]]*)\]")
+    for k in "W Index ID".split()
+}
+_STRING_RE = re.compile(rb"\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>", re.S)
+_INFO_ENTRY_RE = re.compile(rb"/(\w+)\s*(" + _STRING_RE.pattern + rb")", re.S)
+
+
+def _int_key(data, key):
+    m = _INT_KEY_RE[key].search(data)
+    return int(m.group(1)) if m else None
+
+
+def _ref_key(data, key):
+    m = _TRAILER_KEYS[key].search(data)
+    return int(m.group(1)) if m else None
+
+
+def revision_boundaries(buf, linearized=False):
+    # Fim de cada revisão: %%EOF mais a quebra de linha que o segue. O primeiro %%EOF de
+    # um arquivo linearizado fecha só a seção da primeira página, não uma revisão.
+    ends = []
+    size = len(buf)
+    for m in _EOF_RE.finditer(buf):
+        end = m.end()
+        if buf[end : end + 2] == b"\r\n":
+            end += 2
+        elif buf[end : end + 1] in (b"\n", b"\r"):
+            end += 1
+        ends.append((m.start(), min(end, size)))
+    if linearized and len(ends) > 1:
+        ends = ends[1:]
+    return ends
+
+
+def _png_unpredict(data, columns):
+    # Preditores PNG (ISO 32000 7.4.4.4), usados quase sempre em streams xref
+    row_len = columns + 1
+    out = bytearray()
+    prev = bytearray(columns)
+    for i in range(0, len(data) - row_len + 1, row_len):
+        ftype = data[i]
+        row = bytearray(data[i + 1 : i + row_len])
+        if ftype == 1:
+            for j in range(1, columns):
+                row[j] = (row[j] + row[j - 1]) & 0xFF
+        elif ftype == 2:
+            for j in range(columns):
+                row[j] = (row[j] + prev[j]) & 0xFF
+        elif ftype == 3:
+            for j in range(columns):
+                left = row[j - 1] if j else 0
+                row[j] = (row[j] + ((left + prev[j]) >> 1)) & 0xFF
+        elif ftype == 4:
+            for j in range(columns):
+                a = row[j - 1] if j else 0
+                b = prev[j]
+                c = prev[j - 1] if j else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                pred = a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+                row[j] = (row[j] + pred) & 0xFF
+        out += row
+        prev = row
+    return bytes(out)
+
+
+class RevisionReader:
+    # Leitura de objetos pelos offsets das tabelas xref, direto do mmap
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.objstm_cache = {}
+
+    def object_span(self, offset):
+        # (início do conteúdo, fim do conteúdo) entre "N G obj" e "endobj"
+        m = _OBJ_HEADER_RE.match(self.buf, offset)
+        if not m:
+            return None
+        end = self.buf.find(b"endobj", m.end())
+        if end == -1:
+            return None
+        return m.end(), end
+
+    def object_bytes(self, entry, table):
+        kind = entry[0]
+        if kind == "n":
+            span = self.object_span(entry[1])
+            return None if span is None else bytes(self.buf[span[0] : span[1]]).strip()
+        if kind == "c":
+            return self.compressed_object(entry[1], entry[2], table)
+        return None
+
+    def stream(self, offset, table):
+        # (dicionário, dados decodificados ou None) do stream que começa em offset
+        span = self.object_span(offset)
+        if span is None:
+            return None, None
+        start = self.buf.find(b"stream", span[0], span[1])
+        if start == -1:
+            return bytes(self.buf[span[0] : span[1]]), None
+        head = bytes(self.buf[span[0] : start])
+        data_start = start + 6
+        if self.buf[data_start : data_start + 2] == b"\r\n":
+            data_start += 2
+        elif self.buf[data_start : data_start + 1] in (b"\n", b"\r"):
+            data_start += 1
+        length = None
+        m = _LENGTH_RE.search(head)
+        if m and m.group(2) is None:
+            length = int(m.group(1))
+        elif m:
+            ref = table.get(int(m.group(1)))
+            if ref and ref[0] == "n":
+                raw = self.object_bytes(ref, table)
+                if raw and raw.isdigit():
+                    length = int(raw)
+        if length is None or data_start + length > span[1]:
+            end = self.buf.find(b"endstream", data_start, span[1])
+            length = (end if end != -1 else span[1]) - data_start
+        data = bytes(self.buf[data_start : data_start + length])
+        m = _FILTER_RE.search(head)
+        filters = re.findall(rb"/(\w+)", m.group(1)) if m else []
+        if filters not in ([], [b"FlateDecode"], [b"Fl"]):
+            # só Flate (ou nenhum filtro) é decodificado aqui
+            return head, None
+        if filters:
+            try:
+                data = zlib.decompressobj().decompress(data)
+            except zlib.error:
+                return head, None
+        predictor = _int_key(head, "Predictor")
+        if predictor and predictor >= 10:
+            data = _png_unpredict(data, _int_key(head, "Columns") or 1)
+        return head, data
+
+    def compressed_object(self, objstm, index, table):
+        entry = table.get(objstm)
+        if entry is None or entry[0] != "n":
+            return None
+        key = (objstm, entry[1])
+        parsed = self.objstm_cache.get(key)
+        if parsed is None:
+            head, data = self.stream(entry[1], table)
+            parsed = ()
+            if data is not None:
+                n, first = _int_key(head, "N"), _int_key(head, "First")
+                if n and first is not None:
+                    nums = [int(x) for x in data[:first].split()]
+                    offs = nums[1::2][:n]
+                    parsed = [
+                        data[first + a : first + b].strip()
+                        for a, b in zip(offs, offs[1:] + [len(data) - first])
+                    ]
+            if len(self.objstm_cache) > 64:
+                self.objstm_cache.clear()
+            self.objstm_cache[key] = parsed
+        return parsed[index] if index < len(parsed) else None
+
+    def xref_section(self, offset, table):
+        # Entradas {objeto: ("n", offset, gen) | ("c", objstm, índice) | ("f",)} e o
+        # dicionário do trailer de uma seção (tabela clássica ou stream xref)
+        buf = self.buf
+        pos = offset
+        while pos < len(buf) and buf[pos : pos + 1] in b" \t\r\n\f\x00":
+            pos += 1
+        if buf[pos : pos + 4] == b"xref":
+            trailer = buf.find(b"trailer", pos)
+            if trailer == -1:
+                raise ValueError(f"xref table at {offset} has no trailer")
+            entries = {}
+            obj = 0
+            for m in _XREF_ROW_RE.finditer(buf[pos + 4 : trailer]):
+                if m.group(3) is None:
+                    obj = int(m.group(1))
+                    continue
+                if m.group(3) == b"n":
+                    entries[obj] = ("n", int(m.group(1)), int(m.group(2)))
+                else:
+                    entries[obj] = ("f",)
+                obj += 1
+            end = buf.find(b"startxref", trailer)
+            head = bytes(buf[trailer : end if end != -1 else trailer + 4096])
+            return "table", entries, head
+        head, data = self.stream(pos, dict(table))
+        if head is None or b"/XRef" not in head:
+            raise ValueError(f"no xref section at offset {offset}")
+        if data is None:
+            raise ValueError(f"xref stream at {offset} uses an unsupported filter")
+        w = [int(x) for x in _ARRAY_RE["W"].search(head).group(1).split()]
+        m = _ARRAY_RE["Index"].search(head)
+        index = (
+            [int(x) for x in m.group(1).split()]
+            if m
+            else [0, _int_key(head, "Size") or 0]
+        )
+        row = sum(w)
+        entries = {}
+        i = 0
+        for start, count in zip(index[::2], index[1::2]):
+            for obj in range(start, start + count):
+                if i + row > len(data):
+                    break
+                fields = []
+                p = i
+                for width in w:
+                    fields.append(int.from_bytes(data[p : p + width], "big"))
+                    p += width
+                i += row
+                kind = fields[0] if w[0] else 1
+                if kind == 1:
+                    entries[obj] = ("n", fields[1], fields[2] if len(w) > 2 else 0)
+                elif kind == 2:
+                    entries[obj] = ("c", fields[1], fields[2])
+                else:
+                    entries[obj] = ("f",)
+        return "stream", entries, head
+
+
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+_ESCAPE_RE = re.compile(rb"\\([0-7]{1,3}|\r\n|.)", re.S)
+
+
+def _unescape(m):
+    c = m.group(1)
+    if c[:1].isdigit():
+        return bytes([int(c, 8) & 0xFF])
+    if c in (b"\r\n", b"\n", b"\r"):
+        return b""
+    return _ESCAPES.get(c, c)
+
+
+def pdf_string(raw):
+    # Texto de uma string PDF literal (...) ou hexadecimal <...>
+    if raw.startswith(b"<"):
+        hexdigits = re.sub(rb"\s", b"", raw[1:-1])
+        data = bytes.fromhex((hexdigits + b"0" * (len(hexdigits) % 2)).decode())
+    else:
+        data = _ESCAPE_RE.sub(_unescape, raw[1:-1])
+    if data.startswith(b"\xfe\xff"):
+        return data[2:].decode("utf-16-be", "replace")
+    return data.decode("latin-1")
+
+
+def _info_entries(data):
+    if not data:
+        return {}
+    return {k.decode("latin-1"): pdf_string(v) for k, v in _INFO_ENTRY_RE.findall(data)}
+
+
+def _hash(data):
+    return hashlib.sha256(data).hexdigest() if data is not None else None
+
+
+def analyze_revisions(buf, linearized=False, on_revision=None):
+    # Uma passada: hashes de cada prefixo (cópia do estado do hash em cada fronteira),
+    # seção xref de cada revisão e diff contra a tabela acumulada da anterior. Apenas os
+    # objetos citados na seção de uma revisão são lidos e hasheados.
+    t0 = time.perf_counter()
+    reader = RevisionReader(buf)
+    bounds = revision_boundaries(buf, linearized)
+    digests = {name: hashlib.new(name.lower()) for name in HASH_ALGORITHMS}
+    table = {}
+    obj_hashes = {}
+    info = {}
+    revisions = []
+    pos = prev_end = 0
+    for number, (eof, end) in enumerate(bounds, 1):
+        segment = memoryview(buf)[pos:end]
+        for d in digests.values():
+            d.update(segment)
+        segment.release()
+        pos = end
+        rev = {
+            "revision": number,
+            "section_offset": prev_end,
+            "end": end,
+            "size": end,
+            "hashes": {name: d.hexdigest() for name, d in digests.items()},
+        }
+        m = None
+        for m in _STARTXREF_RE.finditer(buf, max(prev_end, eof - 1024), eof):
+            pass
+        # segue /Prev enquanto a seção estiver dentro desta revisão
+        entries = {}
+        trailer = None
+        sections = []
+        offset = int(m.group(1)) if m else None
+        try:
+            while offset is not None and prev_end <= offset < end:
+                if offset in sections:
+                    break
+                sections.append(offset)
+                kind, section, head = reader.xref_section(
+                    offset, dict(table, **entries)
+                )
+                trailer = trailer or head
+                rev.setdefault("xref_type", kind)
+                for obj, entry in section.items():
+                    entries.setdefault(obj, entry)
+                hybrid = _int_key(head, "XRefStm")
+                if hybrid is not None and hybrid not in sections:
+                    sections.append(hybrid)
+                    _, section, _ = reader.xref_section(hybrid, dict(table, **entries))
+                    for obj, entry in section.items():
+                        entries.setdefault(obj, entry)
+                offset = _int_key(head, "Prev")
+        except (ValueError, AttributeError, IndexError) as e:
+            rev["xref_error"] = str(e)
+        if m is None:
+            rev["xref_error"] = "startxref not found"
+        rev["xref_offsets"] = sections
+        if trailer is not None:
+            ids = _ARRAY_RE["ID"].search(trailer)
+            rev["trailer"] = {
+                "size": _int_key(trailer, "Size"),
+                "root": _ref_key(trailer, "Root"),
+                "info": _ref_key(trailer, "Info"),
+                "encrypt": _ref_key(trailer, "Encrypt"),
+                "prev": _int_key(trailer, "Prev"),
+                "id": (
+                    [v.decode("latin-1") for v in _STRING_RE.findall(ids.group(1))]
+                    if ids
+                    else None
+                ),
+            }
+
+        new_table = dict(table)
+        new_table.update(entries)
+        added, changed, rewritten, deleted = [], [], [], []
+        keyword_counts = {}
+        for obj in sorted(entries):
+            if obj == 0:
+                continue
+            entry = entries[obj]
+            old = table.get(obj)
+            old_in_use = old is not None and old[0] != "f"
+            if entry[0] == "f":
+                if old_in_use:
+                    deleted.append(obj)
+                    obj_hashes.pop(obj, None)
+                continue
+            data = reader.object_bytes(entry, new_table)
+            digest = _hash(data)
+            obj_hashes[obj], old_digest = digest, obj_hashes.get(obj)
+            if not old_in_use:
+                added.append(obj)
+            elif digest != old_digest or digest is None:
+                changed.append(obj)
+            else:
+                rewritten.append(obj)
+                continue
+            # palavras-chave só do que entrou ou mudou nesta revisão
+            if data and number > 1:
+                for kw, _, _, _ in scan_keywords(data):
+                    kw = kw.decode("ascii")
+                    keyword_counts[kw] = keyword_counts.get(kw, 0) + 1
+        rev["objects"] = sum(1 for e in new_table.values() if e[0] != "f")
+        rev["diff"] = {
+            "added": len(added),
+            "changed": len(changed),
+            "deleted": len(deleted),
+            "rewritten_unchanged": len(rewritten),
+        }
+        if number > 1:
+            # a revisão base é inteira "adicionada": só as contagens
+            rev["diff"].update(
+                added_objects=added,
+                changed_objects=changed,
+                deleted_objects=deleted,
+                rewritten_unchanged_objects=rewritten,
+            )
+            if keyword_counts:
+                rev["keywords"] = dict(sorted(keyword_counts.items()))
+
+        info_ref = rev.get("trailer", {}).get("info")
+        new_info = info
+        if info_ref is not None and info_ref in new_table:
+            new_info = _info_entries(
+                reader.object_bytes(new_table[info_ref], new_table)
+            )
+        if number > 1 and new_info != info:
+            rev["metadata_changes"] = {
+                k: {"old": info.get(k), "new": new_info.get(k)}
+                for k in sorted(set(info) | set(new_info))
+                if info.get(k) != new_info.get(k)
+            }
+        info = new_info
+        table = new_table
+        prev_end = end
+        if on_revision is not None:
+            on_revision(rev)
+        revisions.append(rev)
+
+    trailing = len(buf) - prev_end
+    return {
+        "count": len(revisions),
+        "linearized": linearized,
+        "trailing_bytes": trailing,
+        "seconds": round(time.perf_counter() - t0, 6),
+        "revisions": revisions,
+    }
+
+
+def analyze_revisions_file(path, linearized=None, on_revision=None):
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return analyze_revisions(b"", False, on_revision)
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if linearized is None:
+                linearized = b"/Linearized" in mm[:1024]
+            return analyze_revisions(mm, linearized, on_revision)
+
+
+def carve_revisions(path, writer, carve_max_bytes=REVISION_CARVE_MAX_BYTES):
+    # Analisa as revisões da cópia da evidência e grava cada revisão anterior à final
+    # (ou todas, se houver bytes após o último %%EOF) como artefato próprio. As gravações
+    # são sequenciais: só uma revisão fica na memória por vez.
+    stem = os.path.splitext(os.path.basename(path))[0]
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return analyze_revisions(b"")
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            result = analyze_revisions(mm, b"/Linearized" in mm[:1024])
+            revs = result["revisions"]
+            for rev in revs:
+                if len(revs) < 2 or (rev is revs[-1] and not result["trailing_bytes"]):
+                    # a revisão final é a própria cópia da evidência: não é artefato
+                    rev["evidence_copy"] = True
+                    continue
+                if rev["size"] > carve_max_bytes:
+                    rev["carve_skipped"] = "size"
+                    continue
+                rel = f"revisions/{stem}_rev{rev['revision']:03d}.pdf"
+                writer.write(rel, mm[: rev["end"]])
+                writer.wait_for(rel)
+                rev["file"] = rel
+    return result
+
+
+def format_revisions(result, writer=None):
+    lines = [f"REVISIONS (incremental updates): {result['count']}"]
+    for rev in result["revisions"]:
+        diff = rev["diff"]
+        line = (
+            f"  rev {rev['revision']}: {rev['size']} bytes, "
+            f"sha256={rev['hashes']['SHA256']}, xref={rev.get('xref_type', '?')}, "
+            f"objects={rev['objects']} (+{diff['added']} ~{diff['changed']} "
+            f"-{diff['deleted']})"
+        )
+        if rev.get("xref_error"):
+            line += f" xref_error={rev['xref_error']}"
+        lines.append(line)
+        if rev.get("metadata_changes"):
+            for key, change in rev["metadata_changes"].items():
+                lines.append(f"    {key}: {change['old']!r} -> {change['new']!r}")
+        if rev.get("keywords"):
+            lines.append(f"    keywords in new/changed objects: {rev['keywords']}")
+        if (
+            rev.get("file")
+            and writer is not None
+            and rev["file"].startswith("revisions/")
+        ):
+            path = writer.sink.local_path(rev["file"])
+            shown = (
+                path if path is not None else f"{writer.sink.container}:{rev['file']}"
+            )
+            lines.append(f"    carved: {shown}")
+    if result["trailing_bytes"]:
+        lines.append(f"  trailing bytes after last %%EOF: {result['trailing_bytes']}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,300 @@
+# Destinos dos artefatos (output sinks) e gravação em segundo plano
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import sqlite3
+import tarfile
+import threading
+import time
+from io import BytesIO
+
+from .utils import ensure_dir
+
+# Artefatos (imagens, dumps de JS, arquivos embutidos) são gravados por caminho relativo
+# à pasta do caso; o sink decide se viram arquivos soltos ou entram em um contêiner único.
+OUTPUT_SINKS = ("dir", "sqlite", "tar")
+SQLITE_BATCH_ROWS = 256
+SQLITE_BATCH_BYTES = 64 * 1024 * 1024
+
+
+class DirectorySink:
+    # Layout tradicional: um arquivo por artefato dentro da pasta do caso
+    name = "dir"
+    threads = 4
+
+    def __init__(self, case_folder):
+        self.case_folder = case_folder
+        self.container = None
+
+    def local_path(self, rel):
+        return os.path.join(self.case_folder, rel)
+
+    def write(self, rel, data):
+        path = self.local_path(rel)
+        ensure_dir(os.path.dirname(path))
+        with open(path, "wb") as fh:
+            fh.write(data)
+
+    def read(self, rel):
+        with open(self.local_path(rel), "rb") as fh:
+            return fh.read()
+
+    def remove(self, rel):
+        try:
+            os.remove(self.local_path(rel))
+        except OSError:
+            pass
+
+    def close(self, manifest_path=None):
+        pass
+
+
+class SQLiteSink:
+    # Banco único com blobs e tabelas do manifest; inserções em transações por lote
+    name = "sqlite"
+    threads = 1
+
+    def __init__(self, case_folder, filename="evidence.sqlite"):
+        self.case_folder = case_folder
+        self.container = filename
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            os.path.join(case_folder, filename), check_same_thread=False
+        )
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                path TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                data BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS manifest (id INTEGER PRIMARY KEY, data TEXT);
+            CREATE TABLE IF NOT EXISTS pages (page_number INTEGER PRIMARY KEY, data TEXT);
+            CREATE TABLE IF NOT EXISTS images (
+                file TEXT PRIMARY KEY,
+                sha256 TEXT,
+                page INTEGER,
+                xref INTEGER,
+                size INTEGER,
+                data TEXT
+            );
+            CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256);
+            CREATE TABLE IF NOT EXISTS links (url TEXT PRIMARY KEY);
+            """)
+        self.batch = []
+        self.batch_bytes = 0
+
+    def local_path(self, rel):
+        return None
+
+    def _flush_batch(self):
+        if self.batch:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO artifacts (path, sha256, size, data) "
+                    "VALUES (?, ?, ?, ?)",
+                    self.batch,
+                )
+            self.batch = []
+            self.batch_bytes = 0
+
+    def write(self, rel, data):
+        row = (rel, hashlib.sha256(data).hexdigest(), len(data), sqlite3.Binary(data))
+        with self.lock:
+            self.batch.append(row)
+            self.batch_bytes += len(data)
+            if (
+                len(self.batch) >= SQLITE_BATCH_ROWS
+                or self.batch_bytes >= SQLITE_BATCH_BYTES
+            ):
+                self._flush_batch()
+
+    def read(self, rel):
+        with self.lock:
+            self._flush_batch()
+            row = self.conn.execute(
+                "SELECT data FROM artifacts WHERE path = ?", (rel,)
+            ).fetchone()
+        if row is None:
+            raise FileNotFoundError(rel)
+        return bytes(row[0])
+
+    def remove(self, rel):
+        with self.lock:
+            self._flush_batch()
+            with self.conn:
+                self.conn.execute("DELETE FROM artifacts WHERE path = ?", (rel,))
+
+    def close(self, manifest_path=None):
+        with self.lock:
+            self._flush_batch()
+            if manifest_path and os.path.isfile(manifest_path):
+                with open(manifest_path, "r", encoding="utf-8") as fh:
+                    manifest = json.load(fh)
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO manifest (id, data) VALUES (1, ?)",
+                        (json.dumps(manifest, ensure_ascii=False),),
+                    )
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO pages (page_number, data) VALUES (?, ?)",
+                        (
+                            (p["page_number"], json.dumps(p, ensure_ascii=False))
+                            for p in manifest.get("pages", [])
+                        ),
+                    )
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO images "
+                        "(file, sha256, page, xref, size, data) VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            (
+                                img["file"],
+                                img["hash"],
+                                img.get("page"),
+                                img.get("xref"),
+                                img.get("size"),
+                                json.dumps(img, ensure_ascii=False),
+                            )
+                            for img in manifest.get("images", [])
+                        ),
+                    )
+                    self.conn.executemany(
+                        "INSERT OR IGNORE INTO links (url) VALUES (?)",
+                        ((u,) for u in manifest.get("links", [])),
+                    )
+            self.conn.close()
+
+
+class TarSink:
+    # Contêiner tar somente-acréscimo; cada membro leva o SHA256 em um cabeçalho PAX e
+    # um SHA256SUMS é anexado no fechamento
+    name = "tar"
+    threads = 1
+
+    def __init__(self, case_folder, filename="evidence.tar"):
+        self.case_folder = case_folder
+        self.container = filename
+        self.path = os.path.join(case_folder, filename)
+        self.lock = threading.Lock()
+        self.tar = tarfile.open(self.path, "w", format=tarfile.PAX_FORMAT)
+        self.members = {}
+
+    def local_path(self, rel):
+        return None
+
+    def write(self, rel, data):
+        sha256 = hashlib.sha256(data).hexdigest()
+        info = tarfile.TarInfo(rel.replace(os.sep, "/"))
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.pax_headers = {"FORENPDF.sha256": sha256}
+        with self.lock:
+            self.tar.addfile(info, BytesIO(data))
+            # addfile trabalha numa cópia do TarInfo: o início dos dados é
+            # deduzido do fim do membro (preenchido até o bloco de 512 bytes)
+            padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            self.members[rel] = (self.tar.offset - padded, info.size, sha256)
+
+    def read(self, rel):
+        with self.lock:
+            offset, size, _ = self.members[rel]
+            self.tar.fileobj.flush()
+        with open(self.path, "rb") as fh:
+            fh.seek(offset)
+            return fh.read(size)
+
+    def remove(self, rel):
+        # somente acréscimo: o membro fica no tar, mas sai do SHA256SUMS
+        with self.lock:
+            self.members.pop(rel, None)
+
+    def close(self, manifest_path=None):
+        with self.lock:
+            sums = "".join(
+                f"{sha}  {rel}\n" for rel, (_, _, sha) in sorted(self.members.items())
+            ).encode()
+            info = tarfile.TarInfo("SHA256SUMS")
+            info.size = len(sums)
+            info.mtime = int(time.time())
+            self.tar.addfile(info, BytesIO(sums))
+            self.tar.close()
+
+
+def open_sink(kind, case_folder):
+    if kind == "sqlite":
+        return SQLiteSink(case_folder)
+    if kind == "tar":
+        return TarSink(case_folder)
+    return DirectorySink(case_folder)
+
+
+ARTIFACT_WRITER_MAX_PENDING = 64
+
+
+def _write_artifact(sink, rel, data):
+    sink.write(rel, data)
+
+
+class ArtifactWriter:
+    # Grava artefatos em threads de fundo (open/write liberam o GIL) para que a latência
+    # do disco/NFS não trave o laço de páginas; o número de gravações pendentes é limitado
+
+    def __init__(self, sink, max_pending=ARTIFACT_WRITER_MAX_PENDING):
+        self.sink = sink
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            sink.threads, thread_name_prefix="forenpdf-writer"
+        )
+        self.max_pending = max_pending
+        self.pending = {}
+        self.bytes_written = 0
+        self.files_written = 0
+
+    def _reap(self, rel, fut):
+        self.pending.pop(rel, None)
+        fut.result()
+
+    def write(self, rel, data):
+        if len(self.pending) >= self.max_pending:
+            done, _ = concurrent.futures.wait(
+                list(self.pending.values()),
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for rel_done, fut in list(self.pending.items()):
+                if fut in done:
+                    self._reap(rel_done, fut)
+        self.pending[rel] = self.executor.submit(_write_artifact, self.sink, rel, data)
+        self.bytes_written += len(data)
+        self.files_written += 1
+
+    def wait_for(self, rel):
+        fut = self.pending.get(rel)
+        if fut is not None:
+            self._reap(rel, fut)
+
+    def flush(self):
+        for rel, fut in list(self.pending.items()):
+            self._reap(rel, fut)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.executor.shutdown(wait=True)
+
+
+class BlobCollector:
+    # Usado pelos workers de página quando o sink é um contêiner: os bytes voltam ao
+    # processo principal, único escritor do SQLite/tar
+    def __init__(self):
+        self.blobs = {}
+
+    def write(self, rel, data):
+        self.blobs[rel] = data
+
+    def wait_for(self, rel):
+        pass
+
+    def flush(self):
+        pass
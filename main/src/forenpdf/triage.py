@@ -0,0 +1,170 @@
+# Triagem de xrefs
+
+import hashlib
+import logging
+import re
+import time
+
+from .iocs import index_iocs, scan_iocs_bytes
+from .utils import safe_decode
+
+TRIAGE_KEYWORDS = (
+    b"JavaScript",
+    b"JS",
+    b"OpenAction",
+    b"AA",
+    b"Launch",
+    b"EmbeddedFiles",
+    b"EmbeddedFile",
+    b"FileAttachment",
+    b"RichMedia",
+    b"XFA",
+    b"URI",
+    b"SubmitForm",
+)
+JAVASCRIPT_KEYWORDS = ("/JavaScript", "/JS")
+EMBEDDEDFILE_KEYWORDS = ("/EmbeddedFile", "/EmbeddedFiles", "/FileAttachment")
+# Delimitadores de nomes PDF (ISO 32000 7.3.5)
+_NAME_END = rb"(?=[\s()<>\[\]{}/%]|$)"
+# Um único matcher para todas as palavras-chave; as mais longas primeiro na alternância
+TRIAGE_RE = re.compile(
+    rb"/("
+    + b"|".join(re.escape(k) for k in sorted(TRIAGE_KEYWORDS, key=len, reverse=True))
+    + rb")"
+    + _NAME_END
+)
+# Nomes ofuscados com escapes #xx (ex.: /J#61vaScript)
+ESCAPED_NAME_RE = re.compile(rb"/([^\s()<>\[\]{}/%]*#[0-9A-Fa-f]{2}[^\s()<>\[\]{}/%]*)")
+_HEX_ESCAPE_RE = re.compile(rb"#([0-9A-Fa-f]{2})")
+# Streams sem interesse para a triagem: ObjStm/XRef já são cobertos objeto a objeto, e
+# o conteúdo de anexos (/EmbeddedFile) é analisado à parte, recursivamente, pelo embedded:
+# um JavaScript dentro de um PDF anexado não é do documento pai
+SKIP_STREAM_RE = re.compile(
+    rb"/(?:Type\s*/(?:ObjStm|XRef|EmbeddedFile)|Subtype\s*/Image)" + _NAME_END
+)
+_KEYWORD_SET = frozenset(TRIAGE_KEYWORDS)
+
+
+def scan_keywords(data, where="object"):
+    # Retorna [(keyword, where, offset, obfuscated)] para um bloco de bytes
+    hits = [
+        (b"/" + m.group(1), where, m.start(), False) for m in TRIAGE_RE.finditer(data)
+    ]
+    if b"#" in data:
+        for m in ESCAPED_NAME_RE.finditer(data):
+            name = _HEX_ESCAPE_RE.sub(
+                lambda h: bytes([int(h.group(1), 16)]), m.group(1)
+            )
+            if name in _KEYWORD_SET:
+                hits.append((b"/" + name, where, m.start(), True))
+        hits.sort(key=lambda h: h[2])
+    return hits
+
+
+def triage_xrefs(doc, max_xref=None, scan_streams=True, with_iocs=False, on_hit=None):
+    # Varre todos os objetos (inclusive os de object streams) e seus streams decodificados
+    t0 = time.perf_counter()
+    ioc_index = {}
+    last = doc.xref_length() - 1
+    if max_xref:
+        last = min(last, max_xref)
+    keyword_counts = {}
+    hits = []
+    errors = []
+    objects = streams = nbytes = n_hits = 0
+    for xref in range(1, last + 1):
+        try:
+            obj = doc.xref_object(xref, compressed=False).encode("latin-1", "replace")
+        except Exception as e:
+            errors.append({"xref": xref, "error": str(e)})
+            continue
+        objects += 1
+        nbytes += len(obj)
+        found = scan_keywords(obj, "object")
+        iocs = scan_iocs_bytes(obj) if with_iocs else None
+        data = None
+        # /Length é obrigatório em streams: evita xref_is_stream() na maioria dos objetos
+        if (
+            scan_streams
+            and b"/Length" in obj
+            and not SKIP_STREAM_RE.search(obj)
+            and doc.xref_is_stream(xref)
+        ):
+            try:
+                data = doc.xref_stream(xref)
+            except Exception as e:
+                errors.append({"xref": xref, "error": f"stream: {e}"})
+                data = None
+            if data:
+                streams += 1
+                nbytes += len(data)
+                found += scan_keywords(data, "stream")
+                if with_iocs:
+                    scan_iocs_bytes(data, iocs)
+        if iocs:
+            index_iocs(ioc_index, iocs, xref, ref_key="xrefs")
+        if not found:
+            continue
+        matches = []
+        for kw, where, offset, obfuscated in found:
+            kw = kw.decode("ascii")
+            keyword_counts[kw] = keyword_counts.get(kw, 0) + 1
+            m = {"keyword": kw, "where": where, "offset": offset}
+            if obfuscated:
+                m["obfuscated"] = True
+            matches.append(m)
+        hit = {
+            "xref": xref,
+            "keywords": sorted({m["keyword"] for m in matches}),
+            "matches": matches,
+            # hash do conteúdo (stream decodificado, ou o objeto) para correlação entre casos
+            "sha256": hashlib.sha256(data or obj).hexdigest(),
+        }
+        n_hits += 1
+        if on_hit is not None:
+            # modo streaming: a ocorrência não fica acumulada em memória
+            on_hit(hit)
+        else:
+            hits.append(hit)
+    result = {
+        "xrefs_total": doc.xref_length() - 1,
+        "xrefs_scanned": objects,
+        "streams_scanned": streams,
+        "bytes_scanned": nbytes,
+        "seconds": round(time.perf_counter() - t0, 6),
+        "keyword_counts": dict(sorted(keyword_counts.items())),
+        "hits_total": n_hits,
+        "hits": hits,
+        "errors": errors,
+    }
+    if with_iocs:
+        result["iocs"] = ioc_index
+    return result
+
+
+def javascript_code(doc, xref):
+    # Código do /JS de uma ação: stream referenciado (decodificado) ou string literal
+    kind, value = doc.xref_get_key(xref, "JS")
+    if kind == "xref":
+        return doc.xref_stream(int(value.split()[0]))
+    if kind == "string":
+        return value.encode("utf-8", errors="ignore")
+    return None
+
+
+def dump_javascript(doc, xref, writer):
+    # Salva o objeto com /JS e, se o código estiver em stream referenciado, o stream decodificado
+    parts = [doc.xref_object(xref, compressed=False)]
+    try:
+        kind, value = doc.xref_get_key(xref, "JS")
+        if kind == "xref":
+            js_xref = int(value.split()[0])
+            parts.append(f"\n% JS stream (xref {js_xref})\n")
+            parts.append(safe_decode(doc.xref_stream(js_xref)))
+        elif kind == "string":
+            parts.append(f"\n% JS string\n{value}")
+    except Exception as e:
+        logging.debug("Could not resolve /JS of xref %s: %s", xref, e)
+    rel = f"js_xref_{xref}.txt"
+    writer.write(rel, "".join(parts).encode("utf-8", errors="ignore"))
+    return rel
@@ -0,0 +1,57 @@
+# Utilitários
+
+import hashlib
+import logging
+import os
+import sys
+
+
+def setup_logging(quiet=False):
+    lvl = logging.DEBUG if not quiet else logging.WARNING
+    logging.basicConfig(
+        level=lvl,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+
+
+def calculate_hashes_bytes(b: bytes):
+    md5 = hashlib.md5(b).hexdigest()
+    sha1 = hashlib.sha1(b).hexdigest()
+    sha256 = hashlib.sha256(b).hexdigest()
+    return {"MD5": md5, "SHA1": sha1, "SHA256": sha256}
+
+
+def calculate_hashes_file(path):
+    md5_hash = hashlib.md5()
+    sha1_hash = hashlib.sha1()
+    sha256_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8192), b""):
+            md5_hash.update(chunk)
+            sha1_hash.update(chunk)
+            sha256_hash.update(chunk)
+    return {
+        "MD5": md5_hash.hexdigest(),
+        "SHA1": sha1_hash.hexdigest(),
+        "SHA256": sha256_hash.hexdigest(),
+    }
+
+
+def safe_decode(obj):
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode("utf-8", errors="ignore")
+    return str(obj)
+
+
+def ensure_dir(path):
+    os.makedirs(path, exist_ok=True)
+
+
+def report_paths(case_folder, evidence_name):
+    stem = os.path.splitext(os.path.basename(evidence_name))[0]
+    reports_dir = os.path.join(case_folder, "reports")
+    return (
+        os.path.join(reports_dir, f"{stem}_report.txt"),
+        os.path.join(reports_dir, f"{stem}_manifest.json"),
+    )
@@ -0,0 +1,514 @@
+# Modo serviço: observa pastas de entrada e processa cada PDF assim que ele para de mudar
+
+import collections
+import concurrent.futures
+import ctypes
+import ctypes.util
+import datetime
+import json
+import logging
+import os
+import select
+import signal
+import socketserver
+import struct
+import threading
+import time
+
+from .batch import _batch_worker, collect_pdf_inputs
+from .utils import ensure_dir, setup_logging
+
+WATCH_SETTLE_SECONDS = 5.0
+WATCH_POLL_INTERVAL = 2.0
+# Com inotify ainda há uma varredura completa periódica: compartilhamentos SMB/NFS não
+# geram eventos para escritas feitas por outras máquinas
+WATCH_RESCAN_INTERVAL = 60.0
+WATCH_STATUS_INTERVAL = 2.0
+WATCH_LATENCY_WINDOW = 200
+WATCH_RECENT_DOCS = 20
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_EVENT = struct.Struct("iIII")
+
+
+class Inotify:
+    # inotify via ctypes (somente Linux); qualquer falha leva ao modo de varredura
+    MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.watches[wd] = path
+
+    def read(self, timeout):
+        # Caminhos alterados (arquivos e diretórios novos) em até `timeout` segundos
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], []
+        data = os.read(self.fd, 64 * 1024)
+        files, dirs = [], []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, size = _IN_EVENT.unpack_from(data, offset)
+            offset += _IN_EVENT.size
+            name = data[offset : offset + size].rstrip(b"\0")
+            offset += size
+            base = self.watches.get(wd)
+            if base is None or not name:
+                continue
+            path = os.path.join(base, os.fsdecode(name))
+            (dirs if mask & _IN_ISDIR else files).append(path)
+        return files, dirs
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _watch_worker_init(quiet):
+    # Ctrl+C/SIGTERM chegam ao grupo inteiro; quem decide a parada é o processo
+    # principal, que espera os documentos em andamento
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, signal.SIG_IGN)
+    setup_logging(quiet=quiet)
+
+
+class _StatusHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.wfile.write(json.dumps(self.server.service.status()).encode() + b"\n")
+
+
+class WatchService:
+    # Descoberta e estabilidade rodam no processo principal; o processamento vai para um
+    # pool fixo de processos que mantém o PyMuPDF carregado entre documentos. A fila de
+    # trabalho é limitada: quando enche, novos arquivos ficam na pasta de entrada até
+    # abrir espaço (backpressure), em vez de acumular em memória.
+
+    def __init__(
+        self,
+        watch_dirs,
+        out_base,
+        workers=None,
+        queue_size=None,
+        recursive=False,
+        settle_seconds=None,
+        poll_interval=None,
+        use_inotify=True,
+        status_file=None,
+        status_socket=None,
+        quiet=False,
+        **options,
+    ):
+        self.watch_dirs = [os.path.abspath(d) for d in watch_dirs]
+        self.out_base = os.path.abspath(out_base)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.queue_size = max(1, queue_size or self.workers * 2)
+        self.recursive = recursive
+        self.settle_seconds = (
+            WATCH_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        )
+        self.poll_interval = poll_interval or WATCH_POLL_INTERVAL
+        self.use_inotify = use_inotify
+        self.status_file = status_file or os.path.join(
+            self.out_base, "watch_status.json"
+        )
+        self.status_socket = status_socket
+        self.quiet = quiet
+        self.options = options
+
+        self.ledger_path = os.path.join(self.out_base, "watch_ledger.jsonl")
+        self.lock = threading.Lock()
+        self.state = "starting"
+        self.started = time.time()
+        self.stopping = False
+        self.aborting = False
+        # caminho -> [tamanho, mtime_ns, última mudança (monotônico), detecção (epoch)]
+        self.candidates = {}
+        self.ready = collections.deque()  # estáveis, aguardando vaga na fila
+        self.pending = {}  # future -> dados do documento
+        self.claimed = set()  # caminhos em ready/pending
+        self.done = set()  # (caminho, tamanho, mtime_ns) já processados
+        self.used_names = set()
+        self.latencies = collections.deque(maxlen=WATCH_LATENCY_WINDOW)
+        self.recent = collections.deque(maxlen=WATCH_RECENT_DOCS)
+        self.counts = {"processed": 0, "failed": 0, "cancelled": 0}
+        self.backpressure_events = 0
+        self.backpressure = False
+        self.inotify = None
+        self.server = None
+        self.executor = None
+        # self-pipe: documentos concluídos e sinais acordam o laço principal
+        self.wake_r = self.wake_w = None
+
+    # -- descoberta -------------------------------------------------------------------
+    def _load_ledger(self):
+        if not os.path.isfile(self.ledger_path):
+            return
+        with open(self.ledger_path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # última linha truncada por uma parada abrupta
+                self.done.add((rec["source_path"], rec["size"], rec["mtime_ns"]))
+                self.used_names.add(os.path.basename(rec["case_folder"]))
+
+    def _start_inotify(self):
+        try:
+            self.inotify = Inotify()
+            for d in self.watch_dirs:
+                self._watch_tree(d)
+        except (OSError, AttributeError, TypeError) as e:
+            logging.warning("inotify unavailable (%s); using polling", e)
+            if self.inotify is not None:
+                self.inotify.close()
+            self.inotify = None
+
+    def _watch_tree(self, path):
+        self.inotify.add_watch(path)
+        if self.recursive:
+            for root, dirs, _ in os.walk(path):
+                for name in dirs:
+                    self.inotify.add_watch(os.path.join(root, name))
+
+    def _consider(self, path, now):
+        if not path.lower().endswith(".pdf"):
+            return
+        path = os.path.abspath(path)
+        # a saída pode estar dentro da pasta observada: as cópias de evidência não voltam
+        if path in self.claimed or path.startswith(self.out_base + os.sep):
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.candidates.pop(path, None)
+            return
+        if (path, st.st_size, st.st_mtime_ns) in self.done:
+            return
+        cand = self.candidates.get(path)
+        if cand is None:
+            self.candidates[path] = [st.st_size, st.st_mtime_ns, now, time.time()]
+        elif cand[0] != st.st_size or cand[1] != st.st_mtime_ns:
+            cand[:3] = [st.st_size, st.st_mtime_ns, now]
+
+    def _scan(self, now):
+        for path in collect_pdf_inputs(self.watch_dirs, recursive=self.recursive):
+            if path not in self.candidates:
+                self._consider(path, now)
+
+    def _settle(self, now):
+        # Estável = tamanho e mtime inalterados por settle_seconds
+        for path in list(self.candidates):
+            self._consider(path, now)
+            cand = self.candidates.get(path)
+            if cand is not None and now - cand[2] >= self.settle_seconds:
+                del self.candidates[path]
+                self.claimed.add(path)
+                self.ready.append((path, cand[0], cand[1], cand[3]))
+
+    # -- fila de trabalho -------------------------------------------------------------
+    def _case_folder(self, path):
+        stem = os.path.splitext(os.path.basename(path))[0] or "document"
+        name, n = stem, 1
+        while name in self.used_names or os.path.exists(
+            os.path.join(self.out_base, name)
+        ):
+            n += 1
+            name = f"{stem}_{n}"
+        self.used_names.add(name)
+        return os.path.join(self.out_base, name)
+
+    def _submit_ready(self):
+        capacity = self.workers + self.queue_size
+        while self.ready and len(self.pending) < capacity:
+            path, size, mtime_ns, detected = self.ready.popleft()
+            key = (path, size, mtime_ns)
+            case_folder = self._case_folder(path)
+            job = (len(self.done) + len(self.pending), path, case_folder, self.options)
+            try:
+                fut = self.executor.submit(_batch_worker, job)
+            except concurrent.futures.BrokenExecutor:
+                # um worker morreu (ex.: OOM killer): recria o pool e tenta de novo
+                logging.error("Worker pool broken; restarting it")
+                self.executor.shutdown(wait=False)
+                self.executor = self._new_executor()
+                fut = self.executor.submit(_batch_worker, job)
+            self.pending[fut] = {
+                "key": key,
+                "detected": detected,
+                "queued": time.time(),
+            }
+            fut.add_done_callback(self._wake)
+        blocked = bool(self.ready)
+        if blocked and not self.backpressure:
+            self.backpressure_events += 1
+            logging.info(
+                "Work queue full (%d queued); leaving %d file(s) in the intake",
+                len(self.pending),
+                len(self.ready),
+            )
+        self.backpressure = blocked
+
+    def _reap(self, timeout=0):
+        if not self.pending:
+            return
+        done, _ = concurrent.futures.wait(
+            list(self.pending),
+            timeout=timeout,
+            return_when=concurrent.futures.FIRST_COMPLETED,
+        )
+        for fut in done:
+            info = self.pending.pop(fut)
+            path, size, mtime_ns = info["key"]
+            self.claimed.discard(path)
+            if fut.cancelled():
+                # fica fora do ledger: será processado na próxima execução
+                self.counts["cancelled"] += 1
+                continue
+            try:
+                entry = fut.result()
+            except Exception as e:
+                # worker morto (ex.: falta de memória): o documento fica como falha
+                entry = {
+                    "source_path": path,
+                    "case_folder": None,
+                    "status": "error",
+                    "error": f"{type(e).__name__}: {e}",
+                }
+            finished = time.time()
+            entry.update(
+                size=size,
+                mtime_ns=mtime_ns,
+                detected_time=str(datetime.datetime.fromtimestamp(info["detected"])),
+                queue_seconds=round(
+                    finished - info["queued"] - entry.get("elapsed_seconds", 0), 3
+                ),
+                latency_seconds=round(finished - info["detected"], 3),
+            )
+            entry.pop("metrics", None)
+            self.done.add(info["key"])
+            self.counts["processed" if entry["status"] == "ok" else "failed"] += 1
+            with self.lock:
+                self.latencies.append(entry["latency_seconds"])
+                self.recent.append(
+                    {
+                        k: entry.get(k)
+                        for k in (
+                            "source_path",
+                            "case_folder",
+                            "status",
+                            "error",
+                            "latency_seconds",
+                            "queue_seconds",
+                            "elapsed_seconds",
+                        )
+                    }
+                )
+            with open(self.ledger_path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            logging.info(
+                "%s: %s (latency %.1fs)",
+                entry["status"],
+                path,
+                entry["latency_seconds"],
+            )
+
+    # -- status -----------------------------------------------------------------------
+    def status(self):
+        with self.lock:
+            last = self.latencies[-1] if self.latencies else None
+            lat = sorted(self.latencies)
+            recent = list(self.recent)
+        in_flight = min(len(self.pending), self.workers)
+
+        def pct(p):
+            return lat[min(len(lat) - 1, int(p * len(lat)))] if lat else None
+
+        return {
+            "state": self.state,
+            "pid": os.getpid(),
+            "started_time": str(datetime.datetime.fromtimestamp(self.started)),
+            "updated_time": str(datetime.datetime.now()),
+            "watch_dirs": self.watch_dirs,
+            "out_base": self.out_base,
+            "mode": "inotify" if self.inotify is not None else "polling",
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": len(self.pending) - in_flight,
+            "in_flight": in_flight,
+            "waiting_for_slot": len(self.ready),
+            "settling": len(self.candidates),
+            "backpressure": self.backpressure,
+            "backpressure_events": self.backpressure_events,
+            "counts": dict(self.counts),
+            "latency_seconds": {
+                "last": last,
+                "mean": round(sum(lat) / len(lat), 3) if lat else None,
+                "p50": pct(0.5),
+                "p95": pct(0.95),
+                "max": lat[-1] if lat else None,
+                "window": len(lat),
+            },
+            "recent": recent,
+        }
+
+    def write_status(self):
+        tmp = f"{self.status_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self.status(), fh, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.status_file)
+
+    def _start_status_socket(self):
+        if os.path.exists(self.status_socket):
+            os.remove(self.status_socket)
+        self.server = socketserver.ThreadingUnixStreamServer(
+            self.status_socket, _StatusHandler
+        )
+        self.server.daemon_threads = True
+        self.server.service = self
+        threading.Thread(
+            target=self.server.serve_forever, name="forenpdf-status", daemon=True
+        ).start()
+
+    # -- ciclo de vida ----------------------------------------------------------------
+    def _wake(self, *_):
+        # chamado pela thread do pool ao concluir um documento e pelos sinais
+        try:
+            os.write(self.wake_w, b"\0")
+        except (BlockingIOError, OSError, TypeError):
+            pass  # pipe cheio (o laço já vai acordar) ou já fechado
+
+    def _on_signal(self, signum, frame):
+        self._wake()
+        if self.stopping:
+            # segundo sinal: descarta o que ainda está na fila, conclui o que já roda
+            self.aborting = True
+            logging.warning("Second signal: cancelling queued documents")
+        else:
+            self.stopping = True
+            logging.info("Stop requested: draining %d document(s)", len(self.pending))
+
+    def _wait(self, timeout):
+        # Dorme até `timeout`, um evento do inotify ou um documento concluído
+        fds = [self.wake_r]
+        if self.inotify is not None:
+            fds.append(self.inotify.fd)
+        ready, _, _ = select.select(fds, [], [], timeout)
+        if self.wake_r in ready:
+            try:
+                while os.read(self.wake_r, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+        if self.inotify is None or self.inotify.fd not in ready:
+            return
+        files, dirs = self.inotify.read(0)
+        now = time.monotonic()
+        for d in dirs:
+            if self.recursive and os.path.isdir(d):
+                try:
+                    self._watch_tree(d)
+                except OSError as e:
+                    logging.warning("Cannot watch %s: %s", d, e)
+            for path in collect_pdf_inputs([d], recursive=self.recursive):
+                self._consider(path, now)
+        for path in files:
+            self._consider(path, now)
+
+    def _new_executor(self):
+        # Pool fixo: os workers importam o forenpdf (e o PyMuPDF) uma vez e ficam vivos
+        return concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=_watch_worker_init, initargs=(self.quiet,)
+        )
+
+    def run(self):
+        ensure_dir(self.out_base)
+        ensure_dir(os.path.dirname(os.path.abspath(self.status_file)))
+        self._load_ledger()
+        if self.use_inotify:
+            self._start_inotify()
+        if self.status_socket:
+            self._start_status_socket()
+        previous = {
+            sig: signal.signal(sig, self._on_signal)
+            for sig in (signal.SIGINT, signal.SIGTERM)
+        }
+        self.wake_r, self.wake_w = os.pipe()
+        for fd in (self.wake_r, self.wake_w):
+            os.set_blocking(fd, False)
+        self.executor = self._new_executor()
+        logging.info(
+            "Watching %s (%s), %d worker(s), queue size %d, output in %s",
+            ", ".join(self.watch_dirs),
+            "inotify" if self.inotify is not None else "polling",
+            self.workers,
+            self.queue_size,
+            self.out_base,
+        )
+        self.state = "running"
+        last_scan = last_status = 0.0
+        try:
+            while not self.stopping:
+                now = time.monotonic()
+                rescan = (
+                    WATCH_RESCAN_INTERVAL
+                    if self.inotify is not None
+                    else self.poll_interval
+                )
+                if now - last_scan >= rescan:
+                    self._scan(now)
+                    last_scan = now
+                self._settle(now)
+                self._reap()
+                self._submit_ready()
+                if now - last_status >= WATCH_STATUS_INTERVAL:
+                    self.write_status()
+                    last_status = now
+                # com candidatos em espera, acorda a cada segundo para reavaliar
+                timeout = min(self.poll_interval, 1.0 if self.candidates else 5.0)
+                self._wait(timeout)
+
+            self.state = "draining"
+            self.write_status()
+            while self.pending:
+                if self.aborting:
+                    for fut in self.pending:
+                        fut.cancel()
+                self._wait(1.0)
+                self._reap()
+                self.write_status()
+        finally:
+            self.executor.shutdown(wait=True)
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            if self.inotify is not None:
+                self.inotify.close()
+            for fd in (self.wake_r, self.wake_w):
+                os.close(fd)
+            self.wake_r = self.wake_w = None
+            if self.server is not None:
+                self.server.shutdown()
+                self.server.server_close()
+                os.remove(self.status_socket)
+            self.state = "stopped"
+            self.write_status()
+        logging.info(
+            "Watch stopped: %d processed, %d failed, %d cancelled",
+            self.counts["processed"],
+            self.counts["failed"],
+            self.counts["cancelled"],
+        )
+        return self.counts